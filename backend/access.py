@@ -0,0 +1,150 @@
+"""Per-user index of the forms a user has been granted.
+
+The set of accessible form ids is read with one query the first time a user
+needs it and cached per worker, so later access checks are set membership
+tests instead of a ``form_access`` lookup. ``update_form_access`` calls
+``invalidate`` for the affected user; other workers hear about it on the
+cache bus (see caching.py) within ``CACHE_BUS_POLL_INTERVAL``, whatever
+``ACCESS_CACHE_TTL`` is.
+
+Form owners are not listed in ``form_access``; callers check ownership
+separately, as before.
+
+The admin access list and bulk grants are built here too, so the sync and
+async endpoints share one query each: the list is a keyset page over users
+left-joined to their grant, and a bulk change is a single
+``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` over the matching users.
+"""
+import os
+import threading
+from sqlalchemy import and_, func, literal, or_, select
+import caching
+import models
+
+ACCESS_CACHE_SIZE = int(os.getenv("ACCESS_CACHE_SIZE", "10000"))
+ACCESS_CACHE_TTL = float(os.getenv("ACCESS_CACHE_TTL", "60"))
+BULK_INVALIDATE_LIMIT = 100
+
+_cache = caching.TTLCache(ACCESS_CACHE_SIZE, ACCESS_CACHE_TTL)
+
+# Bumped on every invalidation. A set read before a grant or revoke committed
+# is not cached if an invalidation arrived while it was being read.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _invalidated(key):
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    if key == "*":
+        _cache.clear()
+    else:
+        _cache.pop(int(key))
+
+
+caching.bus.subscribe("access", _invalidated)
+
+
+def granted_form_ids_stmt(user_id: int):
+    return select(models.FormAccess.form_id).where(
+        models.FormAccess.user_id == user_id,
+        models.FormAccess.has_access == True
+    )
+
+
+def _store(user_id, generation, form_ids):
+    form_ids = frozenset(form_ids)
+    with _generation_lock:
+        if generation == _generation:
+            _cache.set(user_id, form_ids)
+    return form_ids
+
+
+def form_ids(db, user_id: int) -> frozenset:
+    """Ids of the forms shared with this user."""
+    caching.bus.poll()
+    cached = _cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = _generation
+    return _store(user_id, generation, db.execute(granted_form_ids_stmt(user_id)).scalars())
+
+
+async def form_ids_async(db, user_id: int) -> frozenset:
+    caching.bus.poll()
+    cached = _cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = _generation
+    return _store(user_id, generation, (await db.execute(granted_form_ids_stmt(user_id))).scalars())
+
+
+def has_access(db, form_id: int, user_id: int) -> bool:
+    return form_id in form_ids(db, user_id)
+
+
+async def has_access_async(db, form_id: int, user_id: int) -> bool:
+    return form_id in await form_ids_async(db, user_id)
+
+
+def user_search_condition(q):
+    """Non-admin users whose mobile number, first or last name starts with ``q``."""
+    condition = models.User.is_admin == False
+    if q:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        condition = and_(condition, or_(
+            models.User.mobile_number.like(pattern, escape="\\"),
+            models.User.first_name.ilike(pattern, escape="\\"),
+            models.User.last_name.ilike(pattern, escape="\\"),
+        ))
+    return condition
+
+
+def access_page_stmt(form_id: int, q=None, granted=None, after=None, limit=100):
+    """One page of UserAccessInfo rows for a form, ordered by user id."""
+    has_access = func.coalesce(models.FormAccess.has_access, False)
+    stmt = select(
+        models.User.id.label("user_id"),
+        models.User.mobile_number,
+        models.User.first_name,
+        models.User.last_name,
+        has_access.label("has_access"),
+    ).outerjoin(
+        models.FormAccess,
+        and_(models.FormAccess.user_id == models.User.id, models.FormAccess.form_id == form_id)
+    ).where(user_search_condition(q))
+    if granted is not None:
+        stmt = stmt.where(has_access == granted)
+    if after is not None:
+        stmt = stmt.where(models.User.id > after)
+    return stmt.order_by(models.User.id).limit(limit)
+
+
+def bulk_upsert_stmt(insert, form_id: int, has_access: bool, user_ids=None, q=None):
+    """Grant or revoke ``form_id`` for the listed users, or all users matching ``q``."""
+    users = select(literal(form_id), models.User.id, literal(has_access)).where(user_search_condition(q))
+    if user_ids is not None:
+        users = users.where(models.User.id.in_(user_ids))
+    stmt = insert(models.FormAccess).from_select(["form_id", "user_id", "has_access"], users)
+    return stmt.on_conflict_do_update(
+        index_elements=[models.FormAccess.form_id, models.FormAccess.user_id],
+        set_={"has_access": stmt.excluded.has_access}
+    )
+
+
+def invalidate_users(user_ids):
+    """Invalidate a few users one by one, or everyone for a large or filtered change."""
+    if user_ids is not None and len(user_ids) <= BULK_INVALIDATE_LIMIT:
+        for user_id in user_ids:
+            invalidate(user_id)
+    else:
+        invalidate_all()
+
+
+def invalidate(user_id: int):
+    caching.bus.publish("access", user_id)
+
+
+def invalidate_all():
+    caching.bus.publish("access", "*")
@@ -0,0 +1,362 @@
+"""Cold archival of form responses.
+
+Deactivated responses and old submissions are rarely read, but they stay in
+the heap and indexes of ``form_responses`` that every listing goes through.
+The archive job moves them to ``form_response_archive``: segments of up to
+``ARCHIVE_SEGMENT_ROWS`` responses of one user to one form, stored as
+gzip-compressed NDJSON.
+
+    python archive.py                                   # defaults below
+    python archive.py --inactive-days 7 --age-days 730 --form 12
+    python archive.py --dry-run                         # count only
+
+A response is archived once it has been inactive for ``ARCHIVE_INACTIVE_DAYS``
+or was submitted more than ``ARCHIVE_AGE_DAYS`` ago. Each batch is one
+transaction (segments written, rows deleted), so a response is always in one
+place or the other. On Postgres the job also creates the coming monthly
+partitions and drops the past ones it has emptied (partitions.py); run it
+daily.
+
+Archived responses are served by the same endpoints, on a slower path:
+
+* the response listing merges archived rows into its pages (``iter_rows``);
+* exports and stats read them along with the hot rows;
+* editing or reactivating an archived response first moves its segment back
+  to the hot table (``restore``).
+
+The changes feed covers the hot table only: archiving is not a change, and a
+client that starts from a listing follows the feed from its
+``X-Changes-Cursor``. Form counters include archived responses.
+"""
+import argparse
+import gzip
+import heapq
+import itertools
+import json
+import os
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, or_
+import database
+import models
+import partitions
+
+ARCHIVE_INACTIVE_DAYS = float(os.getenv("ARCHIVE_INACTIVE_DAYS", "30"))
+ARCHIVE_AGE_DAYS = float(os.getenv("ARCHIVE_AGE_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "1000"))
+ASYNC_CHUNK_ROWS = 500
+
+Segment = models.FormResponseArchive
+
+
+class ArchivedRow:
+    """An archived response with the attributes of a listing row."""
+    __slots__ = ("id", "form_id", "user_id", "is_active", "submitted_at", "updated_at", "response_data")
+
+    def __init__(self, id, form_id, user_id, is_active, submitted_at, updated_at, response_data):
+        self.id = id
+        self.form_id = form_id
+        self.user_id = user_id
+        self.is_active = is_active
+        self.submitted_at = submitted_at
+        self.updated_at = updated_at
+        self.response_data = response_data
+
+    @classmethod
+    def from_response(cls, row):
+        return cls(row.id, row.form_id, row.user_id, row.is_active is not False,
+                   row.submitted_at, row.updated_at, row.response_data)
+
+    @classmethod
+    def decode(cls, form_id, line):
+        id_, user_id, is_active, submitted_at, updated_at, data = json.loads(line)
+        return cls(id_, form_id, user_id, is_active, datetime.fromisoformat(submitted_at),
+                   datetime.fromisoformat(updated_at) if updated_at else None, data)
+
+    def encode(self) -> str:
+        return json.dumps([
+            self.id, self.user_id, self.is_active, self.submitted_at.isoformat(),
+            self.updated_at.isoformat() if self.updated_at else None, self.response_data,
+        ], separators=(",", ":"), ensure_ascii=False)
+
+    def _asdict(self):
+        # Same keys as fastjson.response_columns(); the document as JSON text
+        # in the layout Postgres prints JSONB in.
+        return {
+            "id": self.id,
+            "form_id": self.form_id,
+            "user_id": self.user_id,
+            "is_active": self.is_active,
+            "submitted_at": self.submitted_at,
+            "updated_at": self.updated_at,
+            "response_data": None if self.response_data is None else json.dumps(self.response_data, ensure_ascii=False),
+        }
+
+    def values(self) -> dict:
+        """Column values for re-inserting the row into form_responses."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def sort_key(row):
+    return row.submitted_at, row.id
+
+
+def _segment(form_id, user_id, rows):
+    return Segment(
+        form_id=form_id,
+        user_id=user_id,
+        row_count=len(rows),
+        active_count=sum(1 for row in rows if row.is_active),
+        min_response_id=min(row.id for row in rows),
+        max_response_id=max(row.id for row in rows),
+        first_submitted_at=rows[0].submitted_at,
+        last_submitted_at=rows[-1].submitted_at,
+        payload=gzip.compress("\n".join(row.encode() for row in rows).encode()),
+    )
+
+
+def _decode(segment):
+    return [ArchivedRow.decode(segment.form_id, line) for line in gzip.decompress(segment.payload).decode().splitlines()]
+
+
+def _matches(row, filters):
+    data = row.response_data if isinstance(row.response_data, dict) else {}
+    return all(data.get(key) == value for key, value in filters.items())
+
+
+# Reading
+
+def has_rows(db, form_id: int) -> bool:
+    return db.query(Segment.id).filter(Segment.form_id == form_id).first() is not None
+
+
+def _segment_rows(db, segment_id, after, filters, active_only):
+    """Rows of one segment in order, decoded as they are reached."""
+    segment = db.query(Segment).filter(Segment.id == segment_id).one()
+    db.expunge(segment)
+    for line in gzip.decompress(segment.payload).decode().splitlines():
+        row = ArchivedRow.decode(segment.form_id, line)
+        if after is not None and sort_key(row) <= tuple(after):
+            continue
+        if (active_only and not row.is_active) or (filters and not _matches(row, filters)):
+            continue
+        yield row
+
+
+def iter_rows(db, form_id: int, user_id=None, after=None, filters=None, active_only=False):
+    """Archived rows of a form (or of one user) in (submitted_at, id) order.
+
+    ``after`` is a decoded listing cursor. Segments are merged in
+    ``first_submitted_at`` order and each is opened only once the merge
+    reaches its first row, so a page that ends early reads only the first
+    few, and memory holds one decompressed payload per overlapping segment.
+    """
+    query = db.query(Segment.id, Segment.first_submitted_at).filter(Segment.form_id == form_id)
+    if user_id is not None:
+        query = query.filter(Segment.user_id == user_id)
+    if after is not None:
+        query = query.filter(Segment.last_submitted_at >= after[0])
+    pending = deque(query.order_by(Segment.first_submitted_at, Segment.id).all())
+    # (key of the segment's next row, row, rest of the segment)
+    heap = []
+    while pending or heap:
+        if pending and (not heap or pending[0].first_submitted_at <= heap[0][0][0]):
+            rows = _segment_rows(db, pending.popleft().id, after, filters, active_only)
+            row = next(rows, None)
+            if row is not None:
+                heapq.heappush(heap, (sort_key(row), row, rows))
+            continue
+        _, row, rows = heap[0]
+        following = next(rows, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (sort_key(following), following, rows))
+        yield row
+
+
+def merged(hot_rows, archived_rows):
+    """Hot and archived rows, both in (submitted_at, id) order, as one ordered stream.
+
+    A row archived while a listing runs can be read from both sides; the
+    second copy is dropped.
+    """
+    previous = None
+    for row in heapq.merge(hot_rows, archived_rows, key=sort_key):
+        if row.id != previous:
+            previous = row.id
+            yield row
+
+
+async def iter_rows_async(db, form_id: int, user_id=None, after=None, filters=None, active_only=False):
+    """``iter_rows`` on an AsyncSession, pulled a chunk of rows per round trip."""
+    state = {}
+
+    def take(session):
+        if "rows" not in state:
+            state["rows"] = iter_rows(session, form_id, user_id, after, filters, active_only)
+        return list(itertools.islice(state["rows"], ASYNC_CHUNK_ROWS))
+
+    while True:
+        chunk = await db.run_sync(take)
+        if not chunk:
+            return
+        for row in chunk:
+            yield row
+
+
+async def _aiterate(rows):
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+async def merged_async(hot_rows, archived_rows):
+    """``merged`` for async iterators (or a list of hot rows)."""
+    hot, cold = _aiterate(hot_rows), _aiterate(archived_rows)
+    next_hot, next_cold = await anext(hot, None), await anext(cold, None)
+    previous = None
+    while next_hot is not None or next_cold is not None:
+        if next_cold is None or (next_hot is not None and sort_key(next_hot) <= sort_key(next_cold)):
+            row, next_hot = next_hot, await anext(hot, None)
+        else:
+            row, next_cold = next_cold, await anext(cold, None)
+        if row.id != previous:
+            previous = row.id
+            yield row
+
+
+def find(db, response_id: int):
+    """An archived response by id, without restoring it; None if it is not archived."""
+    candidates = db.query(Segment).filter(
+        Segment.min_response_id <= response_id,
+        Segment.max_response_id >= response_id,
+    )
+    for segment in candidates:
+        for row in _decode(segment):
+            if row.id == response_id:
+                return row
+    return None
+
+
+# Restoring
+
+def restore(db, user_id: int, response_id: int) -> bool:
+    """Move the segment holding a user's archived response back to form_responses.
+
+    Returns False if the response is not archived. The caller commits.
+    """
+    candidates = db.query(Segment).filter(
+        Segment.user_id == user_id,
+        Segment.min_response_id <= response_id,
+        Segment.max_response_id >= response_id,
+    ).with_for_update().all()
+    for segment in candidates:
+        rows = _decode(segment)
+        if not any(row.id == response_id for row in rows):
+            continue
+        # Ids are never reused, so a conflict means the row is already back.
+        stmt = database.dialect_insert(db)(models.FormResponse.__table__).on_conflict_do_nothing()
+        db.execute(stmt, [row.values() for row in rows])
+        db.delete(segment)
+        db.flush()
+        return True
+    return False
+
+
+async def restore_async(db, user_id: int, response_id: int) -> bool:
+    return await db.run_sync(lambda session: restore(session, user_id, response_id))
+
+
+# Archiving
+
+def _eligible(db, inactive_days, age_days, form_id=None):
+    now = models.utcnow()
+    query = db.query(models.FormResponse).filter(or_(
+        and_(
+            models.FormResponse.is_active == False,
+            models.FormResponse.updated_at < now - timedelta(days=inactive_days),
+        ),
+        models.FormResponse.submitted_at < now - timedelta(days=age_days),
+    ))
+    if form_id is not None:
+        query = query.filter(models.FormResponse.form_id == form_id)
+    return query
+
+
+def eligible_counts(db, inactive_days=ARCHIVE_INACTIVE_DAYS, age_days=ARCHIVE_AGE_DAYS, form_id=None) -> dict:
+    query = _eligible(db, inactive_days, age_days, form_id)
+    return dict(query.with_entities(models.FormResponse.form_id, func.count()).group_by(models.FormResponse.form_id).all())
+
+
+def _append(db, form_id, user_id, rows):
+    """Write rows of one user as segments, topping up their last partial segment first."""
+    tail = db.query(Segment).filter(
+        Segment.form_id == form_id,
+        Segment.user_id == user_id,
+        Segment.row_count < ARCHIVE_SEGMENT_ROWS,
+    ).order_by(Segment.last_submitted_at.desc(), Segment.id.desc()).with_for_update().first()
+    if tail is not None and tail.row_count + len(rows) <= ARCHIVE_SEGMENT_ROWS:
+        rows = sorted(_decode(tail) + rows, key=sort_key)
+        db.delete(tail)
+    for start in range(0, len(rows), ARCHIVE_SEGMENT_ROWS):
+        db.add(_segment(form_id, user_id, rows[start:start + ARCHIVE_SEGMENT_ROWS]))
+
+
+def archive(db, inactive_days=ARCHIVE_INACTIVE_DAYS, age_days=ARCHIVE_AGE_DAYS, form_id=None) -> Counter:
+    """Move eligible responses to the archive, committing per batch; returns the count per form."""
+    moved = Counter()
+    while True:
+        query = _eligible(db, inactive_days, age_days, form_id).order_by(
+            models.FormResponse.form_id, models.FormResponse.user_id,
+            models.FormResponse.submitted_at, models.FormResponse.id,
+        ).limit(ARCHIVE_BATCH_SIZE)
+        if db.get_bind().dialect.name == "postgresql":
+            # Rows being edited right now are left for the next run.
+            query = query.with_for_update(skip_locked=True)
+        rows = [ArchivedRow.from_response(row) for row in query]
+        if not rows:
+            return moved
+        for (form, user), group in itertools.groupby(rows, key=lambda row: (row.form_id, row.user_id)):
+            group = list(group)
+            _append(db, form, user, group)
+            moved[form] += len(group)
+        db.execute(
+            delete(models.FormResponse).where(models.FormResponse.id.in_([row.id for row in rows])),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move inactive and old responses to the archive.")
+    parser.add_argument("--inactive-days", type=float, default=ARCHIVE_INACTIVE_DAYS)
+    parser.add_argument("--age-days", type=float, default=ARCHIVE_AGE_DAYS)
+    parser.add_argument("--form", type=int, help="only this form")
+    parser.add_argument("--dry-run", action="store_true", help="count eligible responses per form")
+    args = parser.parse_args()
+
+    with database.SessionLocal() as db:
+        if args.dry_run:
+            counts = eligible_counts(db, args.inactive_days, args.age_days, args.form)
+        else:
+            counts = archive(db, args.inactive_days, args.age_days, args.form)
+    for form_id, count in sorted(counts.items()):
+        print(f"form {form_id}: {count} responses {'eligible' if args.dry_run else 'archived'}")
+    if args.dry_run:
+        return
+    with database.engine.begin() as conn:
+        created = partitions.ensure_partitions(conn)
+        dropped = partitions.drop_empty_partitions(conn)
+    for name in created:
+        print(f"created partition {name}")
+    for name in dropped:
+        print(f"dropped empty partition {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""Async versions of the form, access and response endpoints.
+
+Installed in place of the sync handlers in main.py when ``DB_MODE=async``.
+Handlers await an ``AsyncSession`` instead of blocking a threadpool slot
+while Postgres answers, so one worker can keep many more requests in flight.
+The request/response contract is identical to the sync endpoints.
+"""
+from typing import List, Optional
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import select, tuple_, cast, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+import models, schemas, auth, database, validators, stats, etags, access, changes, live, fastjson, writebehind, counters, archive, search, revisions, warmup
+from filters import field_filters, response_field_condition
+from pagination import (
+    RESPONSES_PAGE_SIZE, RESPONSES_MAX_PAGE_SIZE, RESPONSES_STREAM_BATCH,
+    ACCESS_PAGE_SIZE, ACCESS_MAX_PAGE_SIZE,
+    encode_cursor, decode_cursor
+)
+
+router = APIRouter()
+
+
+def install(app):
+    """Replace the app's sync routes with the async routes of the same path and method."""
+    replaced = {(route.path, method) for route in router.routes for method in route.methods}
+    app.router.routes = [
+        route for route in app.router.routes
+        if not (isinstance(route, APIRoute) and any((route.path, m) in replaced for m in route.methods))
+    ]
+    app.include_router(router)
+
+
+async def get_validator(db: AsyncSession, form_id: int, version: int) -> validators.CompiledForm:
+    """Cached validator for this schema version; the schema is only read on a miss."""
+    validator = validators.lookup(form_id, version)
+    if validator is None:
+        form_schema = await db.scalar(select(cast(models.Form.form_schema, Text)).where(models.Form.id == form_id))
+        validator = validators.compile_schema(form_id, version, form_schema)
+    return validator
+
+
+@router.post("/api/forms", response_model=schemas.Form)
+async def create_form(
+    form: schemas.FormCreate,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    db_form = models.Form(
+        title=form.title,
+        description=form.description,
+        form_schema=json.loads(form.form_schema),
+        created_by=current_user.id
+    )
+    db.add(db_form)
+    await db.commit()
+    await db.refresh(db_form)
+    return db_form
+
+
+@router.get("/api/forms", response_model=List[schemas.FormListItem])
+async def get_forms(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    forms = (await db.execute(counters.owned_forms_stmt(current_user.id))).all()
+    etag = etags.forms_list_etag(forms)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+
+    bodies = {f.id: etags.form_bodies.get((f.id, f.version)) for f in forms}
+    missing = [form_id for form_id, body in bodies.items() if body is None]
+    if missing:
+        for form in await db.scalars(select(models.Form).where(models.Form.id.in_(missing))):
+            bodies[form.id] = etags.form_body(form)
+    items = (etags.with_fields(bodies[f.id], fastjson.dumps(counters.counts(f))) for f in forms)
+    return etags.json_body(b"[" + b",".join(items) + b"]", etag)
+
+
+@router.get("/api/forms/{form_id}", response_model=schemas.Form)
+async def get_form(
+    form_id: int,
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    form = (await db.execute(
+        select(models.Form.id, models.Form.created_by, models.Form.version).where(models.Form.id == form_id)
+    )).first()
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+
+    if form.created_by != current_user.id and not await access.has_access_async(db, form_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Forbidden: You do not have access to this form")
+
+    etag = etags.form_etag(form.id, form.version)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+
+    body = etags.form_bodies.get((form.id, form.version))
+    if body is None:
+        db_form = await db.get(models.Form, form_id)
+        body = etags.form_body(db_form)
+        etag = etags.form_etag(db_form.id, db_form.version)
+    return etags.json_body(body, etag)
+
+
+@router.put("/api/forms/{form_id}", response_model=schemas.Form)
+async def update_form(
+    form_id: int,
+    form_update: schemas.FormCreate,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    db_form = (await db.scalars(
+        select(models.Form).where(models.Form.id == form_id, models.Form.created_by == current_user.id)
+    )).first()
+    if not db_form:
+        raise HTTPException(status_code=404, detail="Form not found")
+
+    db_form.title = form_update.title
+    db_form.description = form_update.description
+    db_form.form_schema = json.loads(form_update.form_schema)
+    db_form.version = models.Form.version + 1
+
+    await db.commit()
+    await db.refresh(db_form)
+    validators.invalidate(form_id)
+    return db_form
+
+
+@router.get("/api/admin/forms/{form_id}/access", response_model=List[schemas.UserAccessInfo])
+async def get_form_access(
+    form_id: int,
+    response: Response,
+    q: Optional[str] = None,
+    granted: Optional[bool] = None,
+    limit: int = Query(ACCESS_PAGE_SIZE, ge=1, le=ACCESS_MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    admin_user: models.User = Depends(auth.get_admin_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    rows = (await db.execute(access.access_page_stmt(form_id, q, granted, after, limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].user_id)
+    return [schemas.UserAccessInfo.model_validate(row._mapping) for row in rows]
+
+
+@router.put("/api/admin/forms/{form_id}/access")
+async def update_form_access(
+    form_id: int,
+    access_data: schemas.FormAccessUpdate,
+    admin_user: models.User = Depends(auth.get_admin_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    await counters.lock_access_async(db, form_id)
+    previous = await db.scalar(select(models.FormAccess.has_access).where(
+        models.FormAccess.form_id == form_id, models.FormAccess.user_id == access_data.user_id
+    ))
+    insert = database.dialect_insert(db)
+    stmt = insert(models.FormAccess).values(
+        form_id=form_id,
+        user_id=access_data.user_id,
+        has_access=access_data.has_access
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.FormAccess.form_id, models.FormAccess.user_id],
+        set_={"has_access": stmt.excluded.has_access}
+    )
+    await db.execute(stmt)
+    await counters.access_changed_async(db, form_id, int(access_data.has_access) - int(bool(previous)))
+    await db.commit()
+    access.invalidate(access_data.user_id)
+    return {"message": "Access updated"}
+
+
+@router.post("/api/admin/forms/{form_id}/access:bulk", response_model=schemas.FormAccessBulkResult)
+async def bulk_update_form_access(
+    form_id: int,
+    bulk: schemas.FormAccessBulkUpdate,
+    admin_user: models.User = Depends(auth.get_admin_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    if await db.scalar(select(models.Form.id).where(models.Form.id == form_id)) is None:
+        raise HTTPException(status_code=404, detail="Form not found")
+    await counters.lock_access_async(db, form_id)
+    stmt = access.bulk_upsert_stmt(database.dialect_insert(db), form_id, bulk.has_access, bulk.user_ids, bulk.q)
+    updated = (await db.execute(stmt)).rowcount
+    await counters.recount_access_async(db, form_id)
+    await db.commit()
+    access.invalidate_users(bulk.user_ids)
+    return {"updated": updated}
+
+
+@router.get("/api/user/shared-forms", response_model=List[schemas.Form])
+async def get_shared_forms(
+    documents: str = Query("string", pattern="^(string|object)$"),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    stmt = select(models.Form).join(models.FormAccess, models.FormAccess.form_id == models.Form.id).where(
+        models.FormAccess.user_id == current_user.id,
+        models.FormAccess.has_access == True
+    )
+    if fastjson.FAST_JSON or documents == "object":
+        rows = (await db.execute(stmt.with_only_columns(*fastjson.form_columns()))).all()
+        return fastjson.rows_response(rows, "form_schema", embed=documents == "object")
+    return (await db.scalars(stmt)).all()
+
+
+@router.post("/api/forms/{form_id}/responses", response_model=schemas.FormResponse)
+async def submit_response(
+    form_id: int,
+    response: schemas.FormResponseCreate,
+    reply: Response,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    if not await access.has_access_async(db, form_id, current_user.id):
+        raise HTTPException(status_code=403, detail="No access to this form")
+    version = await db.scalar(select(models.Form.version).where(models.Form.id == form_id))
+    validator = await get_validator(db, form_id, version)
+    response_data = validators.validate_response_data(validator, response.response_data)
+
+    # Id reservation and the spool fsync block; keep them off the loop.
+    pending = await run_in_threadpool(writebehind.submit, form_id, current_user.id, response_data)
+    if pending is not None:
+        await db.close()  # don't hold a pooled connection while the batch commits
+        row, committed = await writebehind.acknowledgement_async(pending)
+        if not committed:
+            reply.status_code = status.HTTP_202_ACCEPTED
+        return row
+
+    new_response = models.FormResponse(
+        form_id=form_id,
+        user_id=current_user.id,
+        response_data=response_data
+    )
+    db.add(new_response)
+    await db.flush()
+    await counters.responses_inserted_async(db, [{"form_id": form_id, "submitted_at": new_response.submitted_at}])
+    await db.commit()
+    await db.refresh(new_response)
+    stats.record_write(form_id, new_data=response_data)
+    live.publish_response("created", new_response)
+    return new_response
+
+
+def responses_page_stmt(db, form_id: int, user_id: int, after: Optional[str], filters: Optional[dict] = None):
+    stmt = select(models.FormResponse).where(
+        models.FormResponse.form_id == form_id,
+        models.FormResponse.user_id == user_id
+    )
+    if filters:
+        stmt = stmt.where(response_field_condition(db, filters))
+    if after:
+        stmt = stmt.where(
+            tuple_(models.FormResponse.submitted_at, models.FormResponse.id) > tuple_(*decode_cursor(after))
+        )
+    return stmt.order_by(models.FormResponse.submitted_at, models.FormResponse.id)
+
+
+async def with_archived(db, rows, form_id: int, user_id: int, after: Optional[str], filters: dict, limit: Optional[int] = None):
+    """Merge the user's archived responses (archive.py) into ordered listing rows."""
+    archived = archive.iter_rows_async(db, form_id, user_id, decode_cursor(after) if after else None, filters)
+    count = 0
+    async for row in archive.merged_async(rows, archived):
+        yield row
+        count += 1
+        if count == limit:
+            return
+
+
+async def stream_responses_ndjson(form_id: int, user_id: int, after: Optional[str], limit: Optional[int], filters: dict):
+    async with database.async_read_sessionmaker(user_id)() as db:
+        stmt = responses_page_stmt(db, form_id, user_id, after, filters)
+        if limit:
+            stmt = stmt.limit(limit)
+        rows = await db.stream_scalars(stmt.execution_options(yield_per=RESPONSES_STREAM_BATCH))
+        async for row in with_archived(db, rows, form_id, user_id, after, filters, limit):
+            yield schemas.FormResponse.model_validate(row).model_dump_json() + "\n"
+
+
+@warmup.hot_query
+def warm_request_queries(session):
+    # The statements of the async handlers differ from the sync ones'.
+    session.execute(select(models.User).where(models.User.mobile_number == "")).first()
+    session.execute(
+        select(models.Form.id, models.Form.created_by, models.Form.version).where(models.Form.id == 0)
+    ).first()
+    session.execute(select(models.Form.version).where(models.Form.id == 0)).first()
+    page = responses_page_stmt(session, 0, 0, None).limit(1)
+    session.execute(page).first()
+    session.execute(page.with_only_columns(*fastjson.response_columns())).first()
+
+
+@router.get("/api/forms/{form_id}/responses", response_model=List[schemas.FormResponse])
+async def get_user_responses(
+    form_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=RESPONSES_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    documents: str = Query("string", pattern="^(string|object)$"),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    filters = field_filters(request)
+    if format == "ndjson":
+        if after:
+            decode_cursor(after)
+        await db.close()
+        return StreamingResponse(
+            stream_responses_ndjson(form_id, current_user.id, after, limit, filters),
+            media_type="application/x-ndjson"
+        )
+
+    paged = limit is not None or after is not None
+    limit = limit or RESPONSES_PAGE_SIZE
+    fetch = limit + 1 if paged else None
+    response.headers["X-Changes-Cursor"] = changes.watermark_cursor(database.replica_lag(db))
+    stmt = responses_page_stmt(db, form_id, current_user.id, after, filters).limit(fetch)
+    fast = fastjson.FAST_JSON or documents == "object"
+    if fast:
+        rows = (await db.execute(stmt.with_only_columns(*fastjson.response_columns()))).all()
+    else:
+        rows = (await db.scalars(stmt)).all()
+    rows = [row async for row in with_archived(db, rows, form_id, current_user.id, after, filters, fetch)]
+    if paged and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    if fast:
+        return fastjson.rows_response(rows, "response_data", documents == "object", dict(response.headers))
+    return rows
+
+
+async def response_scope_async(db: AsyncSession, form_id: int, current_user: models.User) -> int:
+    """``main.response_scope``: the user's own responses, as in the listing."""
+    if (await db.execute(select(models.Form.id).where(models.Form.id == form_id))).first() is None:
+        raise HTTPException(status_code=404, detail="Form not found")
+    return current_user.id
+
+
+@router.get("/api/forms/{form_id}/responses/changes", response_model=schemas.ResponseChanges)
+async def get_response_changes(
+    form_id: int,
+    since: Optional[str] = None,
+    limit: int = Query(changes.CHANGES_PAGE_SIZE, ge=1, le=changes.CHANGES_MAX_PAGE_SIZE),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    user_id = await response_scope_async(db, form_id, current_user)
+    rows = (await db.scalars(changes.changes_stmt(form_id, user_id, since, limit))).all()
+    return changes.changes_page(rows, since, limit)
+
+
+@router.get("/api/forms/{form_id}/responses/search", response_model=List[schemas.ResponseSearchHit])
+async def search_responses(
+    form_id: int,
+    request: Request,
+    q: str = "",
+    limit: int = Query(search.SEARCH_PAGE_SIZE, ge=1, le=search.SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    fields = field_filters(request)
+    if not search.terms(q) and not fields:
+        raise HTTPException(status_code=400, detail="Nothing to search for")
+    user_id = await response_scope_async(db, form_id, current_user)
+    rows = (await db.execute(search.search_stmt(db, form_id, user_id, q, fields, limit, offset))).all()
+    return search.hits(rows)
+
+
+@router.get("/api/forms/{form_id}/responses/as-of", response_model=List[schemas.FormResponse])
+async def get_responses_as_of(
+    form_id: int,
+    response: Response,
+    at: datetime,
+    limit: Optional[int] = Query(None, ge=1, le=RESPONSES_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_read_db_async)
+):
+    user_id = await response_scope_async(db, form_id, current_user)
+    limit = limit or RESPONSES_PAGE_SIZE
+    rows = await revisions.as_of_async(db, form_id, user_id, at, decode_cursor(after) if after else None, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["submitted_at"], rows[-1]["id"])
+    return rows
+
+
+@router.put("/api/responses/{response_id}", response_model=schemas.FormResponse)
+async def update_response(
+    response_id: int,
+    response_update: schemas.FormResponseUpdate,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    # Locked until the commit, as in main.update_response.
+    stmt = select(models.FormResponse).where(
+        models.FormResponse.id == response_id,
+        models.FormResponse.user_id == current_user.id
+    ).with_for_update()
+    db_response = (await db.scalars(stmt)).first()
+    # An archived response is moved back to the hot table before it is edited.
+    if not db_response and await archive.restore_async(db, current_user.id, response_id):
+        db_response = (await db.scalars(stmt)).first()
+    if not db_response:
+        raise HTTPException(status_code=404, detail="Response record not found")
+
+    old_data = db_response.response_data if db_response.is_active else None
+    previous = revisions.snapshot(db_response)
+    if response_update.response_data is not None:
+        version = await db.scalar(select(models.Form.version).where(models.Form.id == db_response.form_id))
+        validator = await get_validator(db, db_response.form_id, version)
+        db_response.response_data = validators.validate_response_data(validator, response_update.response_data)
+    if response_update.is_active is not None and response_update.is_active != (db_response.is_active is not False):
+        db_response.is_active = response_update.is_active
+        await counters.response_toggled_async(db, db_response.form_id, response_update.is_active)
+    revisions.record(db, db_response, previous, current_user.id)
+
+    await db.commit()
+    await db.refresh(db_response)
+    stats.record_write(
+        db_response.form_id,
+        old_data=old_data,
+        new_data=db_response.response_data if db_response.is_active else None
+    )
+    live.publish_response("updated", db_response)
+    return db_response
+
+
+@router.get("/api/responses/{response_id}/revisions", response_model=List[schemas.ResponseRevision])
+async def get_response_revisions(
+    response_id: int,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    row = await revisions.current_async(db, response_id)
+    if row is None or row.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Response record not found")
+    return await revisions.history_async(db, row)
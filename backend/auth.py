@@ -1,4 +1,6 @@
 import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from typing import Optional
@@ -6,8 +8,9 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-import models, database
+import models, database, caching
 
 load_dotenv()
 
@@ -16,7 +19,27 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated principals are cached per worker, keyed by token subject, so
+# that read endpoints do not pay a users lookup on every request. Writes to a
+# user must call invalidate_principal(); PRINCIPAL_CACHE_TTL=0 disables it.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+principal_cache = caching.TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+caching.bus.subscribe("principal", principal_cache.pop)
+
+# bcrypt cost factor. Hashes created with another cost are upgraded on the
+# next successful login (see verify_and_update_password).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Password hashing runs on its own small pool instead of the shared request
+# threadpool, so a burst of logins cannot starve the other endpoints. When
+# more than PASSWORD_HASH_QUEUE_LIMIT jobs are waiting, requests are rejected
+# with 503 straight away rather than queueing behind the burst.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
 def verify_password(plain_password, hashed_password):
@@ -32,6 +55,45 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """Return (is_valid, new_hash); new_hash is set when the stored hash is outdated."""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+if PASSWORD_HASH_EXECUTOR == "process":
+    password_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+else:
+    password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_jobs = 0
+
+async def run_password_job(fn, *args):
+    # Only touched from the event loop thread, so a plain counter is enough.
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        _password_jobs -= 1
+
+async def get_password_hash_async(password):
+    return await run_password_job(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await run_password_job(verify_and_update_password, plain_password, hashed_password)
+
+async def warm_password_hashing():
+    """Hash once on every password worker; loads the bcrypt backend and starts the workers."""
+    await asyncio.gather(*(run_password_job(get_password_hash, "0000") for _ in range(PASSWORD_HASH_WORKERS)))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -42,26 +104,81 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def principal_snapshot(user: models.User) -> models.User:
+    """Detached copy of a user row that is safe to share between requests."""
+    return models.User(**{c.key: getattr(user, c.key) for c in models.User.__table__.columns})
+
+def invalidate_principal(mobile_number: str):
+    caching.bus.publish("principal", mobile_number)
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         mobile_number: str = payload.get("sub")
         if mobile_number is None:
-            raise credentials_exception
+            raise credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.mobile_number == mobile_number).first()
+        raise credentials_exception()
+    return mobile_number
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    mobile_number = token_subject(token)
+    caching.bus.poll()
+    user = principal_cache.get(mobile_number)
     if user is None:
-        raise credentials_exception
+        user = db.query(models.User).filter(models.User.mobile_number == mobile_number).first()
+        if user is None:
+            raise credentials_exception()
+        user = principal_snapshot(user)
+        principal_cache.set(mobile_number, user)
+        # End the read so the connection goes back to the pool: the session
+        # lives until the response is sent, which for a stream can be long.
+        db.rollback()
+    # A commit on this session pins the user to the primary (database.py).
+    db.info["user_id"] = user.id
     return user
 
+def get_read_db(current_user: models.User = Depends(get_current_user)):
+    """Session for read-only handlers: the replica, or the primary right after the user wrote."""
+    db = database.read_sessionmaker(current_user.id)()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_admin_user(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(database.get_async_db)):
+    mobile_number = token_subject(token)
+    caching.bus.poll()
+    user = principal_cache.get(mobile_number)
+    if user is None:
+        user = (await db.execute(
+            select(models.User).where(models.User.mobile_number == mobile_number)
+        )).scalars().first()
+        if user is None:
+            raise credentials_exception()
+        user = principal_snapshot(user)
+        principal_cache.set(mobile_number, user)
+        await db.rollback()
+    db.info["user_id"] = user.id
+    return user
+
+async def get_admin_user_async(current_user: models.User = Depends(get_current_user_async)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user
+
+async def get_read_db_async(current_user: models.User = Depends(get_current_user_async)):
+    async with database.async_read_sessionmaker(current_user.id)() as db:
+        yield db
@@ -0,0 +1,116 @@
+"""Count SQL statements per request for the access-checked endpoints.
+
+Runs the endpoints with the per-user access index disabled
+(``ACCESS_CACHE_TTL=0``, every check queries ``form_access``) and enabled,
+each in its own interpreter, and prints the mean number of statements and
+latency per request for each endpoint.
+
+    cd backend
+    python -m benchmarks.access_queries --requests 200
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_SQLITE_URL = "sqlite:////tmp/dynamic_forms_bench_access.sqlite3"
+
+
+def seed(forms):
+    import auth, database, migrations, models
+
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        owner = models.User(mobile_number="8000000000", password_hash="x", is_admin=True)
+        member = models.User(mobile_number="8000000001", password_hash="x")
+        db.add_all([owner, member])
+        db.flush()
+        form_rows = [models.Form(title=f"Benchmark {i}", form_schema=[], created_by=owner.id) for i in range(forms)]
+        db.add_all(form_rows)
+        db.flush()
+        db.add_all([models.FormAccess(form_id=form.id, user_id=member.id, has_access=True) for form in form_rows])
+        db.commit()
+        token = auth.create_access_token(data={"sub": member.mobile_number})
+        return form_rows[0].id, token
+    finally:
+        db.close()
+
+
+def measure(requests, form_id, token):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    import database
+    import main
+
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(database.engine, "before_cursor_execute", count)
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {token}"}
+    calls = {
+        "get_form": lambda: client.get(f"/api/forms/{form_id}", headers=headers),
+        "shared_forms": lambda: client.get("/api/user/shared-forms", headers=headers),
+        "submit_response": lambda: client.post(
+            f"/api/forms/{form_id}/responses",
+            json={"form_id": form_id, "response_data": "{}"}, headers=headers
+        ),
+    }
+    results = {}
+    for name, call in calls.items():
+        call()  # warm the principal, validator and access caches
+        statements = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            r = call()
+            assert r.status_code == 200, r.text
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            "statements_per_request": round(statements / requests, 2),
+            "mean_ms": round(elapsed / requests * 1000, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--forms", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--form-id", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.requests, args.form_id, args.token)))
+        return
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL"):
+        if os.path.exists(DEFAULT_SQLITE_URL[len("sqlite:///"):]):
+            os.remove(DEFAULT_SQLITE_URL[len("sqlite:///"):])
+        env["DATABASE_URL"] = os.environ["DATABASE_URL"] = DEFAULT_SQLITE_URL
+    form_id, token = seed(args.forms)
+
+    results = {"requests": args.requests, "forms": args.forms}
+    for label, ttl in (("access_index_off", "0"), ("access_index_on", "60")):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.access_queries", "--worker",
+             "--requests", str(args.requests), "--form-id", str(form_id), "--token", token],
+            env={**env, "DB_MODE": "sync", "ACCESS_CACHE_TTL": ttl},
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True,
+        )
+        results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compare DB_MODE=sync and DB_MODE=async under many concurrent clients.
+
+Seeds a database, then runs each mode in its own interpreter (the mode is read
+at import time) and drives the app in-process through httpx's ASGI transport.
+Prints one JSON document with requests/s and latency percentiles per mode.
+
+    cd backend
+    DATABASE_URL=postgresql://... python -m benchmarks.async_vs_sync --clients 500
+
+Without DATABASE_URL a throwaway SQLite file is used; SQLite serializes
+writers, so only the read endpoints are meaningful there.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_SQLITE_URL = "sqlite:////tmp/dynamic_forms_bench.sqlite3"
+
+
+def seed(responses):
+    import auth, database, migrations, models
+
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        owner = models.User(mobile_number="8000000000", password_hash="x", is_admin=True)
+        member = models.User(mobile_number="8000000001", password_hash="x")
+        db.add_all([owner, member])
+        db.flush()
+        form = models.Form(title="Benchmark", form_schema=[], created_by=owner.id)
+        db.add(form)
+        db.flush()
+        db.add(models.FormAccess(form_id=form.id, user_id=member.id, has_access=True))
+        db.bulk_insert_mappings(models.FormResponse, [
+            {"form_id": form.id, "user_id": member.id, "response_data": {"n": i}}
+            for i in range(responses)
+        ])
+        db.commit()
+        token = auth.create_access_token(data={"sub": member.mobile_number})
+        return form.id, token
+    finally:
+        db.close()
+
+
+async def drive(clients, requests, form_id, token):
+    import httpx
+    import main
+
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = [f"/api/forms/{form_id}", f"/api/forms/{form_id}/responses?limit=50"]
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client(http):
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                r = await http.get(paths[i % len(paths)], headers=headers)
+                errors += r.status_code != 200
+            except Exception:
+                # e.g. QueuePool timeouts once every threadpool slot waits on the pool
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--responses", type=int, default=5000)
+    parser.add_argument("--worker", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--form-id", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(drive(args.clients, args.requests, args.form_id, args.token))
+        print(json.dumps(result))
+        return
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL"):
+        if os.path.exists(DEFAULT_SQLITE_URL[len("sqlite:///"):]):
+            os.remove(DEFAULT_SQLITE_URL[len("sqlite:///"):])
+        env["DATABASE_URL"] = os.environ["DATABASE_URL"] = DEFAULT_SQLITE_URL
+    form_id, token = seed(args.responses)
+
+    results = {"clients": args.clients, "requests": args.requests, "modes": {}}
+    for mode in ("sync", "async"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_vs_sync", "--worker", mode,
+             "--clients", str(args.clients), "--requests", str(args.requests),
+             "--form-id", str(form_id), "--token", token],
+            env={**env, "DB_MODE": mode}, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True,
+        )
+        results["modes"][mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
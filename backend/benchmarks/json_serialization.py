@@ -0,0 +1,109 @@
+"""CPU cost of serving a page of responses: ORM + Pydantic vs the fast JSON path.
+
+Seeds one form with ``--responses`` rows (10k by default), then times the
+query plus serialization of the whole page for each path:
+
+* ``orm_pydantic``   - ORM objects, validated through List[schemas.FormResponse]
+  and rendered like FastAPI's JSONResponse (the path with FAST_JSON=0).
+* ``fast_string``    - column rows, stored JSON read as text, orjson (default).
+* ``fast_object``    - as above with ``documents=object``.
+
+Prints process CPU and wall time per 10k responses (best of ``--repeat``).
+
+    cd backend
+    python -m benchmarks.json_serialization
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import json
+import os
+import time
+
+DEFAULT_SQLITE_URL = "sqlite:////tmp/dynamic_forms_bench_json.sqlite3"
+
+
+def seed(responses):
+    import database, migrations, models
+
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        owner = models.User(mobile_number="8000000000", password_hash="x", is_admin=True)
+        db.add(owner)
+        db.flush()
+        form = models.Form(title="Benchmark", form_schema=[], created_by=owner.id)
+        db.add(form)
+        db.flush()
+        db.bulk_insert_mappings(models.FormResponse, [
+            {
+                "form_id": form.id, "user_id": owner.id,
+                "response_data": {"City": "Pune", "Age": str(20 + i % 50), "DOB": "01/02/1990", "Notes": "x" * 40},
+                "submitted_at": models.utcnow(), "updated_at": models.utcnow(),
+            }
+            for i in range(responses)
+        ])
+        db.commit()
+        return form.id
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        if os.path.exists(DEFAULT_SQLITE_URL[len("sqlite:///"):]):
+            os.remove(DEFAULT_SQLITE_URL[len("sqlite:///"):])
+        os.environ["DATABASE_URL"] = DEFAULT_SQLITE_URL
+    from typing import List
+    from pydantic import TypeAdapter
+    import database, fastjson, models, schemas
+
+    form_id = seed(args.responses)
+    adapter = TypeAdapter(List[schemas.FormResponse])
+
+    def page(db):
+        return db.query(models.FormResponse).filter(
+            models.FormResponse.form_id == form_id
+        ).order_by(models.FormResponse.submitted_at, models.FormResponse.id)
+
+    def orm_pydantic(db):
+        rows = page(db).all()
+        content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    def fast(embed):
+        def run(db):
+            rows = page(db).with_entities(*fastjson.response_columns()).all()
+            return fastjson.rows_response(rows, "response_data", embed).body
+        return run
+
+    paths = {"orm_pydantic": orm_pydantic, "fast_string": fast(False), "fast_object": fast(True)}
+    scale = 10000 / args.responses
+    results = {"responses": args.responses, "orjson": fastjson.orjson is not None, "paths": {}}
+    for name, run in paths.items():
+        best_cpu = best_wall = None
+        for _ in range(args.repeat):
+            db = database.SessionLocal()
+            try:
+                cpu, wall = time.process_time(), time.perf_counter()
+                body = run(db)
+                cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+            finally:
+                db.close()
+            best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+            best_wall = wall if best_wall is None else min(best_wall, wall)
+        results["paths"][name] = {
+            "cpu_ms_per_10k": round(best_cpu * 1000 * scale, 1),
+            "wall_ms_per_10k": round(best_wall * 1000 * scale, 1),
+            "bytes": len(body),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Load test: seed a database, run the app, drive its endpoints, report JSON.
+
+Seeds users, forms with ``--fields`` fields, an access grant for every
+(user, form) pair and ``--responses`` responses spread over them. Then it
+starts the app under uvicorn (or uses ``--url``) and sends ``--requests``
+requests per endpoint with ``--concurrency`` clients. It prints per-endpoint
+requests/s and p50/p95/p99 latency as JSON.
+
+``--save`` writes the result. ``--baseline`` compares against a saved result
+and exits with status 1 when an endpoint's throughput or p95 latency is more
+than ``--tolerance`` worse.
+
+    cd backend
+    python -m benchmarks.loadtest --responses 1000000 --save /tmp/baseline.json
+    python -m benchmarks.loadtest --skip-seed --baseline /tmp/baseline.json
+
+Without DATABASE_URL a SQLite file is used (DATABASE_URL=postgresql://...
+for a local Postgres). Login and signup cost a bcrypt hash each; set
+BCRYPT_ROUNDS to change the cost for both the seed and the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_SQLITE_URL = "sqlite:////tmp/dynamic_forms_loadtest.sqlite3"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "1234"
+ADMIN_MOBILE = "6000000000"
+USER_MOBILE_BASE = 6000000001
+SIGNUP_MOBILE_BASE = 5000000000
+FORM_TITLE = "Load test form"
+FIELD_TYPES = ("text", "number", "date", "select")
+CITIES = ("Pune", "Mumbai", "Delhi", "Chennai", "Kolkata")
+SEED_CHUNK = 10000
+
+ENDPOINTS = ("login", "signup", "get_form", "submit_response", "list_responses", "get_form_access")
+
+
+def form_fields(count):
+    fields = []
+    for i in range(count):
+        field = {"id": i + 1, "label": f"Field {i + 1}", "type": FIELD_TYPES[i % len(FIELD_TYPES)], "isActive": True}
+        if field["type"] == "select":
+            field["options"] = ", ".join(CITIES)
+        fields.append(field)
+    return fields
+
+
+def field_value(field, rng):
+    kind = field["type"]
+    if kind == "number":
+        return str(rng.randint(1, 100))
+    if kind == "date":
+        return f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1950, 2010)}"
+    if kind == "select":
+        return rng.choice(CITIES)
+    return f"answer {rng.randint(1, 10**6)}"
+
+
+def response_data(fields, rng):
+    return {field["label"]: field_value(field, rng) for field in fields}
+
+
+def seed(args):
+    from sqlalchemy import insert
+    import auth, counters, database, ingest, migrations, models
+
+    migrations.run_migrations()
+    rng = random.Random(args.seed)
+    fields = form_fields(args.fields)
+    password_hash = auth.get_password_hash(PASSWORD)
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        admin_id = db.execute(insert(models.User).returning(models.User.id), {
+            "mobile_number": ADMIN_MOBILE, "password_hash": password_hash, "is_admin": True, "is_active": True,
+        }).scalar_one()
+        user_ids = []
+        for start in range(0, args.users, SEED_CHUNK):
+            user_ids += db.execute(insert(models.User).returning(models.User.id, sort_by_parameter_order=True), [
+                {"mobile_number": str(USER_MOBILE_BASE + i), "password_hash": password_hash,
+                 "first_name": f"User{i}", "is_admin": False, "is_active": True}
+                for i in range(start, min(start + SEED_CHUNK, args.users))
+            ]).scalars().all()
+        form_ids = db.execute(insert(models.Form).returning(models.Form.id, sort_by_parameter_order=True), [
+            {"title": f"{FORM_TITLE} {i}", "form_schema": fields, "created_by": admin_id}
+            for i in range(args.forms)
+        ]).scalars().all()
+        grants = [{"form_id": f, "user_id": u, "has_access": True} for f in form_ids for u in user_ids]
+        for start in range(0, len(grants), SEED_CHUNK):
+            db.execute(insert(models.FormAccess), grants[start:start + SEED_CHUNK])
+        db.commit()
+
+        for start in range(0, args.responses, SEED_CHUNK):
+            rows = [
+                {"form_id": rng.choice(form_ids), "user_id": rng.choice(user_ids), "response_data": response_data(fields, rng)}
+                for _ in range(min(SEED_CHUNK, args.responses - start))
+            ]
+            ingest.insert_responses(db, rows)
+            db.commit()
+            print(f"seeded {start + len(rows)}/{args.responses} responses", file=sys.stderr)
+        counters.rebuild(db)  # the grants above bypass the access endpoints
+        db.commit()
+    finally:
+        db.close()
+    return round(time.perf_counter() - started, 1)
+
+
+def seeded_form_ids():
+    import database, models
+
+    db = database.SessionLocal()
+    try:
+        return [row[0] for row in db.query(models.Form.id).filter(
+            models.Form.title.like(f"{FORM_TITLE} %")
+        ).order_by(models.Form.id)]
+    finally:
+        db.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, env):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    import httpx
+    for _ in range(300):
+        try:
+            if httpx.get(url + "/readyz", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+async def drive(args, url, form_ids):
+    import httpx
+
+    rng = random.Random(args.seed + 1)
+    fields = form_fields(args.fields)
+    signup_base = SIGNUP_MOBILE_BASE + int(time.time()) % 100000 * 10000
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as http:
+        async def token(mobile):
+            r = await http.post("/api/login", json={"mobile_number": mobile, "password": PASSWORD})
+            r.raise_for_status()
+            return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        admin = await token(ADMIN_MOBILE)
+        users = [await token(str(USER_MOBILE_BASE + i)) for i in range(min(args.users, 20))]
+
+        def user(i):
+            return users[i % len(users)]
+
+        def form(i):
+            return form_ids[i % len(form_ids)]
+
+        ops = {
+            "login": lambda i: http.post("/api/login", json={
+                "mobile_number": str(USER_MOBILE_BASE + i % args.users), "password": PASSWORD}),
+            "signup": lambda i: http.post("/api/signup", json={
+                "mobile_number": str(signup_base + i), "password": PASSWORD}),
+            "get_form": lambda i: http.get(f"/api/forms/{form(i)}", headers=user(i)),
+            "submit_response": lambda i: http.post(f"/api/forms/{form(i)}/responses", headers=user(i), json={
+                "form_id": form(i), "response_data": json.dumps(response_data(fields, rng))}),
+            "list_responses": lambda i: http.get(f"/api/forms/{form(i)}/responses", params={"limit": 100}, headers=user(i)),
+            "get_form_access": lambda i: http.get(f"/api/admin/forms/{form(i)}/access", params={"limit": 100}, headers=admin),
+        }
+
+        results = {}
+        for name in args.endpoints:
+            latencies, errors = [], 0
+            remaining = iter(range(args.requests))
+
+            async def client():
+                nonlocal errors
+                for i in remaining:
+                    started = time.perf_counter()
+                    try:
+                        r = await ops[name](i)
+                        errors += r.status_code >= 400
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+            results[name] = summarize(latencies, errors, time.perf_counter() - started)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+        return results
+
+
+def compare(result, baseline, tolerance):
+    """Per-endpoint ratios against the baseline; regressions beyond ``tolerance``."""
+    comparison, regressions = {}, []
+    for name, current in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        rps_ratio = current["rps"] / before["rps"] if before["rps"] else None
+        p95_ratio = current["p95_ms"] / before["p95_ms"] if before["p95_ms"] else None
+        comparison[name] = {"rps_ratio": rps_ratio and round(rps_ratio, 3), "p95_ratio": p95_ratio and round(p95_ratio, 3)}
+        if (rps_ratio is not None and rps_ratio < 1 - tolerance) or (p95_ratio is not None and p95_ratio > 1 + tolerance):
+            regressions.append(name)
+    return comparison, regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the server")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--forms", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=10)
+    parser.add_argument("--responses", type=int, default=100000)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data of a previous run")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the result to this file")
+    parser.add_argument("--baseline", help="compare against a saved result")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    args.endpoints = [name for name in args.endpoints.split(",") if name]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL"):
+        if not args.skip_seed and os.path.exists(DEFAULT_SQLITE_URL[len("sqlite:///"):]):
+            os.remove(DEFAULT_SQLITE_URL[len("sqlite:///"):])
+        env["DATABASE_URL"] = os.environ["DATABASE_URL"] = DEFAULT_SQLITE_URL
+
+    seed_seconds = None if args.skip_seed else seed(args)
+    form_ids = seeded_form_ids()
+    if not form_ids:
+        parser.error("no seeded forms found; run without --skip-seed first")
+
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_server(args.workers, env)
+    try:
+        endpoints = asyncio.run(drive(args, url, form_ids))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    import database
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "database": database.engine.dialect.name,
+            "db_mode": env.get("DB_MODE", "sync"),
+            "workers": None if args.url else args.workers,
+            "users": args.users, "forms": args.forms, "fields": args.fields, "responses": args.responses,
+            "requests": args.requests, "concurrency": args.concurrency,
+            "seed_seconds": seed_seconds,
+        },
+        "endpoints": endpoints,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["comparison"], regressions = compare(result, json.load(f), args.tolerance)
+        result["regressions"] = regressions
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Cold-start benchmark: how long a fresh worker takes to serve fast requests.
+
+Seeds one user, one form and ``--responses`` responses. Then, for
+``WARM_UP=1`` and ``WARM_UP=0`` (see warmup.py), it starts a single uvicorn
+worker ``--runs`` times. Each run measures:
+
+* ``ready_s`` - from spawning the process until ``/readyz`` answers 200;
+* ``first_ms`` - the first request to each endpoint after that;
+* ``steady_ms`` - the median of ``--repeat`` later requests to the same endpoint.
+
+It prints medians over the runs as JSON. The gap between ``first_ms`` and
+``steady_ms`` is what a deploy or scale-up costs the first users; with
+warm-up it moves into ``ready_s``, before the worker is given traffic.
+
+    cd backend
+    DATABASE_URL=postgresql://... python -m benchmarks.startup --runs 5
+
+Without DATABASE_URL a SQLite file is used; connecting to SQLite is nearly
+free, so the pool pre-fill only shows on Postgres.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.loadtest import BACKEND_DIR, free_port
+
+DEFAULT_SQLITE_URL = "sqlite:////tmp/dynamic_forms_startup.sqlite3"
+MOBILE = "7000000000"
+PASSWORD = "1234"
+
+
+def seed(responses):
+    import auth, database, migrations, models
+
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        user = models.User(mobile_number=MOBILE, password_hash=auth.get_password_hash(PASSWORD), is_admin=True)
+        db.add(user)
+        db.flush()
+        form = models.Form(
+            title="Startup benchmark",
+            form_schema=[{"id": 1, "label": "City", "type": "text", "isActive": True}],
+            created_by=user.id,
+        )
+        db.add(form)
+        db.flush()
+        db.bulk_insert_mappings(models.FormResponse, [
+            {"form_id": form.id, "user_id": user.id, "response_data": {"City": f"City {i}"}}
+            for i in range(responses)
+        ])
+        db.commit()
+        return form.id, auth.create_access_token(data={"sub": MOBILE})
+    finally:
+        db.close()
+
+
+def requests_for(form_id, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    return {
+        "login": ("POST", "/api/login", {"json": {"mobile_number": MOBILE, "password": PASSWORD}}),
+        "get_form": ("GET", f"/api/forms/{form_id}", {"headers": headers}),
+        "list_forms": ("GET", "/api/forms", {"headers": headers}),
+        "list_responses": ("GET", f"/api/forms/{form_id}/responses?limit=50", {"headers": headers}),
+    }
+
+
+def timed(http, method, path, kwargs):
+    started = time.perf_counter()
+    response = http.request(method, path, **kwargs)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed
+
+
+def run_once(env, requests, repeat):
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as http:
+            while True:
+                try:
+                    if http.get("/readyz").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.01)
+            result = {"ready_s": time.perf_counter() - started, "first_ms": {}, "steady_ms": {}}
+            for name, (method, path, kwargs) in requests.items():
+                result["first_ms"][name] = timed(http, method, path, kwargs) * 1000
+            for name, (method, path, kwargs) in requests.items():
+                result["steady_ms"][name] = statistics.median(
+                    timed(http, method, path, kwargs) for _ in range(repeat)
+                ) * 1000
+            return result
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def median_of(runs):
+    return {
+        "ready_s": round(statistics.median(run["ready_s"] for run in runs), 3),
+        "first_ms": {name: round(statistics.median(run["first_ms"][name] for run in runs), 2) for name in runs[0]["first_ms"]},
+        "steady_ms": {name: round(statistics.median(run["steady_ms"][name] for run in runs), 2) for name in runs[0]["steady_ms"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="server starts per mode")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per endpoint for the steady-state median")
+    parser.add_argument("--responses", type=int, default=1000)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL"):
+        path = DEFAULT_SQLITE_URL[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+        env["DATABASE_URL"] = os.environ["DATABASE_URL"] = DEFAULT_SQLITE_URL
+
+    form_id, token = seed(args.responses)
+    requests = requests_for(form_id, token)
+    result = {}
+    for mode in ("1", "0"):
+        runs = [run_once({**env, "WARM_UP": mode}, requests, args.repeat) for _ in range(args.runs)]
+        result["warm_up" if mode == "1" else "cold"] = median_of(runs)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""In-process caches and cross-worker invalidation.
+
+``TTLCache`` is a small thread-safe LRU with per-entry expiry. Each gunicorn
+worker holds its own caches, so writes that must be seen by every worker are
+announced on an invalidation bus:
+
+* ``sqlite`` - invalidations are appended to a small SQLite file shared by
+  the workers on one host and polled at most every ``CACHE_BUS_POLL_INTERVAL``
+  seconds.
+* ``local``  - invalidations only reach the current process; entries in other
+  workers live on until their TTL. Only safe with a single worker.
+
+The backend is chosen with ``CACHE_BUS``. The default is ``sqlite``, because
+the image runs several workers and a deactivated user or a revoked grant must
+stop working on all of them, not only on the worker that made the change.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LocalBus:
+    """Invalidation bus that only notifies subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, namespace, callback):
+        self._subscribers.setdefault(namespace, []).append(callback)
+
+    def _dispatch(self, namespace, key):
+        for callback in self._subscribers.get(namespace, ()):
+            callback(key)
+
+    def publish(self, namespace, key):
+        self._dispatch(namespace, key)
+
+    def poll(self, force=False):
+        pass
+
+
+class SQLiteBus(LocalBus):
+    """Invalidation bus shared by the workers of one host through a SQLite file."""
+
+    RETENTION_SECONDS = 3600
+
+    def __init__(self, path, poll_interval=1.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_poll = 0.0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "namespace TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.commit()
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, namespace, key):
+        self._dispatch(namespace, key)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO invalidations (namespace, key, created_at) VALUES (?, ?, ?)",
+            (namespace, str(key), now)
+        )
+        conn.execute("DELETE FROM invalidations WHERE created_at < ?", (now - self.RETENTION_SECONDS,))
+
+    def poll(self, force=False):
+        """Deliver new invalidations; ``force`` skips the poll interval."""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        with self._lock:
+            if not force and now < self._next_poll:
+                return
+            self._next_poll = now + self.poll_interval
+            rows = self._conn().execute(
+                "SELECT seq, namespace, key FROM invalidations WHERE seq > ? ORDER BY seq",
+                (self._last_seq,)
+            ).fetchall()
+            if rows:
+                self._last_seq = rows[-1][0]
+        for _, namespace, key in rows:
+            self._dispatch(namespace, key)
+
+
+def create_bus():
+    backend = os.getenv("CACHE_BUS", "sqlite")
+    if backend == "sqlite":
+        return SQLiteBus(
+            os.getenv("CACHE_BUS_PATH", "/tmp/dynamic_forms_cache_bus.sqlite3"),
+            poll_interval=float(os.getenv("CACHE_BUS_POLL_INTERVAL", "1.0")),
+        )
+    if backend != "local":
+        raise ValueError(f"Unknown CACHE_BUS backend: {backend}")
+    return LocalBus()
+
+
+bus = create_bus()
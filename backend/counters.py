@@ -0,0 +1,232 @@
+"""Denormalized per-form counts for the forms dashboard.
+
+``form_counters`` holds, per form, the number of responses (total and
+active), the time of the last submission and the number of users with
+access. The writes that change them add their deltas in the same
+transaction:
+
+* ``ingest.insert_responses`` - single submissions, batches and the
+  write-behind queue;
+* ``update_response`` when a response is deactivated or reactivated, under
+  the response's row lock;
+* ``update_form_access`` and the bulk grant/revoke.
+
+Response deltas go to one of ``FORM_COUNTER_SLOTS`` rows per form, picked at
+random, so concurrent submissions to a popular form do not queue on one row
+lock; reads sum the slots. Access counts live in slot 0, which grant changes
+lock first so the change can be worked out from the previous state.
+
+Archived responses (archive.py) still count; moving them does not change the
+counters. ``rebuild`` recomputes the counters from the source tables and the
+archive segments:
+
+    python counters.py              # every form
+    python counters.py 12 15        # some forms
+"""
+import os
+import random
+import sys
+from sqlalchemy import case, delete, func, literal, or_, select, text, union_all, update
+import database
+import models
+
+FORM_COUNTER_SLOTS = int(os.getenv("FORM_COUNTER_SLOTS", "8"))
+
+Counter = models.FormCounter
+
+
+def _add_stmt(db):
+    stmt = database.dialect_insert(db)(Counter)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[Counter.form_id, Counter.slot],
+        set_={
+            "response_count": Counter.response_count + excluded.response_count,
+            "active_count": Counter.active_count + excluded.active_count,
+            "access_count": Counter.access_count + excluded.access_count,
+            "last_submitted_at": case(
+                (
+                    or_(Counter.last_submitted_at.is_(None), excluded.last_submitted_at > Counter.last_submitted_at),
+                    excluded.last_submitted_at,
+                ),
+                else_=Counter.last_submitted_at,
+            ),
+        },
+    )
+
+
+def _delta(form_id, slot=None, responses=0, active=0, last_submitted_at=None, access=0):
+    return {
+        "form_id": form_id,
+        "slot": random.randrange(FORM_COUNTER_SLOTS) if slot is None else slot,
+        "response_count": responses,
+        "active_count": active,
+        "last_submitted_at": last_submitted_at,
+        "access_count": access,
+    }
+
+
+def _inserted_deltas(rows):
+    now = models.utcnow()
+    per_form = {}
+    for row in rows:
+        total, active, last = per_form.get(row["form_id"], (0, 0, None))
+        submitted_at = row.get("submitted_at") or now
+        per_form[row["form_id"]] = (
+            total + 1,
+            active + (row.get("is_active", True) is not False),
+            submitted_at if last is None or submitted_at > last else last,
+        )
+    # Form order keeps the row locks of concurrent batches in one order.
+    return [
+        _delta(form_id, responses=total, active=active, last_submitted_at=last)
+        for form_id, (total, active, last) in sorted(per_form.items())
+    ]
+
+
+def _recount_access_stmt(form_id):
+    granted = select(func.count()).select_from(models.FormAccess).where(
+        models.FormAccess.form_id == form_id,
+        models.FormAccess.has_access == True
+    ).scalar_subquery()
+    return update(Counter).where(Counter.form_id == form_id, Counter.slot == 0).values(access_count=granted)
+
+
+def responses_inserted(db, rows):
+    """Count newly inserted response rows (dicts of column values)."""
+    if rows:
+        db.execute(_add_stmt(db), _inserted_deltas(rows))
+
+
+def response_toggled(db, form_id: int, is_active: bool):
+    """Count a (de)activation; the caller holds the response's row lock.
+
+    update_response locks the row before reading ``is_active``, so of two
+    concurrent identical toggles the second sees the first one's result and
+    changes nothing.
+    """
+    db.execute(_add_stmt(db), _delta(form_id, active=1 if is_active else -1))
+
+
+def lock_access(db, form_id: int):
+    """Lock the form's access count until commit; call before changing its grants."""
+    # The no-op upsert creates the row if needed and holds its lock either way.
+    db.execute(_add_stmt(db), _delta(form_id, slot=0))
+
+
+def access_changed(db, form_id: int, delta: int):
+    if delta:
+        db.execute(_add_stmt(db), _delta(form_id, slot=0, access=delta))
+
+
+def recount_access(db, form_id: int):
+    """Recount the users with access to a form (after a bulk change, under ``lock_access``)."""
+    db.execute(_recount_access_stmt(form_id))
+
+
+async def responses_inserted_async(db, rows):
+    if rows:
+        await db.execute(_add_stmt(db), _inserted_deltas(rows))
+
+
+async def response_toggled_async(db, form_id: int, is_active: bool):
+    await db.execute(_add_stmt(db), _delta(form_id, active=1 if is_active else -1))
+
+
+async def lock_access_async(db, form_id: int):
+    await db.execute(_add_stmt(db), _delta(form_id, slot=0))
+
+
+async def access_changed_async(db, form_id: int, delta: int):
+    if delta:
+        await db.execute(_add_stmt(db), _delta(form_id, slot=0, access=delta))
+
+
+async def recount_access_async(db, form_id: int):
+    await db.execute(_recount_access_stmt(form_id))
+
+
+COUNT_FIELDS = (
+    "response_count", "active_response_count", "inactive_response_count", "last_submitted_at", "access_count",
+)
+
+
+def owned_forms_stmt(user_id: int):
+    """Id, version and summed counters of the forms a user created, in one query."""
+    responses = func.coalesce(func.sum(Counter.response_count), 0)
+    active = func.coalesce(func.sum(Counter.active_count), 0)
+    return select(
+        models.Form.id,
+        models.Form.version,
+        responses.label("response_count"),
+        active.label("active_response_count"),
+        (responses - active).label("inactive_response_count"),
+        func.max(Counter.last_submitted_at).label("last_submitted_at"),
+        func.coalesce(func.sum(Counter.access_count), 0).label("access_count"),
+    ).outerjoin(Counter, Counter.form_id == models.Form.id).where(
+        models.Form.created_by == user_id
+    ).group_by(models.Form.id, models.Form.version).order_by(models.Form.id)
+
+
+def counts(row) -> dict:
+    return {field: getattr(row, field) for field in COUNT_FIELDS}
+
+
+def rebuild(db, form_ids=None, archived=True):
+    """Recompute the counters of ``form_ids`` (default: every form). The caller commits.
+
+    ``archived=False`` leaves out the archive, for databases that predate it.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Keep concurrent writers from adding deltas the rebuild would not see.
+        db.execute(text("LOCK TABLE form_counters IN EXCLUSIVE MODE"))
+    hot = select(
+        models.FormResponse.form_id,
+        func.count().label("total"),
+        func.sum(case((models.FormResponse.is_active == True, 1), else_=0)).label("active"),
+        func.max(models.FormResponse.submitted_at).label("last_submitted_at"),
+    ).group_by(models.FormResponse.form_id)
+    if archived:
+        Segment = models.FormResponseArchive
+        cold = select(
+            Segment.form_id,
+            func.sum(Segment.row_count),
+            func.sum(Segment.active_count),
+            func.max(Segment.last_submitted_at),
+        ).group_by(Segment.form_id)
+        both = union_all(hot, cold).subquery()
+    else:
+        both = hot.subquery()
+    responses = select(
+        both.c.form_id,
+        func.sum(both.c.total).label("total"),
+        func.sum(both.c.active).label("active"),
+        func.max(both.c.last_submitted_at).label("last_submitted_at"),
+    ).group_by(both.c.form_id).subquery()
+    grants = select(
+        models.FormAccess.form_id,
+        func.count().label("granted"),
+    ).where(models.FormAccess.has_access == True).group_by(models.FormAccess.form_id).subquery()
+    forms = select(
+        models.Form.id,
+        literal(0),
+        func.coalesce(responses.c.total, 0),
+        func.coalesce(responses.c.active, 0),
+        responses.c.last_submitted_at,
+        func.coalesce(grants.c.granted, 0),
+    ).outerjoin(responses, responses.c.form_id == models.Form.id).outerjoin(grants, grants.c.form_id == models.Form.id)
+    clear = delete(Counter)
+    if form_ids is not None:
+        forms = forms.where(models.Form.id.in_(form_ids))
+        clear = clear.where(Counter.form_id.in_(form_ids))
+    db.execute(clear)
+    db.execute(database.dialect_insert(db)(Counter).from_select(
+        ["form_id", "slot", "response_count", "active_count", "last_submitted_at", "access_count"], forms
+    ))
+
+
+if __name__ == "__main__":
+    with database.SessionLocal() as session:
+        rebuild(session, [int(arg) for arg in sys.argv[1:]] or None)
+        session.commit()
+    print("Form counters rebuilt.")
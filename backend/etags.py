@@ -0,0 +1,62 @@
+"""Conditional GET support for form reads.
+
+Form reads carry a strong ETag derived from ``Form.version``. A request whose
+``If-None-Match`` matches gets a 304 after a lookup of the id, owner and
+version, without loading the schema column. Serialized form bodies are also
+cached per worker by ``(form_id, version)``; a new version is a new key, so
+entries never need explicit invalidation.
+"""
+import hashlib
+import os
+from fastapi import Request, Response
+import caching
+import schemas
+
+# Responses differ per user (access checks), and clients must revalidate so a
+# schema edit is seen immediately; revalidation is a cheap 304.
+CACHE_CONTROL = "private, no-cache"
+
+FORM_BODY_CACHE_SIZE = int(os.getenv("FORM_BODY_CACHE_SIZE", "2048"))
+FORM_BODY_CACHE_TTL = float(os.getenv("FORM_BODY_CACHE_TTL", "3600"))
+form_bodies = caching.TTLCache(FORM_BODY_CACHE_SIZE, FORM_BODY_CACHE_TTL)
+
+
+def form_etag(form_id: int, version: int) -> str:
+    return f'"form-{form_id}-v{version}"'
+
+
+def forms_list_etag(rows) -> str:
+    """ETag of a form listing, from every column of its rows (id, version, counters)."""
+    digest = hashlib.sha1(",".join(":".join(map(str, row)) for row in rows).encode()).hexdigest()
+    return f'"forms-{digest[:20]}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_body(body: bytes, etag: str) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def with_fields(body: bytes, fields: bytes) -> bytes:
+    """Append the members of the JSON object ``fields`` to the cached object ``body``."""
+    return body[:-1] + b"," + fields[1:]
+
+
+def form_body(form) -> bytes:
+    """Serialized form, cached under the version it was read at."""
+    body = schemas.Form.model_validate(form).model_dump_json().encode()
+    form_bodies.set((form.id, form.version), body)
+    return body
@@ -0,0 +1,126 @@
+"""Streaming export of a form's responses.
+
+Rows are read from a server-side cursor (``yield_per``) and written out as
+they arrive, so memory use does not grow with the number of responses.
+Archived responses are merged in by submission time (archive.py).
+Columns are the response metadata followed by the form's active fields in
+schema order.
+
+CSV and NDJSON are streamed chunk by chunk. Parquet is written one row group
+at a time to a spooled temporary file, which is streamed once complete.
+Parquet needs the optional ``pyarrow`` package.
+"""
+import csv
+import io
+import json
+import tempfile
+import archive
+import database
+import models
+import stats
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+EXPORT_BATCH_SIZE = 1000
+PARQUET_SPOOL_SIZE = 16 * 1024 * 1024
+FILE_CHUNK_SIZE = 1024 * 1024
+
+META_COLUMNS = ("id", "user_id", "submitted_at", "is_active")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_columns(form_schema):
+    return [field["label"] for field in stats.active_fields(form_schema)]
+
+
+def _rows(form_id, labels):
+    # Runs after the request-scoped session is gone, so it owns a session.
+    db = database.SessionLocal()
+    try:
+        query = db.query(
+            models.FormResponse.id,
+            models.FormResponse.user_id,
+            models.FormResponse.submitted_at,
+            models.FormResponse.is_active,
+            models.FormResponse.response_data,
+        ).filter(
+            models.FormResponse.form_id == form_id
+        ).order_by(models.FormResponse.submitted_at, models.FormResponse.id)
+        rows = archive.merged(query.yield_per(EXPORT_BATCH_SIZE), archive.iter_rows(db, form_id))
+        for row in rows:
+            data = row.response_data if isinstance(row.response_data, dict) else {}
+            yield (row.id, row.user_id, row.submitted_at.isoformat(), row.is_active), [data.get(label) for label in labels]
+    finally:
+        db.close()
+
+
+def _cell(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def stream_csv(form_id, labels):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(META_COLUMNS + tuple(labels))
+    for count, (meta, values) in enumerate(_rows(form_id, labels), 1):
+        writer.writerow(meta + tuple(_cell(v) for v in values))
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(form_id, labels):
+    batch = []
+    for meta, values in _rows(form_id, labels):
+        record = dict(zip(META_COLUMNS, meta))
+        record.update(zip(labels, values))
+        batch.append(json.dumps(record, ensure_ascii=False))
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def stream_parquet(form_id, labels):
+    schema = pyarrow.schema(
+        [("id", pyarrow.int64()), ("user_id", pyarrow.int64()),
+         ("submitted_at", pyarrow.string()), ("is_active", pyarrow.bool_())]
+        + [(label, pyarrow.string()) for label in labels]
+    )
+    with tempfile.SpooledTemporaryFile(max_size=PARQUET_SPOOL_SIZE) as spool:
+        with pyarrow.parquet.ParquetWriter(spool, schema, compression="zstd") as writer:
+            columns = [[] for _ in schema]
+
+            def flush():
+                arrays = [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)]
+                writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+                for column in columns:
+                    column.clear()
+
+            for meta, values in _rows(form_id, labels):
+                for column, value in zip(columns, meta + tuple(_cell(v) for v in values)):
+                    column.append(value)
+                if len(columns[0]) == EXPORT_BATCH_SIZE:
+                    flush()
+            if columns[0]:
+                flush()
+        spool.seek(0)
+        while chunk := spool.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+STREAMERS = {"csv": stream_csv, "ndjson": stream_ndjson, "parquet": stream_parquet}
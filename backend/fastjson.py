@@ -0,0 +1,100 @@
+"""Fast JSON path for the list endpoints.
+
+The default path loads ORM objects, re-validates every row through the
+Pydantic response model and then serializes it. Here rows are selected as
+plain column tuples, the stored document is read as JSON text (no decode on
+the way out of the database) and the page is serialized in one
+``orjson.dumps`` call.
+
+Documents can be sent in two shapes, chosen per request with
+``documents=string|object``:
+
+* ``string`` (default) - ``response_data`` and ``form_schema`` are JSON
+  strings that the client parses again, as before.
+* ``object`` - the stored JSON is embedded as a nested JSON value, so the
+  client gets it parsed along with the page.
+
+``documents=object`` always takes the fast path. ``FAST_JSON=1`` sends
+``documents=string`` requests through it too. The JSON is equivalent but the
+bytes are not: key order, the UTC offset of timestamps and the spacing
+inside the document strings differ from the default path, so it is off
+unless enabled.
+
+``orjson`` (listed in requirements.txt) is still optional at import time.
+Without it the standard library ``json`` is used, and the rows still skip ORM
+hydration and Pydantic.
+"""
+import json
+import os
+from fastapi import Response
+from sqlalchemy import Text, cast
+import models
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+# orjson >= 3.9 embeds JSON text as-is; older versions parse it first.
+_fragment = getattr(orjson, "Fragment", None)
+
+
+def response_columns():
+    return (
+        models.FormResponse.id,
+        models.FormResponse.form_id,
+        models.FormResponse.user_id,
+        models.FormResponse.is_active,
+        models.FormResponse.submitted_at,
+        models.FormResponse.updated_at,
+        cast(models.FormResponse.response_data, Text).label("response_data"),
+    )
+
+
+def form_columns():
+    return (
+        models.Form.id,
+        models.Form.title,
+        models.Form.description,
+        cast(models.Form.form_schema, Text).label("form_schema"),
+        models.Form.version,
+        models.Form.created_at,
+        models.Form.created_by,
+    )
+
+
+def _embed(text):
+    if text is None:
+        return None
+    if _fragment is not None:
+        return _fragment(text)
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _default(value):
+    return value.isoformat()
+
+
+def dumps(items) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(items, option=orjson.OPT_UTC_Z)
+    return json.dumps(items, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with ``dumps``, like FastAPI's ``ORJSONResponse``."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(rows, document: str, embed: bool, headers=None) -> Response:
+    """Serialize column rows; ``document`` names the column holding stored JSON text."""
+    items = [row._asdict() for row in rows]
+    if embed:
+        for item in items:
+            item[document] = _embed(item[document])
+    return ORJSONResponse(items, headers=headers)
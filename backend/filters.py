@@ -0,0 +1,22 @@
+from fastapi import Request
+from sqlalchemy import and_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+import models
+
+def field_filters(request: Request) -> dict:
+    """Collect ``field.<label>=<value>`` query parameters."""
+    return {
+        key[len("field."):]: value
+        for key, value in request.query_params.items()
+        if key.startswith("field.") and len(key) > len("field.")
+    }
+
+def response_field_condition(db, filters: dict):
+    """Equality filter on response_data fields.
+
+    On Postgres this is a JSONB containment test, which the GIN index on
+    response_data answers; elsewhere each field is extracted and compared.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return type_coerce(models.FormResponse.response_data, JSONB).contains(filters)
+    return and_(*(models.FormResponse.response_data[key].as_string() == value for key, value in filters.items()))
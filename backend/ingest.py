@@ -0,0 +1,87 @@
+"""Batched insertion of form responses.
+
+Used by the batch ingestion endpoint and the write-behind queue
+(writebehind.py). Rows are written in chunks with one multi-row
+INSERT ... RETURNING per chunk (SQLAlchemy "insertmanyvalues"), instead of
+one INSERT, commit and refresh per response. On Postgres with
+psycopg2, large batches use COPY: ids are reserved from the table's
+sequence first, so callers still get an id per row.
+
+Callers own the transaction; nothing here commits.
+"""
+import csv
+import io
+import json
+import os
+from sqlalchemy import insert, text
+import counters
+import models
+
+INSERT_CHUNK_SIZE = int(os.getenv("INGEST_INSERT_CHUNK_SIZE", "1000"))
+COPY_THRESHOLD = int(os.getenv("INGEST_COPY_THRESHOLD", "500"))
+
+COPY_COLUMNS = ("id", "form_id", "user_id", "response_data", "is_active", "submitted_at", "updated_at")
+
+
+def _copy_cursor(db):
+    """Return a psycopg2 cursor on the session's connection, or None."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    cursor = db.connection().connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        cursor.close()
+        return None
+    return cursor
+
+
+def reserve_ids(db, n):
+    """Take ``n`` ids from the form_responses sequence (Postgres only)."""
+    return db.execute(
+        text("SELECT nextval(pg_get_serial_sequence('form_responses', 'id')) FROM generate_series(1, :n)"),
+        {"n": n}
+    ).scalars().all()
+
+
+def _copy_responses(db, cursor, rows):
+    # Rows may carry ids reserved earlier (writebehind.py).
+    ids = [row["id"] for row in rows] if "id" in rows[0] else reserve_ids(db, len(rows))
+    now = models.utcnow().isoformat()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row_id, row in zip(ids, rows):
+        writer.writerow((
+            row_id,
+            row["form_id"],
+            row["user_id"],
+            json.dumps(row["response_data"], separators=(",", ":"), ensure_ascii=False),
+            "t" if row.get("is_active", True) else "f",
+            row.get("submitted_at", now),
+            row.get("updated_at", now),
+        ))
+    buffer.seek(0)
+    try:
+        cursor.copy_expert(f"COPY form_responses ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    return ids
+
+
+def insert_responses(db, rows):
+    """Insert response rows (dicts of column values); return their ids in order.
+
+    Rows either all carry an ``id`` or none do. The form counters
+    (counters.py) are updated in the same transaction.
+    """
+    if not rows:
+        return []
+    cursor = _copy_cursor(db) if len(rows) >= COPY_THRESHOLD else None
+    if cursor is not None:
+        ids = _copy_responses(db, cursor, rows)
+    else:
+        stmt = insert(models.FormResponse).returning(models.FormResponse.id, sort_by_parameter_order=True)
+        ids = []
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            ids.extend(db.execute(stmt, rows[start:start + INSERT_CHUNK_SIZE]).scalars().all())
+    # Last, so the counter rows stay locked for as short a time as possible.
+    counters.responses_inserted(db, rows)
+    return ids
@@ -1,9 +1,9 @@
-import models, database
+import migrations
 from database import engine
 
 def init_new_tables():
-    print("Initializing new tables: form_access, form_responses")
-    models.Base.metadata.create_all(bind=engine)
+    print("Applying schema migrations (form_access, form_responses and later tables)...")
+    migrations.run_migrations(engine)
     print("Done!")
 
 if __name__ == "__main__":
@@ -1,13 +1,11 @@
-from sqlalchemy import create_engine
-from database import SQLALCHEMY_DATABASE_URL, Base
-import models  # Import models to register them with Base
+from database import SQLALCHEMY_DATABASE_URL
+from migrations import run_migrations
 
 def init_db():
     print(f"Connecting to: {SQLALCHEMY_DATABASE_URL.split('@')[-1]}") # Log host for debug
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    
-    print("Creating tables in the cloud database...")
-    Base.metadata.create_all(bind=engine)
+
+    print("Applying schema migrations...")
+    run_migrations()
     print("Success! Database initialized.")
 
 if __name__ == "__main__":
@@ -0,0 +1,383 @@
+"""Live response events, pushed to clients over Server-Sent Events.
+
+Writes publish one pre-formatted SSE frame per event; the per-worker ``Hub``
+fans it out to the streams the response's user has open on that form, the
+same rows the listing shows them. Each stream has a bounded queue. A client
+that falls ``LIVE_QUEUE_SIZE`` frames behind is evicted: it gets an
+``evicted`` event and the stream ends. It should then reconnect and
+catch up from the changes feed (changes.py), using the id of the last event
+it saw as ``since``.
+
+Events reach the other gunicorn workers through a transport, chosen with
+``LIVE_TRANSPORT``:
+
+* ``local``    - this process only (single worker, development).
+* ``postgres`` - ``NOTIFY`` on the application database; each worker runs
+  one ``LISTEN`` connection. Frames over the 8000 byte payload limit are sent
+  without the response body.
+* ``unix``     - a broker on the Unix socket ``LIVE_SOCKET_PATH`` relays
+  frames between the workers on one host. The first worker to take the lock
+  file runs it; if that worker exits, the next one to reconnect takes over.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+import time
+import changes
+import database
+import schemas
+from pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+LIVE_TRANSPORT = os.getenv("LIVE_TRANSPORT", "local")
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_SOCKET_PATH = os.getenv("LIVE_SOCKET_PATH", "/tmp/dynamic_forms_live.sock")
+
+PG_CHANNEL = "form_response_events"
+PG_PAYLOAD_LIMIT = 7900
+RECONNECT_DELAY = 1.0
+
+EVICTED_FRAME = 'event: evicted\ndata: {"reason": "slow consumer"}\n\n'
+HEARTBEAT_FRAME = ": keepalive\n\n"
+
+
+def frame(event: str, data: dict, event_id: str = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    """One open stream; it receives its user's events on one form, as the listing shows them."""
+
+    def __init__(self, form_id, user_id, loop):
+        self.form_id = form_id
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+        self.evicted = False
+
+    def offer(self, text):
+        # Runs on the subscriber's event loop.
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self.evicted = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Hub:
+    """Open streams by (form id, user id)."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def subscribe(self, form_id, user_id):
+        subscriber = Subscriber(form_id, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault((form_id, user_id), set()).add(subscriber)
+            self.count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        key = (subscriber.form_id, subscriber.user_id)
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self.count -= 1
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def dispatch(self, form_id, user_id, text):
+        """Hand a frame to ``user_id``'s streams on ``form_id``; callable from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get((form_id, user_id), ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, text)
+            except RuntimeError:  # loop already closed
+                self.unsubscribe(subscriber)
+
+
+class LocalTransport:
+    def __init__(self, hub):
+        self.hub = hub
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if not self._started:
+                self._started = True
+                self._start()
+
+    def _start(self):
+        pass
+
+    def publish(self, form_id, user_id, text):
+        self.hub.dispatch(form_id, user_id, text)
+
+
+class PostgresTransport(LocalTransport):
+    """LISTEN/NOTIFY; every worker, including the publisher, gets frames from its listener.
+
+    NOTIFYs are sent from a background thread, so publishing never blocks a
+    request (or the event loop in async mode) on a database round trip.
+    """
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self._outbox = queue.SimpleQueue()
+
+    def _start(self):
+        threading.Thread(target=self._listen, name="live-listen", daemon=True).start()
+        threading.Thread(target=self._send, name="live-notify", daemon=True).start()
+
+    def publish(self, form_id, user_id, text):
+        payload = json.dumps([form_id, user_id, text])
+        if len(payload.encode()) > PG_PAYLOAD_LIMIT:
+            payload = json.dumps([form_id, user_id, _without_body(text)])
+        self._outbox.put(payload)
+
+    def _send(self):
+        while True:
+            payloads = [self._outbox.get()]
+            while len(payloads) < 100 and not self._outbox.empty():
+                payloads.append(self._outbox.get())
+            try:
+                raw = database.engine.raw_connection()
+                try:
+                    cursor = raw.cursor()
+                    for payload in payloads:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (PG_CHANNEL, payload))
+                    cursor.close()
+                    raw.commit()
+                finally:
+                    raw.close()
+            except Exception:
+                logger.exception("live: NOTIFY failed, %d events dropped", len(payloads))
+
+    def _listen(self):
+        while True:
+            try:
+                raw = database.engine.raw_connection()
+                try:
+                    self._listen_on(raw.driver_connection)
+                finally:
+                    raw.invalidate()
+            except Exception:
+                logger.exception("live: LISTEN connection lost")
+            time.sleep(RECONNECT_DELAY)
+
+    def _listen_on(self, conn):
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {PG_CHANNEL}")
+        cursor.close()
+        if callable(getattr(conn, "notifies", None)):  # psycopg 3
+            while True:
+                for notify in conn.notifies(timeout=LIVE_HEARTBEAT_SECONDS):
+                    self._deliver(notify.payload)
+        while True:  # psycopg2
+            if select.select([conn], [], [], LIVE_HEARTBEAT_SECONDS) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                self._deliver(conn.notifies.pop(0).payload)
+
+    def _deliver(self, payload):
+        form_id, user_id, text = json.loads(payload)
+        self.hub.dispatch(form_id, user_id, text)
+
+
+class UnixSocketTransport(LocalTransport):
+    """Newline-delimited JSON relayed by a broker on a Unix socket."""
+
+    def __init__(self, hub, path):
+        super().__init__(hub)
+        self.path = path
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._broker_lock_file = None
+
+    def _start(self):
+        threading.Thread(target=self._run, name="live-unix", daemon=True).start()
+
+    def publish(self, form_id, user_id, text):
+        sock = self._sock
+        if sock is not None:
+            line = (json.dumps([form_id, user_id, text]) + "\n").encode()
+            try:
+                with self._send_lock:
+                    sock.sendall(line)
+                return
+            except OSError:
+                pass
+        # Broker unreachable: at least this worker's streams get the event.
+        self.hub.dispatch(form_id, user_id, text)
+
+    def _run(self):
+        while True:
+            try:
+                sock = self._connect()
+                self._sock = sock
+                with sock, sock.makefile("rb") as lines:
+                    for line in lines:
+                        form_id, user_id, text = json.loads(line)
+                        self.hub.dispatch(form_id, user_id, text)
+            except OSError:
+                pass
+            self._sock = None
+            time.sleep(RECONNECT_DELAY)
+
+    def _connect(self):
+        try:
+            return self._open()
+        except OSError:
+            self._become_broker()
+            return self._open()
+
+    def _open(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _become_broker(self):
+        if self._broker_lock_file is not None:
+            return
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        self._broker_lock_file = lock_file
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left behind by a broker that died
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(64)
+        threading.Thread(target=_broker, args=(server,), name="live-broker", daemon=True).start()
+
+
+def _broker(server):
+    clients = {}  # socket -> partial line
+
+    def drop(client):
+        clients.pop(client, None)
+        client.close()
+
+    while True:
+        readable, _, _ = select.select([server, *clients], [], [])
+        for sock in readable:
+            if sock is server:
+                client, _ = server.accept()
+                client.settimeout(1.0)
+                clients[client] = b""
+                continue
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                drop(sock)
+                continue
+            *complete, clients[sock] = (clients[sock] + data).split(b"\n")
+            if not complete:
+                continue
+            message = b"\n".join(complete) + b"\n"
+            for client in list(clients):
+                try:
+                    client.sendall(message)
+                except OSError:
+                    drop(client)
+
+
+def _without_body(text):
+    """The same event without its response document, for size-limited transports."""
+    lines = text.rstrip("\n").split("\n")
+    data = json.loads(lines[-1][len("data: "):])
+    response = data.get("response") or {}
+    data["response"] = {"id": response.get("id"), "form_id": response.get("form_id"), "truncated": True}
+    lines[-1] = "data: " + json.dumps(data, separators=(",", ":"))
+    return "\n".join(lines) + "\n\n"
+
+
+def create_transport(hub):
+    if LIVE_TRANSPORT == "postgres":
+        return PostgresTransport(hub)
+    if LIVE_TRANSPORT == "unix":
+        return UnixSocketTransport(hub, LIVE_SOCKET_PATH)
+    if LIVE_TRANSPORT != "local":
+        raise ValueError(f"Unknown LIVE_TRANSPORT: {LIVE_TRANSPORT}")
+    return LocalTransport(hub)
+
+
+hub = Hub()
+transport = create_transport(hub)
+
+
+def _publish(form_id, user_id, text):
+    # Events are best effort: a failed publish must not fail the write.
+    try:
+        transport.start()
+        transport.publish(form_id, user_id, text)
+    except Exception:
+        logger.exception("live: publish failed")
+
+
+def publish_response(event: str, row):
+    """Announce a ``created`` or ``updated`` response after its commit."""
+    response = schemas.FormResponse.model_validate(row)
+    text = frame(event, {"response": response.model_dump(mode="json")}, encode_cursor(row.updated_at, row.id))
+    _publish(row.form_id, row.user_id, text)
+
+
+def publish_batch(form_id: int, user_id: int, created: int):
+    """Batches are announced as one event; clients fetch the rows from the changes feed."""
+    if created:
+        _publish(form_id, user_id, frame("batch", {"form_id": form_id, "created": created}))
+
+
+def at_capacity() -> bool:
+    return hub.count >= LIVE_MAX_SUBSCRIBERS
+
+
+async def stream(form_id: int, user_id):
+    """SSE frames for one client until it disconnects or is evicted."""
+    transport.start()
+    subscriber = hub.subscribe(form_id, user_id)
+    try:
+        yield "retry: 5000\n\n"
+        # Cursor into the changes feed for anything written before this stream.
+        yield frame("ready", {"form_id": form_id}, changes.watermark_cursor())
+        while True:
+            try:
+                text = await asyncio.wait_for(subscriber.queue.get(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_FRAME
+                continue
+            if text is None:
+                yield EVICTED_FRAME
+                return
+            yield text
+    finally:
+        hub.unsubscribe(subscriber)
@@ -1,18 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import contextlib
+import itertools
 import traceback
 import logging
+import json
+from datetime import datetime
+from sqlalchemy import tuple_, cast, Text
 from sqlalchemy.orm import Session
-from typing import List
-import models, schemas, auth, database, os
-from database import engine
+from typing import List, Optional
+import models, schemas, auth, database, validators, ingest, stats, exports, etags, access, changes, live, fastjson, metrics, writebehind, counters, archive, search, revisions, warmup, os
+from pagination import (
+    RESPONSES_PAGE_SIZE, RESPONSES_MAX_PAGE_SIZE, RESPONSES_STREAM_BATCH,
+    ACCESS_PAGE_SIZE, ACCESS_MAX_PAGE_SIZE,
+    encode_cursor, decode_cursor
+)
+from filters import field_filters, response_field_condition
 
 # Tables are created via init_db.py manual step
 # models.Base.metadata.create_all(bind=engine)
 
 
-app = FastAPI(title="Dynamic Forms Backend")
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    writebehind.start()
+    await warmup.warm_up()
+    yield
+    warmup.stop()
+    # Drain queued submissions before the worker exits.
+    await run_in_threadpool(writebehind.stop)
+
+
+app = FastAPI(title="Dynamic Forms Backend", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -21,7 +42,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Changes-Cursor", "ETag", "Server-Timing"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.install_engine_events()
 
 # Global Error Logger
 @app.exception_handler(Exception)
@@ -37,43 +61,62 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+@app.get("/livez")
+def liveness_check():
+    """The process is up and serving; says nothing about the database."""
+    return {"status": "alive"}
 
-@app.get("/api/system/reset-db")
-def reset_database():
-    # Dangerous: Only for deployment debugging
-    models.Base.metadata.drop_all(bind=engine)
-    models.Base.metadata.create_all(bind=engine)
-    return {"message": "Database reset successfully. All tables recreated."}
+@app.get("/readyz")
+async def readiness_check():
+    """200 once this worker is warmed up (warmup.py) and its pools reach the database."""
+    ready, body = await warmup.readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=body)
 
-@app.post("/api/signup", response_model=schemas.User)
+# Older probes and scripts still call /health; it stays a liveness check so
+# they do not start failing during warm-up.
+app.add_api_route("/health", liveness_check, methods=["GET"], include_in_schema=False)
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics.metrics_response()
 
-def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.mobile_number == user.mobile_number).first()
+# signup and login are async so that bcrypt runs on the dedicated password
+# pool (auth.run_password_job); their queries are pushed to the threadpool.
+@app.post("/api/signup", response_model=schemas.User)
+async def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    db_user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.mobile_number == user.mobile_number).first()
+    )
     if db_user:
         raise HTTPException(status_code=400, detail="Mobile number already registered")
     
-    # First user is admin (for demo purposes)
-    is_admin = db.query(models.User).count() == 0
+    # First user is admin (for demo purposes); EXISTS stops at the first row.
+    is_admin = await run_in_threadpool(lambda: not db.query(db.query(models.User.id).exists()).scalar())
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     new_user = models.User(
         mobile_number=user.mobile_number, 
         password_hash=hashed_password,
         is_admin=is_admin
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+
+    await run_in_threadpool(save)
     return new_user
 
 @app.post("/api/login", response_model=schemas.Token)
-def login(user_data: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.mobile_number == user_data.mobile_number).first()
-    if not user or not auth.verify_password(user_data.password, user.password_hash):
+async def login(user_data: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.mobile_number == user_data.mobile_number).first()
+    )
+    is_valid, new_hash = (False, None)
+    if user:
+        is_valid, new_hash = await auth.verify_and_update_password_async(user_data.password, user.password_hash)
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect mobile number or password",
@@ -81,6 +124,10 @@ def login(user_data: schemas.UserCreate, db: Session = Depends(database.get_db))
         )
     if not user.is_active:
         raise HTTPException(status_code=401, detail="Account deactivated")
+
+    if new_hash:
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
         
     access_token = auth.create_access_token(data={"sub": user.mobile_number})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -95,20 +142,23 @@ def update_profile(
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
+    # current_user may be a cached snapshot; edit the row in this session.
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
     if profile_data.first_name:
-        current_user.first_name = profile_data.first_name
+        user.first_name = profile_data.first_name
     if profile_data.last_name:
-        current_user.last_name = profile_data.last_name
+        user.last_name = profile_data.last_name
     
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    auth.invalidate_principal(user.mobile_number)
+    return user
 
 
 @app.get("/api/admin/users", response_model=List[schemas.User])
 def get_all_users(
     admin_user: models.User = Depends(auth.get_admin_user), 
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(auth.get_read_db)
 ):
     return db.query(models.User).all()
 
@@ -128,6 +178,7 @@ def toggle_user_status(
     user.is_active = not user.is_active
     db.commit()
     db.refresh(user)
+    auth.invalidate_principal(user.mobile_number)
     return user
 
 # Dynamic Forms APIs
@@ -140,7 +191,7 @@ def create_form(
     db_form = models.Form(
         title=form.title,
         description=form.description,
-        form_schema=form.form_schema,
+        form_schema=json.loads(form.form_schema),
         created_by=current_user.id
     )
 
@@ -150,34 +201,53 @@ def create_form(
     db.refresh(db_form)
     return db_form
 
-@app.get("/api/forms", response_model=List[schemas.Form])
+@app.get("/api/forms", response_model=List[schemas.FormListItem])
 def get_forms(
+    request: Request,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(auth.get_read_db)
 ):
-    return db.query(models.Form).filter(models.Form.created_by == current_user.id).all()
+    forms = db.execute(counters.owned_forms_stmt(current_user.id)).all()
+    etag = etags.forms_list_etag(forms)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+
+    # Only forms whose serialized body is not cached yet are loaded in full.
+    bodies = {f.id: etags.form_bodies.get((f.id, f.version)) for f in forms}
+    missing = [form_id for form_id, body in bodies.items() if body is None]
+    if missing:
+        for form in db.query(models.Form).filter(models.Form.id.in_(missing)):
+            bodies[form.id] = etags.form_body(form)
+    items = (etags.with_fields(bodies[f.id], fastjson.dumps(counters.counts(f))) for f in forms)
+    return etags.json_body(b"[" + b",".join(items) + b"]", etag)
 
 @app.get("/api/forms/{form_id}", response_model=schemas.Form)
 def get_form(
     form_id: int,
+    request: Request,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    form = db.query(models.Form).filter(models.Form.id == form_id).first()
+    # The schema column is only read when the body is neither cached by the
+    # client (If-None-Match) nor by this worker.
+    form = db.query(models.Form.id, models.Form.created_by, models.Form.version).filter(models.Form.id == form_id).first()
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
     # Allow access if user is creator OR has been granted access
-    if form.created_by != current_user.id:
-        access = db.query(models.FormAccess).filter(
-            models.FormAccess.form_id == form_id,
-            models.FormAccess.user_id == current_user.id,
-            models.FormAccess.has_access == True
-        ).first()
-        if not access:
-            raise HTTPException(status_code=403, detail="Forbidden: You do not have access to this form")
-            
-    return form
+    if form.created_by != current_user.id and not access.has_access(db, form_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Forbidden: You do not have access to this form")
+
+    etag = etags.form_etag(form.id, form.version)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+
+    body = etags.form_bodies.get((form.id, form.version))
+    if body is None:
+        db_form = db.query(models.Form).filter(models.Form.id == form_id).first()
+        body = etags.form_body(db_form)
+        etag = etags.form_etag(db_form.id, db_form.version)
+    return etags.json_body(body, etag)
 
 
 @app.put("/api/forms/{form_id}", response_model=schemas.Form)
@@ -193,33 +263,38 @@ def update_form(
     
     db_form.title = form_update.title
     db_form.description = form_update.description
-    db_form.form_schema = form_update.form_schema
+    db_form.form_schema = json.loads(form_update.form_schema)
+    db_form.version = models.Form.version + 1
 
     
     db.commit()
     db.refresh(db_form)
+    validators.invalidate(form_id)
     return db_form
 
 # Form Access Management (Admin)
 @app.get("/api/admin/forms/{form_id}/access", response_model=List[schemas.UserAccessInfo])
 def get_form_access(
     form_id: int,
+    response: Response,
+    q: Optional[str] = None,
+    granted: Optional[bool] = None,
+    limit: int = Query(ACCESS_PAGE_SIZE, ge=1, le=ACCESS_MAX_PAGE_SIZE),
+    after: Optional[int] = None,
     admin_user: models.User = Depends(auth.get_admin_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(auth.get_read_db)
 ):
-    users = db.query(models.User).filter(models.User.is_admin == False).all()
-    access_records = db.query(models.FormAccess).filter(models.FormAccess.form_id == form_id).all()
-    access_map = {a.user_id: a.has_access for a in access_records}
-    
-    return [
-        schemas.UserAccessInfo(
-            user_id=u.id,
-            mobile_number=u.mobile_number,
-            first_name=u.first_name,
-            last_name=u.last_name,
-            has_access=access_map.get(u.id, False)
-        ) for u in users
-    ]
+    """Non-admin users and their access to the form, one page at a time.
+
+    ``q`` matches a mobile number, first or last name prefix; ``granted``
+    keeps only users with (or without) access. The next page starts after
+    the id in the X-Next-Cursor header.
+    """
+    rows = db.execute(access.access_page_stmt(form_id, q, granted, after, limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].user_id)
+    return [schemas.UserAccessInfo.model_validate(row._mapping) for row in rows]
 
 @app.put("/api/admin/forms/{form_id}/access")
 def update_form_access(
@@ -228,74 +303,397 @@ def update_form_access(
     admin_user: models.User = Depends(auth.get_admin_user),
     db: Session = Depends(database.get_db)
 ):
-    record = db.query(models.FormAccess).filter(
-        models.FormAccess.form_id == form_id, 
-        models.FormAccess.user_id == access_data.user_id
-    ).first()
-    
-    if record:
-        record.has_access = access_data.has_access
-    else:
-        new_record = models.FormAccess(
-            form_id=form_id, 
-            user_id=access_data.user_id, 
-            has_access=access_data.has_access
-        )
-        db.add(new_record)
-    
+    # Grants of one form are serialized on its access counter, so the previous
+    # state read here is still current when the upsert runs.
+    counters.lock_access(db, form_id)
+    previous = db.query(models.FormAccess.has_access).filter(
+        models.FormAccess.form_id == form_id, models.FormAccess.user_id == access_data.user_id
+    ).scalar()
+    # Single upsert on the (form_id, user_id) unique constraint, so concurrent
+    # updates for the same user cannot insert duplicate rows.
+    insert = database.dialect_insert(db)
+    stmt = insert(models.FormAccess).values(
+        form_id=form_id,
+        user_id=access_data.user_id,
+        has_access=access_data.has_access
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.FormAccess.form_id, models.FormAccess.user_id],
+        set_={"has_access": stmt.excluded.has_access}
+    )
+    db.execute(stmt)
+    counters.access_changed(db, form_id, int(access_data.has_access) - int(bool(previous)))
     db.commit()
+    access.invalidate(access_data.user_id)
     return {"message": "Access updated"}
 
+@app.post("/api/admin/forms/{form_id}/access:bulk", response_model=schemas.FormAccessBulkResult)
+def bulk_update_form_access(
+    form_id: int,
+    bulk: schemas.FormAccessBulkUpdate,
+    admin_user: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(database.get_db)
+):
+    """Grant or revoke access for many users with one INSERT ... SELECT upsert."""
+    if not db.query(models.Form.id).filter(models.Form.id == form_id).first():
+        raise HTTPException(status_code=404, detail="Form not found")
+    counters.lock_access(db, form_id)
+    stmt = access.bulk_upsert_stmt(database.dialect_insert(db), form_id, bulk.has_access, bulk.user_ids, bulk.q)
+    updated = db.execute(stmt).rowcount
+    counters.recount_access(db, form_id)
+    db.commit()
+    access.invalidate_users(bulk.user_ids)
+    return {"updated": updated}
+
+def form_schema_text(db: Session, form_id: int) -> Optional[str]:
+    """The stored schema as JSON text, without decoding it."""
+    return db.query(cast(models.Form.form_schema, Text)).filter(models.Form.id == form_id).scalar()
+
+def get_owned_form(db: Session, form_id: int, current_user: models.User):
+    """Form id, owner, version and schema text, for endpoints reserved to the owner or an admin."""
+    form = db.query(
+        models.Form.id, models.Form.created_by, models.Form.version,
+        cast(models.Form.form_schema, Text).label("form_schema")
+    ).filter(models.Form.id == form_id).first()
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    if form.created_by != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden: You do not own this form")
+    return form
+
+@app.get("/api/forms/{form_id}/stats")
+def get_form_stats(
+    form_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Per-field aggregates over the form's active responses (owner or admin)."""
+    form = get_owned_form(db, form_id, current_user)
+    return stats.get_form_stats(db, form_id, form.version, form.form_schema)
+
+@app.get("/api/forms/{form_id}/responses/export")
+def export_responses(
+    form_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Stream every response of the form (owner or admin), one column per active field."""
+    form = get_owned_form(db, form_id, current_user)
+    if format == "parquet" and exports.pyarrow is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+
+    labels = exports.export_columns(form.form_schema)
+    # The stream reads through its own session; the request's session would
+    # otherwise keep a second connection until the whole body is sent.
+    db.close()
+    return StreamingResponse(
+        exports.STREAMERS[format](form_id, labels),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="form-{form_id}-responses.{format}"'}
+    )
+
 # Shared Forms and Responses (Users)
 @app.get("/api/user/shared-forms", response_model=List[schemas.Form])
 def get_shared_forms(
+    documents: str = Query("string", pattern="^(string|object)$"),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(auth.get_read_db)
 ):
-    shared_ids = db.query(models.FormAccess.form_id).filter(
+    query = db.query(models.Form).join(
+        models.FormAccess, models.FormAccess.form_id == models.Form.id
+    ).filter(
         models.FormAccess.user_id == current_user.id,
         models.FormAccess.has_access == True
-    ).all()
-    form_ids = [s[0] for s in shared_ids]
-    return db.query(models.Form).filter(models.Form.id.in_(form_ids)).all()
+    )
+    if fastjson.FAST_JSON or documents == "object":
+        rows = query.with_entities(*fastjson.form_columns()).all()
+        return fastjson.rows_response(rows, "form_schema", embed=documents == "object")
+    return query.all()
 
 @app.post("/api/forms/{form_id}/responses", response_model=schemas.FormResponse)
 def submit_response(
     form_id: int,
     response: schemas.FormResponseCreate,
+    reply: Response,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    # Verify access
-    access = db.query(models.FormAccess).filter(
-        models.FormAccess.form_id == form_id,
-        models.FormAccess.user_id == current_user.id,
-        models.FormAccess.has_access == True
-    ).first()
-    
-    if not access:
+    if not access.has_access(db, form_id, current_user.id):
         raise HTTPException(status_code=403, detail="No access to this form")
-        
+    version = db.query(models.Form.version).filter(models.Form.id == form_id).scalar()
+    validator = validators.get_validator(form_id, version, lambda: form_schema_text(db, form_id))
+    response_data = validators.validate_response_data(validator, response.response_data)
+
+    pending = writebehind.submit(form_id, current_user.id, response_data)
+    if pending is not None:
+        db.close()  # don't hold a pooled connection while the batch commits
+        row, committed = writebehind.acknowledgement(pending)
+        if not committed:
+            reply.status_code = status.HTTP_202_ACCEPTED
+        return row
+
     new_response = models.FormResponse(
         form_id=form_id,
         user_id=current_user.id,
-        response_data=response.response_data
+        response_data=response_data
     )
     db.add(new_response)
+    db.flush()
+    counters.responses_inserted(db, [{"form_id": form_id, "submitted_at": new_response.submitted_at}])
     db.commit()
     db.refresh(new_response)
+    stats.record_write(form_id, new_data=response_data)
+    live.publish_response("created", new_response)
     return new_response
 
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """Accept a JSON array or NDJSON (one item per line)."""
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return items
+
+def batch_item_data(item):
+    # Items use the single-submit shape; response_data may also be an object.
+    data = item.get("response_data") if isinstance(item, dict) else None
+    if data is None:
+        raise HTTPException(status_code=422, detail=[{"field": "response_data", "msg": "is required"}])
+    return data if isinstance(data, str) else json.dumps(data)
+
+@app.post("/api/forms/{form_id}/responses:batch", response_model=schemas.BatchResult)
+async def submit_responses_batch(
+    form_id: int,
+    request: Request,
+    atomic: bool = False,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Submit many responses at once (e.g. offline sync).
+
+    Access is checked once and valid items are inserted in batches within one
+    transaction. Invalid items are reported per index; with ``atomic=true``
+    nothing is written if any item is invalid.
+    """
+    items = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} responses per batch")
+
+    def ingest_batch():
+        if not access.has_access(db, form_id, current_user.id):
+            raise HTTPException(status_code=403, detail="No access to this form")
+
+        version = db.query(models.Form.version).filter(models.Form.id == form_id).scalar()
+        validator = validators.get_validator(form_id, version, lambda: form_schema_text(db, form_id))
+        results, rows = [], []
+        for index, item in enumerate(items):
+            try:
+                data = validators.validate_response_data(validator, batch_item_data(item))
+            except HTTPException as exc:
+                results.append(schemas.BatchItemResult(index=index, status="invalid", errors=exc.detail))
+                continue
+            results.append(schemas.BatchItemResult(index=index, status="created"))
+            rows.append({"form_id": form_id, "user_id": current_user.id, "response_data": data})
+
+        failed = len(items) - len(rows)
+        if atomic and failed:
+            for result in results:
+                if result.status == "created":
+                    result.status = "skipped"
+            raise HTTPException(
+                status_code=422,
+                detail=schemas.BatchResult(created=0, failed=failed, results=results).model_dump()
+            )
+
+        ids = iter(ingest.insert_responses(db, rows))
+        db.commit()
+        stats.invalidate(form_id)
+        live.publish_batch(form_id, current_user.id, len(rows))
+        for result in results:
+            if result.status == "created":
+                result.id = next(ids)
+        return schemas.BatchResult(created=len(rows), failed=failed, results=results)
+
+    return await run_in_threadpool(ingest_batch)
+
+def responses_page_query(db: Session, form_id: int, user_id: int, after: Optional[str], filters: Optional[dict] = None):
+    query = db.query(models.FormResponse).filter(
+        models.FormResponse.form_id == form_id,
+        models.FormResponse.user_id == user_id
+    )
+    if filters:
+        query = query.filter(response_field_condition(db, filters))
+    if after:
+        query = query.filter(
+            tuple_(models.FormResponse.submitted_at, models.FormResponse.id) > tuple_(*decode_cursor(after))
+        )
+    return query.order_by(models.FormResponse.submitted_at, models.FormResponse.id)
+
+def with_archived(db: Session, rows, form_id: int, user_id: int, after: Optional[str], filters: dict, limit: Optional[int] = None):
+    """Merge the user's archived responses (archive.py) into ordered listing rows."""
+    archived = archive.iter_rows(db, form_id, user_id, decode_cursor(after) if after else None, filters)
+    merged = archive.merged(rows, archived)
+    return itertools.islice(merged, limit) if limit else merged
+
+def stream_responses_ndjson(form_id: int, user_id: int, after: Optional[str], limit: Optional[int], filters: dict):
+    # Request-scoped sessions are only closed after a streamed body has been
+    # sent, so the stream owns its session and the handler releases its own
+    # before returning. yield_per uses a server-side cursor on Postgres and
+    # keeps memory flat regardless of the number of rows.
+    db = database.read_sessionmaker(user_id)()
+    try:
+        query = responses_page_query(db, form_id, user_id, after, filters)
+        if limit:
+            query = query.limit(limit)
+        for row in with_archived(db, query.yield_per(RESPONSES_STREAM_BATCH), form_id, user_id, after, filters, limit):
+            yield schemas.FormResponse.model_validate(row).model_dump_json() + "\n"
+    finally:
+        db.close()
+
 @app.get("/api/forms/{form_id}/responses", response_model=List[schemas.FormResponse])
 def get_user_responses(
     form_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=RESPONSES_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    documents: str = Query("string", pattern="^(string|object)$"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(auth.get_read_db)
+):
+    """Own responses; ``documents=object`` embeds response_data as JSON.
+
+    Paged when ``limit`` or ``after`` is given, otherwise every row.
+    """
+    filters = field_filters(request)
+    if format == "ndjson":
+        if after:
+            decode_cursor(after)
+        db.close()
+        return StreamingResponse(
+            stream_responses_ndjson(form_id, current_user.id, after, limit, filters),
+            media_type="application/x-ndjson"
+        )
+
+    # Clients that predate paging fetch the whole listing without a limit.
+    paged = limit is not None or after is not None
+    limit = limit or RESPONSES_PAGE_SIZE
+    fetch = limit + 1 if paged else None
+    response.headers["X-Changes-Cursor"] = changes.watermark_cursor(database.replica_lag(db))
+    query = responses_page_query(db, form_id, current_user.id, after, filters).limit(fetch)
+    fast = fastjson.FAST_JSON or documents == "object"
+    rows = (query.with_entities(*fastjson.response_columns()) if fast else query).all()
+    rows = list(with_archived(db, rows, form_id, current_user.id, after, filters, fetch))
+    if paged and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    if fast:
+        return fastjson.rows_response(rows, "response_data", documents == "object", dict(response.headers))
+    return rows
+
+def response_scope(db: Session, form_id: int, current_user: models.User) -> int:
+    """Whose responses the feeds of a form return: the user's own, as in the listing.
+
+    The form owner and admins are no exception; their clients merge feed rows
+    into the listing, and only their own rows can be edited there.
+    """
+    if db.query(models.Form.id).filter(models.Form.id == form_id).first() is None:
+        raise HTTPException(status_code=404, detail="Form not found")
+    return current_user.id
+
+@app.get("/api/forms/{form_id}/responses/changes", response_model=schemas.ResponseChanges)
+def get_response_changes(
+    form_id: int,
+    since: Optional[str] = None,
+    limit: int = Query(changes.CHANGES_PAGE_SIZE, ge=1, le=changes.CHANGES_MAX_PAGE_SIZE),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    return db.query(models.FormResponse).filter(
-        models.FormResponse.form_id == form_id,
-        models.FormResponse.user_id == current_user.id
-    ).all()
+    """The user's responses inserted, edited or deactivated after the ``since`` cursor.
+
+    Scoped like the listing. Without ``since`` the feed starts from the first
+    response.
+    """
+    user_id = response_scope(db, form_id, current_user)
+    rows = db.execute(changes.changes_stmt(form_id, user_id, since, limit)).scalars().all()
+    return changes.changes_page(rows, since, limit)
+
+@app.get("/api/forms/{form_id}/responses/search", response_model=List[schemas.ResponseSearchHit])
+def search_responses(
+    form_id: int,
+    request: Request,
+    q: str = "",
+    limit: int = Query(search.SEARCH_PAGE_SIZE, ge=1, le=search.SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(auth.get_read_db)
+):
+    """Responses matching every word of ``q`` and each ``field.<label>=<prefix>``, best first.
+
+    Scoped like the changes feed. Each hit has a ``score`` and a ``snippet``
+    with the matches highlighted.
+    """
+    fields = field_filters(request)
+    if not search.terms(q) and not fields:
+        raise HTTPException(status_code=400, detail="Nothing to search for")
+    user_id = response_scope(db, form_id, current_user)
+    rows = db.execute(search.search_stmt(db, form_id, user_id, q, fields, limit, offset)).all()
+    return search.hits(rows)
+
+@app.get("/api/forms/{form_id}/responses/as-of", response_model=List[schemas.FormResponse])
+def get_responses_as_of(
+    form_id: int,
+    response: Response,
+    at: datetime,
+    limit: Optional[int] = Query(None, ge=1, le=RESPONSES_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(auth.get_read_db)
+):
+    """Responses submitted by ``at``, with the values they had then.
+
+    Scoped like the changes feed and paged like the listing (``X-Next-Cursor``).
+    Edits are undone from the revision log (revisions.py).
+    """
+    user_id = response_scope(db, form_id, current_user)
+    limit = limit or RESPONSES_PAGE_SIZE
+    rows = revisions.as_of(db, form_id, user_id, at, decode_cursor(after) if after else None, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["submitted_at"], rows[-1]["id"])
+    return rows
+
+@app.get("/api/forms/{form_id}/responses/live")
+def stream_live_responses(
+    form_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Server-Sent Events for responses created or updated from now on.
+
+    Scoped like the changes feed. Event ids are changes-feed cursors, so a
+    client that reconnects (or is evicted for reading too slowly) catches up
+    with ``/responses/changes?since=<last event id>``.
+    """
+    user_id = response_scope(db, form_id, current_user)
+    # The request's session is only closed after the stream ends; hand its
+    # connection back now rather than hold it for as long as the client listens.
+    db.close()
+    if live.at_capacity():
+        raise HTTPException(status_code=503, detail="Too many live streams", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        live.stream(form_id, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.put("/api/responses/{response_id}", response_model=schemas.FormResponse)
 def update_response(
@@ -304,22 +702,71 @@ def update_response(
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    db_response = db.query(models.FormResponse).filter(
+    # The row stays locked until the commit, so concurrent edits of one
+    # response are applied one after the other and each revision patch is
+    # taken against the version the previous edit left.
+    query = db.query(models.FormResponse).filter(
         models.FormResponse.id == response_id,
         models.FormResponse.user_id == current_user.id
-    ).first()
+    ).with_for_update()
+    db_response = query.first()
+    # An archived response is moved back to the hot table before it is edited.
+    if not db_response and archive.restore(db, current_user.id, response_id):
+        db_response = query.first()
     
     if not db_response:
         raise HTTPException(status_code=404, detail="Response record not found")
         
+    old_data = db_response.response_data if db_response.is_active else None
+    previous = revisions.snapshot(db_response)
     if response_update.response_data is not None:
-        db_response.response_data = response_update.response_data
-    if response_update.is_active is not None:
+        version = db.query(models.Form.version).filter(models.Form.id == db_response.form_id).scalar()
+        validator = validators.get_validator(
+            db_response.form_id, version, lambda: form_schema_text(db, db_response.form_id)
+        )
+        db_response.response_data = validators.validate_response_data(validator, response_update.response_data)
+    if response_update.is_active is not None and response_update.is_active != (db_response.is_active is not False):
         db_response.is_active = response_update.is_active
-        
+        counters.response_toggled(db, db_response.form_id, response_update.is_active)
+    revisions.record(db, db_response, previous, current_user.id)
+
     db.commit()
     db.refresh(db_response)
+    stats.record_write(
+        db_response.form_id,
+        old_data=old_data,
+        new_data=db_response.response_data if db_response.is_active else None
+    )
+    live.publish_response("updated", db_response)
     return db_response
 
-
-
+@app.get("/api/responses/{response_id}/revisions", response_model=List[schemas.ResponseRevision])
+def get_response_revisions(
+    response_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Edits of a response, newest first; visible to its owner, like the response itself."""
+    row = revisions.current(db, response_id)
+    if row is None or row.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Response record not found")
+    return revisions.history(db, row)
+
+
+# Run once per engine when a worker starts (warmup.py), with ids that match
+# nothing, so the first real requests find these statements compiled.
+@warmup.hot_query
+def warm_request_queries(db: Session):
+    db.query(models.User).filter(models.User.mobile_number == "").first()
+    db.execute(counters.owned_forms_stmt(0)).all()
+    db.query(models.Form.id, models.Form.created_by, models.Form.version).filter(models.Form.id == 0).first()
+    db.execute(access.granted_form_ids_stmt(0)).all()
+    db.query(models.Form.version).filter(models.Form.id == 0).scalar()
+    page = responses_page_query(db, 0, 0, None).limit(1)
+    page.all()
+    page.with_entities(*fastjson.response_columns()).all()
+
+
+if database.DB_MODE == "async":
+    import async_api
+    async_api.install(app)
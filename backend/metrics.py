@@ -0,0 +1,275 @@
+"""Request and database instrumentation, exposed in Prometheus text format.
+
+``MetricsMiddleware`` (plain ASGI, so streaming responses are unaffected)
+records per-route latency histograms, request counts and in-flight requests.
+SQLAlchemy cursor events count statements and database time for the request
+that issued them (tracked in a context variable, which follows handlers into
+the threadpool). ``database.TimedQueuePool`` reports pool checkout waits.
+
+On top of that:
+
+* a request that runs the same SELECT more than ``N_PLUS_ONE_THRESHOLD``
+  times is logged as a likely N+1 and counted in ``db_n_plus_one_total``;
+* statements slower than ``SLOW_QUERY_MS`` are logged with their SQL and the
+  names (not values) of their bound parameters;
+* with ``SERVER_TIMING=1`` each response carries a ``Server-Timing`` header
+  with app, db and pool time.
+
+Metrics are per worker process; with several gunicorn workers each scrape of
+``/metrics`` shows the worker that answered it (labelled with its pid).
+"""
+import collections
+import contextvars
+import logging
+import os
+import threading
+import time
+from fastapi import Response
+from sqlalchemy import event
+import database
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+PID = str(os.getpid())
+
+
+def _labels(names, values):
+    pairs = [("worker", PID)] + list(zip(names, values))
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        self.name, self.help, self.label_names = name, help_, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, help_, labels=(), collect=None):
+        super().__init__(name, help_, labels)
+        self.collect = collect
+
+    def samples(self):
+        if self.collect is not None:
+            return [(self.name, (), self.collect())]
+        return super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help_, labels
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for labels, entry in self._values.items():
+                for bound, count in zip(self.buckets, entry):
+                    out.append((self.name + "_bucket", labels + (("le", _format(bound)),), count))
+                out.append((self.name + "_bucket", labels + (("le", "+Inf"),), entry[-1]))
+                out.append((self.name + "_sum", labels, entry[-2]))
+                out.append((self.name + "_count", labels, entry[-1]))
+        return out
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _pool_checked_out():
+    return database.engine.pool.checkedout() if hasattr(database.engine.pool, "checkedout") else 0
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests.", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "Time to the end of the response body.", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled.")
+STATEMENTS = Histogram("db_statements_per_request", "SQL statements per request.", ("route",), COUNT_BUCKETS)
+QUERY_TIME = Histogram("db_query_duration_seconds", "SQL statement execution time.", (), QUERY_BUCKETS)
+SLOW_QUERIES = Counter("db_slow_queries_total", f"Statements slower than {SLOW_QUERY_MS:g} ms.")
+N_PLUS_ONE = Counter("db_n_plus_one_total", "Requests that repeated one SELECT too often.", ("route",))
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time waiting for a pooled connection.", (), QUERY_BUCKETS)
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections checked out of the sync pool.", collect=_pool_checked_out)
+
+REGISTRY = (REQUESTS, LATENCY, IN_FLIGHT, STATEMENTS, QUERY_TIME, SLOW_QUERIES, N_PLUS_ONE, POOL_WAIT, POOL_CHECKED_OUT)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "pool_wait", "selects")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.selects = collections.Counter()
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    QUERY_TIME.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        if statement.lstrip()[:6].upper() == "SELECT":
+            stats.selects[statement] += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning("slow query (%.1f ms): %s params=%s", elapsed * 1000, statement, _redact(parameters))
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute.
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _redact(parameters):
+    """Parameter names (or count) only; values may hold personal data."""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}=?" for key in parameters) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f"<{len(parameters)} parameter sets>"
+        return f"<{len(parameters)} values>"
+    return "<redacted>"
+
+
+def _checkout_wait(seconds):
+    POOL_WAIT.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+def install_engine_events():
+    engines = [database.engine]
+    if database.read_engine is not database.engine:
+        engines.append(database.read_engine)
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    if database.async_read_engine is not database.async_engine:
+        engines.append(database.async_read_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    database.checkout_wait_listeners.append(_checkout_wait)
+
+
+def _route_of(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", _server_timing(stats, time.perf_counter() - started).encode())
+                    ]
+            await send(message)
+
+        IN_FLIGHT.inc(amount=1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.inc(amount=-1)
+            _current.reset(token)
+            route = _route_of(scope)
+            REQUESTS.inc(scope["method"], route, str(status))
+            LATENCY.observe(time.perf_counter() - started, scope["method"], route)
+            STATEMENTS.observe(stats.statements, route)
+            repeated = [(sql, n) for sql, n in stats.selects.items() if n > N_PLUS_ONE_THRESHOLD]
+            if repeated:
+                N_PLUS_ONE.inc(route)
+                sql, n = max(repeated, key=lambda item: item[1])
+                logger.warning("possible N+1 in %s %s: %d x %s", scope["method"], route, n, sql)
+
+
+def _server_timing(stats, app_seconds):
+    return (
+        f'app;dur={app_seconds * 1000:.1f}, '
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries", '
+        f'pool;dur={stats.pool_wait * 1000:.1f}'
+    )
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            names = list(metric.label_names)
+            values = list(labels)
+            if values and isinstance(values[-1], tuple):  # histogram "le"
+                extra_name, extra_value = values.pop()
+                names.append(extra_name)
+                values.append(extra_value)
+            lines.append(f"{name}{_labels(names, values)} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response() -> Response:
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,316 @@
+"""Versioned schema migrations.
+
+Each migration runs once and is recorded in ``schema_migrations``. Every step
+is also written to be idempotent, so running the runner against a database
+that was created or patched by hand is safe. Indexes are built
+``CONCURRENTLY`` on Postgres so that they do not lock writes on large tables;
+on SQLite (local development and tests) the plain statements are used.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied / pending migrations
+"""
+import sys
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table, func, inspect, text
+from database import engine as default_engine
+import models
+
+MIGRATIONS = []
+
+
+def migration(version, name, transactional=True):
+    """Register a migration step.
+
+    Non-transactional steps run on an autocommit connection, which Postgres
+    requires for ``CREATE INDEX CONCURRENTLY``.
+    """
+    def register(fn):
+        MIGRATIONS.append((version, name, transactional, fn))
+        return fn
+    return register
+
+
+def has_column(conn, table, column):
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def column_type(conn, table, column):
+    for c in inspect(conn).get_columns(table):
+        if c["name"] == column:
+            return c["type"].__class__.__name__.upper()
+
+
+def is_postgres(conn):
+    return conn.dialect.name == "postgresql"
+
+
+def create_index(conn, name, table, columns, unique=False, where=None, using=None):
+    """Create an index if it does not exist yet, concurrently on Postgres."""
+    unique_sql = "UNIQUE " if unique else ""
+    using_sql = f" USING {using}" if using else ""
+    where_sql = f" WHERE {where}" if where else ""
+    if is_postgres(conn):
+        # An interrupted concurrent build leaves an INVALID index behind that
+        # IF NOT EXISTS would happily skip; drop it so the build is retried.
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON {table}{using_sql} ({columns}){where_sql}"
+        ))
+    else:
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns}){where_sql}"
+        ))
+
+
+# The tables as the first release created them. Migration 1 must not follow
+# models.py: the later migrations bring these up to date, and a fresh
+# database has to reach the same schema as an upgraded one.
+INITIAL_METADATA = MetaData()
+
+Table(
+    "users", INITIAL_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("mobile_number", String(10), unique=True, index=True, nullable=False),
+    Column("password_hash", String, nullable=False),
+    Column("first_name", String, nullable=True),
+    Column("last_name", String, nullable=True),
+    Column("is_admin", Boolean, default=False),
+    Column("is_active", Boolean, default=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "forms", INITIAL_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String, nullable=False),
+    Column("description", String),
+    Column("form_schema", String),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("created_by", Integer, index=True),
+)
+
+Table(
+    "form_access", INITIAL_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("form_id", Integer, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("has_access", Boolean, default=True),
+)
+
+Table(
+    "form_responses", INITIAL_METADATA,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("form_id", Integer, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("response_data", String),
+    Column("is_active", Boolean, default=True),
+    Column("submitted_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+@migration(1, "initial_tables")
+def initial_tables(conn):
+    INITIAL_METADATA.create_all(bind=conn, checkfirst=True)
+
+
+@migration(2, "rename_forms_schema_column")
+def rename_forms_schema_column(conn):
+    if has_column(conn, "forms", "schema"):
+        conn.execute(text("ALTER TABLE forms RENAME COLUMN schema TO form_schema"))
+
+
+@migration(3, "add_user_names")
+def add_user_names(conn):
+    if not has_column(conn, "users", "first_name"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN first_name VARCHAR"))
+    if not has_column(conn, "users", "last_name"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN last_name VARCHAR"))
+
+
+@migration(4, "add_form_responses_is_active")
+def add_form_responses_is_active(conn):
+    if not has_column(conn, "form_responses", "is_active"):
+        conn.execute(text("ALTER TABLE form_responses ADD COLUMN is_active BOOLEAN DEFAULT TRUE"))
+
+
+@migration(5, "dedupe_form_access")
+def dedupe_form_access(conn):
+    # Concurrent read-then-insert in update_form_access could create several
+    # rows for one (form, user); the latest write wins.
+    conn.execute(text(
+        "DELETE FROM form_access WHERE id NOT IN "
+        "(SELECT MAX(id) FROM form_access GROUP BY form_id, user_id)"
+    ))
+
+
+@migration(6, "form_access_unique_form_user", transactional=False)
+def form_access_unique_form_user(conn):
+    if any(c["name"] == "uq_form_access_form_user" for c in inspect(conn).get_unique_constraints("form_access")):
+        return
+    create_index(conn, "uq_form_access_form_user", "form_access", "form_id, user_id", unique=True)
+    if is_postgres(conn):
+        conn.execute(text(
+            "ALTER TABLE form_access ADD CONSTRAINT uq_form_access_form_user "
+            "UNIQUE USING INDEX uq_form_access_form_user"
+        ))
+
+
+@migration(7, "form_access_granted_by_user_index", transactional=False)
+def form_access_granted_by_user_index(conn):
+    create_index(conn, "ix_form_access_user_granted", "form_access", "user_id, form_id",
+                 where="has_access" if is_postgres(conn) else "has_access = 1")
+
+
+@migration(8, "form_responses_listing_index", transactional=False)
+def form_responses_listing_index(conn):
+    create_index(conn, "ix_form_responses_form_user_submitted", "form_responses",
+                 "form_id, user_id, submitted_at, id")
+
+
+@migration(9, "json_documents_to_jsonb")
+def json_documents_to_jsonb(conn):
+    # SQLite keeps JSON as text, so only Postgres columns change type. This
+    # rewrites both tables under an exclusive lock; schedule it accordingly.
+    if not is_postgres(conn):
+        return
+    for table, column in (("forms", "form_schema"), ("form_responses", "response_data")):
+        if column_type(conn, table, column) != "JSONB":
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB "
+                f"USING NULLIF({column}, '')::jsonb"
+            ))
+
+
+@migration(10, "form_responses_data_gin_index", transactional=False)
+def form_responses_data_gin_index(conn):
+    if is_postgres(conn):
+        create_index(conn, "ix_form_responses_data_gin", "form_responses",
+                     "response_data jsonb_path_ops", using="gin")
+
+
+@migration(11, "add_forms_version")
+def add_forms_version(conn):
+    if not has_column(conn, "forms", "version"):
+        conn.execute(text("ALTER TABLE forms ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration(12, "users_mobile_number_prefix_index", transactional=False)
+def users_mobile_number_prefix_index(conn):
+    if is_postgres(conn):
+        create_index(conn, "ix_users_mobile_number_prefix", "users", "mobile_number varchar_pattern_ops")
+
+
+@migration(13, "add_form_responses_updated_at")
+def add_form_responses_updated_at(conn):
+    if not has_column(conn, "form_responses", "updated_at"):
+        column_sql = "TIMESTAMPTZ" if is_postgres(conn) else "DATETIME"
+        conn.execute(text(f"ALTER TABLE form_responses ADD COLUMN updated_at {column_sql}"))
+    # Existing rows enter the changes feed at their submission time.
+    conn.execute(text("UPDATE form_responses SET updated_at = submitted_at WHERE updated_at IS NULL"))
+
+
+@migration(14, "form_responses_changes_index", transactional=False)
+def form_responses_changes_index(conn):
+    create_index(conn, "ix_form_responses_form_updated", "form_responses", "form_id, updated_at, id")
+
+
+@migration(15, "form_counters")
+def form_counters(conn):
+    import counters
+    from sqlalchemy.orm import Session
+
+    models.FormCounter.__table__.create(bind=conn, checkfirst=True)
+    with Session(bind=conn) as session:
+        # The archive table only comes with migration 16.
+        counters.rebuild(session, archived=False)
+
+
+@migration(16, "form_response_archive")
+def form_response_archive(conn):
+    models.FormResponseArchive.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(17, "partition_form_responses")
+def partition_form_responses(conn):
+    # Postgres only; see partitions.py. The current table becomes a partition
+    # without being copied, but attaching it scans it under an exclusive lock.
+    import partitions
+
+    partitions.partition_table(conn)
+
+
+@migration(18, "response_search")
+def response_search(conn):
+    # On Postgres existing rows are indexed afterwards: python search.py backfill
+    import search
+
+    search.install(conn)
+
+
+@migration(19, "form_response_revisions")
+def form_response_revisions(conn):
+    models.FormResponseRevision.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(20, "response_search_anchored_fields")
+def response_search_anchored_fields(conn):
+    # SQLite only: field entries gained a leading "__" (see search.py).
+    import search
+
+    search.reinstall(conn)
+
+
+def ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+
+def applied_versions(engine):
+    ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(engine=default_engine):
+    applied = applied_versions(engine)
+    for version, name, transactional, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        print(f"Applying migration {version:03d} {name}...")
+        if transactional:
+            with engine.begin() as conn:
+                fn(conn)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                fn(conn)
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name}
+            )
+    print("Database schema is up to date.")
+
+
+def print_status(engine=default_engine):
+    applied = applied_versions(engine)
+    for version, name, _, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+        state = "applied" if version in applied else "pending"
+        print(f"{version:03d} {name:<40} {state}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        print_status()
+    else:
+        run_migrations()
@@ -1,9 +1,27 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, UniqueConstraint, JSON, LargeBinary, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from database import Base
 
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+# JSONB on Postgres so documents can be indexed and queried server-side;
+# other backends (SQLite in development) store the same JSON as text.
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Mobile number prefix search in the admin access list (LIKE '98%');
+        # the plain unique index only serves equality under non-C collations.
+        Index(
+            "ix_users_mobile_number_prefix", "mobile_number",
+            postgresql_ops={"mobile_number": "varchar_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     mobile_number = Column(String(10), unique=True, index=True, nullable=False)
@@ -21,13 +39,24 @@ class Form(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String)
-    form_schema = Column(String)  # Stored as JSON string
+    form_schema = Column(JSONDocument)  # List of field definitions
+    # Bumped on every update; keys ETags and the per-form caches.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     created_by = Column(Integer, index=True)
 
 class FormAccess(Base):
     __tablename__ = "form_access"
+    __table_args__ = (
+        UniqueConstraint("form_id", "user_id", name="uq_form_access_form_user"),
+        # Serves the "forms shared with me" lookup; only granted rows matter.
+        Index(
+            "ix_form_access_user_granted", "user_id", "form_id",
+            postgresql_where=text("has_access"),
+            sqlite_where=text("has_access = 1"),
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True)
     form_id = Column(Integer, nullable=False)
     user_id = Column(Integer, nullable=False)
@@ -35,11 +64,92 @@ class FormAccess(Base):
 
 class FormResponse(Base):
     __tablename__ = "form_responses"
+    __table_args__ = (
+        Index("ix_form_responses_form_user_submitted", "form_id", "user_id", "submitted_at", "id"),
+        # Serves the changes feed, which pages on (updated_at, id) per form.
+        Index("ix_form_responses_form_updated", "form_id", "updated_at", "id"),
+        # Answers containment filters (response_data @> '{"City": "Pune"}').
+        Index(
+            "ix_form_responses_data_gin", "response_data",
+            postgresql_using="gin",
+            postgresql_ops={"response_data": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     form_id = Column(Integer, nullable=False)
     user_id = Column(Integer, nullable=False)
-    response_data = Column(String)  # JSON string of submitted values
+    response_data = Column(JSONDocument)  # Submitted values keyed by field label
     is_active = Column(Boolean, default=True)
-    submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client-side as well so the value has full precision on every backend;
+    # it is half of the (submitted_at, id) pagination key.
+    submitted_at = Column(DateTime(timezone=True), server_default=func.now(), default=utcnow)
+    # Set on insert and on every edit or (de)activation; key of the changes feed.
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+
+
+class FormCounter(Base):
+    """Per-form response and access counts, kept by counters.py.
+
+    Each form's counts are spread over a few slots so that concurrent
+    submissions to one form do not all wait on the same row; readers sum them.
+    """
+    __tablename__ = "form_counters"
+
+    form_id = Column(Integer, primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    response_count = Column(Integer, nullable=False, default=0, server_default="0")
+    active_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_submitted_at = Column(DateTime(timezone=True))
+    access_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 
+class FormResponseArchive(Base):
+    """Cold storage for old and deactivated responses, written by archive.py.
 
+    Each row is a segment: up to a few thousand responses of one user to one
+    form, kept as gzip-compressed NDJSON in ``payload``. The columns around it
+    let readers pick the segments a page or a response id falls into without
+    decompressing the others.
+    """
+    __tablename__ = "form_response_archive"
+    __table_args__ = (
+        Index("ix_form_response_archive_form_user_first", "form_id", "user_id", "first_submitted_at"),
+        Index("ix_form_response_archive_user_ids", "user_id", "min_response_id", "max_response_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    form_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    active_count = Column(Integer, nullable=False)
+    min_response_id = Column(Integer, nullable=False)
+    max_response_id = Column(Integer, nullable=False)
+    first_submitted_at = Column(DateTime(timezone=True), nullable=False)
+    last_submitted_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), default=utcnow)
+    payload = Column(LargeBinary, nullable=False)
+
+
+class FormResponseRevision(Base):
+    """Append-only log of response edits, written by revisions.py.
+
+    ``patch`` is a reverse diff: it turns the version written by the edit
+    back into the one before it, so the log holds only what changed and the
+    current version stays in form_responses alone.
+    """
+    __tablename__ = "form_response_revisions"
+    __table_args__ = (
+        # History of one response, and its edits after an as-of time.
+        Index("ix_form_response_revisions_response_changed", "response_id", "changed_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    response_id = Column(Integer, nullable=False)
+    form_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)  # owner of the response
+    changed_by = Column(Integer)
+    changed_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    # updated_at of the version the edit replaced.
+    previous_updated_at = Column(DateTime(timezone=True))
+    patch = Column(JSONDocument, nullable=False)
@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+
+# Response listings page on (submitted_at, id) so that deep pages cost the same
+# as the first one; the opaque cursor is the key of the last row on a page.
+RESPONSES_PAGE_SIZE = 100
+RESPONSES_MAX_PAGE_SIZE = 1000
+RESPONSES_STREAM_BATCH = 500
+
+# The admin access list pages on user id; its cursor is the last id.
+ACCESS_PAGE_SIZE = 100
+ACCESS_MAX_PAGE_SIZE = 1000
+
+def encode_cursor(submitted_at: datetime, response_id: int) -> str:
+    raw = f"{submitted_at.isoformat()}|{response_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        submitted_at, response_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(submitted_at), int(response_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
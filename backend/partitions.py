@@ -0,0 +1,187 @@
+"""Monthly range partitions of form_responses (Postgres only).
+
+Migration 17 turns ``form_responses`` into a table partitioned by range on
+``submitted_at``. The existing table is not copied: it is renamed and
+attached as the partition for everything before the cut-over month. Later
+months get one partition each, and a DEFAULT partition takes rows outside
+the created ranges (restored archives, a month nobody created in time).
+
+``ensure_partitions`` creates partitions ``PARTITION_MONTHS_AHEAD`` months in
+advance, and for any month since the last run that has none, moving that
+month's rows out of DEFAULT. ``drop_empty_partitions`` drops past partitions
+that the archive job has emptied, which is cheaper than vacuuming them.
+``python archive.py`` runs both. On SQLite the table stays a plain table and both are no-ops.
+
+Partitioned tables cannot have a unique index without the partition key, so
+the primary key becomes ``(id, submitted_at)``; ids still come from the one
+sequence and stay unique.
+"""
+import os
+import re
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+TABLE = "form_responses"
+LEGACY_PARTITION = "form_responses_legacy"
+DEFAULT_PARTITION = "form_responses_default"
+
+# Indexes of the parent; each partition gets its own copy.
+INDEXES = (
+    ("ix_form_responses_id", "(id)"),
+    ("ix_form_responses_form_user_submitted", "(form_id, user_id, submitted_at, id)"),
+    ("ix_form_responses_form_updated", "(form_id, updated_at, id)"),
+    ("ix_form_responses_data_gin", "USING gin (response_data jsonb_path_ops)"),
+)
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def _utc(value):
+    # Postgres returns timestamptz values, and prints partition bounds, in the
+    # session TimeZone; months are UTC months.
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _month_start(value):
+    value = _utc(value)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _literal(value):
+    return f"'{value.isoformat()}'"
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn):
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": TABLE}).first() is not None
+
+
+def partitions(conn):
+    """(name, upper bound) of every range partition; the bound is None for DEFAULT."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {"table": TABLE}).all()
+    result = []
+    for name, bound in rows:
+        match = _UPPER_BOUND.search(bound)
+        result.append((name, _utc(datetime.fromisoformat(match.group(1))) if match else None))
+    return result
+
+
+def partition_table(conn, now=None):
+    """Convert the plain table into the partitioned layout (migration 17)."""
+    if conn.dialect.name != "postgresql" or is_partitioned(conn):
+        return
+    now = now or datetime.now(timezone.utc)
+    cutover = _add_months(_month_start(now), 1)
+    latest = conn.execute(text(f"SELECT max(submitted_at) FROM {TABLE}")).scalar()
+    if latest is not None and latest >= cutover:
+        cutover = _add_months(_month_start(latest), 1)
+    sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+
+    conn.execute(text(f"UPDATE {TABLE} SET submitted_at = COALESCE(updated_at, now()) WHERE submitted_at IS NULL"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN submitted_at SET NOT NULL"))
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION}"))
+    # Free the index names (and the primary key's) for the parent.
+    for (index,) in conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND schemaname = current_schema()"
+    ), {"table": LEGACY_PARTITION}).all():
+        conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+
+    conn.execute(text(
+        f"CREATE TABLE {TABLE} ("
+        f"id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass), "
+        "form_id INTEGER NOT NULL, "
+        "user_id INTEGER NOT NULL, "
+        "response_data JSONB, "
+        "is_active BOOLEAN DEFAULT TRUE, "
+        "submitted_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "updated_at TIMESTAMPTZ, "
+        "PRIMARY KEY (id, submitted_at)"
+        ") PARTITION BY RANGE (submitted_at)"
+    ))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+    # Attaching scans the old table once to check the bound, under an
+    # exclusive lock; schedule the migration accordingly.
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+        f"FOR VALUES FROM (MINVALUE) TO ({_literal(cutover)})"
+    ))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    # Matching indexes of the old table are attached rather than rebuilt.
+    for name, definition in INDEXES:
+        conn.execute(text(f"CREATE INDEX {name} ON {TABLE} {definition}"))
+    ensure_partitions(conn, now=now)
+
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD, now=None):
+    """Create the missing monthly partitions up to ``months_ahead`` months from now.
+
+    Months are created from the highest existing bound on, so months that
+    passed without maintenance get their partition too; their rows are moved
+    out of DEFAULT.
+    """
+    if not is_partitioned(conn):
+        return []
+    this_month = _month_start(now or datetime.now(timezone.utc))
+    bounds = [upper for _, upper in partitions(conn) if upper is not None]
+    month = max(bounds) if bounds else this_month
+    created = []
+    while month <= _add_months(this_month, months_ahead):
+        created.append(_create_partition(conn, month))
+        month = _add_months(month, 1)
+    return created
+
+
+def _create_partition(conn, month):
+    name = partition_name(month)
+    lower, upper = _literal(month), _literal(_add_months(month, 1))
+    in_range = f"submitted_at >= {lower} AND submitted_at < {upper}"
+    # Postgres refuses a new range that rows in DEFAULT fall into. The lock
+    # keeps new rows of the month out of DEFAULT until the partition exists.
+    conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+    if conn.execute(text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1")).first() is None:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ({lower}) TO ({upper})"))
+        return name
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    # Attaching creates the parent's indexes and triggers on the new table.
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    return name
+
+
+def drop_empty_partitions(conn, now=None):
+    """Drop the partitions of past months that hold no rows; returns their names."""
+    if not is_partitioned(conn):
+        return []
+    this_month = _month_start(now or datetime.now(timezone.utc))
+    dropped = []
+    for name, upper in partitions(conn):
+        if upper is None or upper > this_month:
+            continue
+        # The lock keeps a concurrent restore from landing rows in the
+        # partition between the check and the drop.
+        conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+        if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is None:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
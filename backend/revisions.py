@@ -0,0 +1,182 @@
+"""Append-only revision log of response edits.
+
+``form_responses`` keeps only the current version of a response. Every edit
+(``PUT /api/responses/{id}``, including (de)activation) appends one row to
+``form_response_revisions`` holding a reverse patch: what has to be applied
+to the new version to get the previous one back.
+
+    {"set": {"City": "Pune"}, "unset": ["Phone"], "is_active": true}
+
+``set`` has the previous value of every field the edit changed or removed,
+``unset`` the fields it added, and ``is_active`` is present when the edit
+toggled it. A patch is as small as the edit, and reads of current data never
+touch the log.
+
+An older version is rebuilt by starting from the current row (hot or
+archived) and applying the patches of the edits made after the wanted time,
+newest first. Responses submitted before this log existed are reported as
+they are now for any time after their submission.
+"""
+import itertools
+from datetime import timezone
+from sqlalchemy import tuple_
+import archive
+import models
+
+Revision = models.FormResponseRevision
+
+
+def _utc(value):
+    # SQLite hands back naive datetimes; everything stored is UTC.
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def snapshot(response) -> dict:
+    """The parts of a response an edit can change, taken before the edit."""
+    return {
+        "response_data": response.response_data,
+        "is_active": response.is_active is not False,
+        "updated_at": response.updated_at,
+    }
+
+
+def diff(old_data, new_data) -> dict:
+    """Reverse patch taking ``new_data`` back to ``old_data``; empty if they are equal."""
+    old_data, new_data = old_data or {}, new_data or {}
+    patch = {}
+    changed = {key: value for key, value in old_data.items() if key not in new_data or new_data[key] != value}
+    if changed:
+        patch["set"] = changed
+    added = [key for key in new_data if key not in old_data]
+    if added:
+        patch["unset"] = added
+    return patch
+
+
+def revert(data, patch: dict):
+    """The version ``patch`` was recorded against, from the version after it."""
+    if "set" not in patch and "unset" not in patch:
+        return data
+    data = {key: value for key, value in (data or {}).items() if key not in patch.get("unset", ())}
+    data.update(patch.get("set", {}))
+    return data
+
+
+def record(db, response, previous: dict, changed_by: int):
+    """Append the revision for an edit of ``response``; the caller commits.
+
+    Nothing is written when the edit changed nothing. The response's
+    ``updated_at`` is set to the revision's time so the two agree.
+    """
+    patch = diff(previous["response_data"], response.response_data)
+    if previous["is_active"] != (response.is_active is not False):
+        patch["is_active"] = previous["is_active"]
+    if not patch:
+        return None
+    now = models.utcnow()
+    response.updated_at = now
+    revision = Revision(
+        response_id=response.id,
+        form_id=response.form_id,
+        user_id=response.user_id,
+        changed_by=changed_by,
+        changed_at=now,
+        previous_updated_at=previous["updated_at"],
+        patch=patch,
+    )
+    db.add(revision)
+    return revision
+
+
+def _version(row, patches):
+    """``row`` with ``patches`` (newest first) undone, as a listing row dict."""
+    data, is_active, updated_at = row.response_data, row.is_active is not False, row.updated_at
+    for previous_updated_at, patch in patches:
+        data = revert(data, patch)
+        is_active = patch.get("is_active", is_active)
+        updated_at = previous_updated_at
+    return {
+        "id": row.id,
+        "form_id": row.form_id,
+        "user_id": row.user_id,
+        "response_data": data,
+        "is_active": is_active,
+        "submitted_at": row.submitted_at,
+        "updated_at": updated_at,
+    }
+
+
+def as_of(db, form_id: int, user_id, at, after=None, limit: int = 100) -> list:
+    """Up to ``limit`` responses of a form as they were at ``at``, in listing order.
+
+    ``user_id=None`` reads every user's responses; ``after`` is a decoded
+    listing cursor. Only the revisions of the rows on the page are read.
+    """
+    at = _utc(at).astimezone(timezone.utc)
+    response = models.FormResponse
+    query = db.query(response).filter(response.form_id == form_id, response.submitted_at <= at)
+    if user_id is not None:
+        query = query.filter(response.user_id == user_id)
+    if after is not None:
+        query = query.filter(tuple_(response.submitted_at, response.id) > tuple_(*after))
+    hot = query.order_by(response.submitted_at, response.id).limit(limit)
+    archived = itertools.takewhile(
+        lambda row: _utc(row.submitted_at) <= at,
+        archive.iter_rows(db, form_id, user_id, after),
+    )
+    rows = list(itertools.islice(archive.merged(hot, archived), limit))
+    if not rows:
+        return []
+
+    patches = {}
+    for revision in db.query(Revision.response_id, Revision.previous_updated_at, Revision.patch).filter(
+        Revision.response_id.in_([row.id for row in rows]),
+        Revision.changed_at > at,
+    ).order_by(Revision.response_id, Revision.changed_at.desc(), Revision.id.desc()):
+        patches.setdefault(revision.response_id, []).append((revision.previous_updated_at, revision.patch))
+    return [_version(row, patches.get(row.id, ())) for row in rows]
+
+
+def current(db, response_id: int):
+    """The current version of a response, hot or archived; None if it does not exist."""
+    row = db.query(models.FormResponse).filter(models.FormResponse.id == response_id).first()
+    return row if row is not None else archive.find(db, response_id)
+
+
+def history(db, row) -> list:
+    """Revisions of a response, newest first, with each field's old and new value."""
+    revisions = db.query(Revision).filter(Revision.response_id == row.id).order_by(
+        Revision.changed_at.desc(), Revision.id.desc()
+    ).all()
+    data = row.response_data or {}
+    is_active = row.is_active is not False
+    result = []
+    for revision in revisions:
+        previous = revert(data, revision.patch)
+        keys = list(revision.patch.get("set", {})) + list(revision.patch.get("unset", ()))
+        entry = {
+            "id": revision.id,
+            "response_id": revision.response_id,
+            "changed_by": revision.changed_by,
+            "changed_at": revision.changed_at,
+            "changes": {key: {"old": previous.get(key), "new": data.get(key)} for key in keys},
+            "is_active": None,
+        }
+        if "is_active" in revision.patch:
+            entry["is_active"] = {"old": revision.patch["is_active"], "new": is_active}
+            is_active = revision.patch["is_active"]
+        result.append(entry)
+        data = previous
+    return result
+
+
+async def as_of_async(db, form_id: int, user_id, at, after=None, limit: int = 100) -> list:
+    return await db.run_sync(lambda session: as_of(session, form_id, user_id, at, after, limit))
+
+
+async def current_async(db, response_id: int):
+    return await db.run_sync(lambda session: current(session, response_id))
+
+
+async def history_async(db, row) -> list:
+    return await db.run_sync(lambda session: history(session, row))
@@ -1,6 +1,21 @@
-from pydantic import BaseModel, Field, validator
+import json
+from pydantic import BaseModel, Field, field_validator, validator
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+def dump_json(value):
+    """Serialize a stored JSON document back to the string the API exposes."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def check_json(value):
+    if value is not None:
+        try:
+            json.loads(value)
+        except ValueError:
+            raise ValueError("must be a valid JSON string")
+    return value
 
 class UserBase(BaseModel):
     mobile_number: str = Field(..., min_length=10, max_length=10, pattern="^[0-9]+$")
@@ -39,22 +54,43 @@ class FormBase(BaseModel):
     description: Optional[str] = None
     form_schema: str  # JSON string
 
+    _dump_form_schema = field_validator("form_schema", mode="before")(dump_json)
+
 
 class FormCreate(FormBase):
-    pass
+    _check_form_schema = field_validator("form_schema")(check_json)
 
 class Form(FormBase):
     id: int
     created_at: datetime
     created_by: int
+    version: int = 1
 
     class Config:
         from_attributes = True
 
+class FormListItem(Form):
+    """A form in the owner's list, with its counters (counters.py)."""
+    response_count: int = 0
+    active_response_count: int = 0
+    inactive_response_count: int = 0
+    last_submitted_at: Optional[datetime] = None
+    access_count: int = 0
+
 class FormAccessUpdate(BaseModel):
     user_id: int
     has_access: bool
 
+class FormAccessBulkUpdate(BaseModel):
+    """Grant or revoke for the listed users, or, without ``user_ids``, for
+    every non-admin user matching ``q`` (all of them when ``q`` is empty)."""
+    has_access: bool
+    user_ids: Optional[List[int]] = Field(None, max_length=10000)
+    q: Optional[str] = None
+
+class FormAccessBulkResult(BaseModel):
+    updated: int
+
 class UserAccessInfo(BaseModel):
     user_id: int
     mobile_number: str
@@ -67,6 +103,8 @@ class FormResponseBase(BaseModel):
     response_data: str # JSON string
     is_active: bool = True
 
+    _dump_response_data = field_validator("response_data", mode="before")(dump_json)
+
 class FormResponseCreate(FormResponseBase):
     pass
 
@@ -78,9 +116,40 @@ class FormResponse(FormResponseBase):
     id: int
     user_id: int
     submitted_at: datetime
+    updated_at: Optional[datetime] = None
 
 
     class Config:
         from_attributes = True
 
+class ResponseSearchHit(FormResponse):
+    score: float
+    snippet: Optional[str] = None  # HTML-escaped, matches wrapped in <mark>
 
+class ValueChange(BaseModel):
+    old: Any = None
+    new: Any = None
+
+class ResponseRevision(BaseModel):
+    id: int
+    response_id: int
+    changed_by: Optional[int] = None
+    changed_at: datetime
+    changes: Dict[str, ValueChange] = {}  # field label -> values before and after the edit
+    is_active: Optional[ValueChange] = None  # set when the edit (de)activated the response
+
+class ResponseChanges(BaseModel):
+    changes: List[FormResponse]
+    cursor: str  # pass back as ``since`` for the next poll
+    has_more: bool
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "created", "invalid", or "skipped" (atomic batch with failures)
+    id: Optional[int] = None
+    errors: Optional[Any] = None
+
+class BatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemResult]
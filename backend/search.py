@@ -0,0 +1,235 @@
+"""Full-text and field-level search over response contents.
+
+The index is kept by the database, so every write path (single submits,
+batches, COPY, the write-behind queue, edits, archive restores) updates it
+in the same transaction:
+
+* Postgres - ``form_responses.search_vector``, a tsvector of the document's
+  labels and values (``simple`` configuration: no stemming, any language),
+  set by a BEFORE INSERT/UPDATE trigger and indexed with GIN.
+* SQLite (development, tests) - the FTS5 table ``response_search`` (rowid =
+  response id), kept by triggers. ``body`` holds "Label: value" text,
+  ``fields`` holds "__Label__value" so that a phrase query anchors a prefix
+  to one field; the leading "__" keeps ``City`` from matching ``Home City``.
+
+A search ANDs prefix terms: every word of ``q`` must start a word somewhere
+in the document, and each ``field.<label>=<prefix>`` must start that field's
+value (case-insensitive). Hits are ranked (``ts_rank_cd`` / ``bm25``) and
+carry a snippet in which matches are wrapped in ``<mark>``; the rest of the
+snippet is HTML-escaped.
+
+Only hot responses are indexed; archived responses (archive.py) are found
+again once restored. Rows written before migration 18 on Postgres are
+indexed with:
+
+    python search.py backfill
+"""
+import html
+import re
+import sys
+from sqlalchemy import Text, column, func, literal, literal_column, select, table, text
+import database
+import models
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SNIPPET_WORDS = 12
+BACKFILL_BATCH_SIZE = 5000
+
+# Match markers; control characters cannot occur in the escaped snippet text.
+_START, _STOP = "\x02", "\x03"
+_WORD = re.compile(r"\w")
+
+_PG_VECTOR = (
+    "jsonb_to_tsvector('simple', COALESCE({row}.response_data, '{{}}'::jsonb), '[\"string\", \"numeric\", \"key\"]')"
+)
+_SQLITE_DOCUMENT = "json_each(CASE WHEN json_valid({row}.response_data) THEN {row}.response_data ELSE '{{}}' END)"
+_SQLITE_ROW = (
+    "{row}.id, "
+    "(SELECT group_concat(key || ': ' || value, ' · ') FROM " + _SQLITE_DOCUMENT + "), "
+    "(SELECT group_concat('__' || key || '__' || value, ' | ') FROM " + _SQLITE_DOCUMENT + "), "
+    "{row}.form_id, {row}.user_id"
+)
+_SQLITE_INSERT = "INSERT INTO response_search (rowid, body, fields, form_id, user_id) SELECT "
+
+Search = table("response_search", column("rowid"), column("form_id"))
+
+
+def terms(value) -> list:
+    """Whitespace-separated words of a query that contain something searchable."""
+    return [term for term in str(value).split() if _WORD.search(term)]
+
+
+def _pg_prefix(term):
+    return "'" + term.replace("\\", "\\\\").replace("'", "''") + "':*"
+
+
+def _fts_phrase(value):
+    return '"' + value.replace('"', '""') + '"*'
+
+
+def _hit_columns():
+    # The stored document rather than its text, so that hits are serialized
+    # by schemas.FormResponse exactly like the listing.
+    response = models.FormResponse
+    return (
+        response.id, response.form_id, response.user_id, response.is_active,
+        response.submitted_at, response.updated_at, response.response_data,
+    )
+
+
+def _postgres_stmt(form_id, user_id, words, fields):
+    """``(query, vector, conditions)``; ``query`` is None when no word is left to match."""
+    response = models.FormResponse
+    query = None
+    vector = literal_column("form_responses.search_vector")
+    conditions = [response.form_id == form_id]
+    if words:
+        query = func.to_tsquery("simple", " & ".join(_pg_prefix(term) for term in words))
+        conditions.append(vector.op("@@")(query))
+    if user_id is not None:
+        conditions.append(response.user_id == user_id)
+    for label, prefix in fields.items():
+        conditions.append(func.lower(response.response_data[label].as_string()).startswith(prefix.lower(), autoescape=True))
+    return query, vector, conditions
+
+
+def search_stmt(db, form_id: int, user_id, q: str, fields: dict, limit: int, offset: int):
+    """Ranked hits of a form; ``user_id=None`` searches every user's responses."""
+    words = terms(q) + [term for prefix in fields.values() for term in terms(prefix)]
+    response = models.FormResponse
+    if db.get_bind().dialect.name == "postgresql":
+        query, vector, conditions = _postgres_stmt(form_id, user_id, words, fields)
+        # Field prefixes without a word character leave nothing to rank on.
+        score = func.ts_rank_cd(vector, query) if query is not None else literal(0.0)
+        page = select(response.id, score.label("score")).where(*conditions).order_by(
+            literal_column("score").desc(), response.id.desc()
+        ).limit(limit).offset(offset).subquery()
+        document = literal_column(
+            "(SELECT string_agg(e.key || ': ' || e.value, ' · ') "
+            "FROM jsonb_each_text(form_responses.response_data) e)", Text
+        )
+        if query is not None:
+            snippet = func.ts_headline(
+                "simple", document, query,
+                f'StartSel="{_START}", StopSel="{_STOP}", MaxWords={SNIPPET_WORDS}, MinWords=4, MaxFragments=2',
+            )
+        else:
+            snippet = func.substring(document, rf"^\s*((?:\S+\s+){{0,{SNIPPET_WORDS - 1}}}\S+)")
+        # Headlines are only built for the page, not for every match.
+        return select(*_hit_columns(), page.c.score, snippet.label("snippet")).join(
+            page, page.c.id == response.id
+        ).order_by(page.c.score.desc(), response.id.desc())
+
+    index = literal_column("response_search")
+    match = []
+    if words:
+        match.append("body : (" + " AND ".join(_fts_phrase(term) for term in words) + ")")
+    match += [f"fields : {_fts_phrase('__' + label + '__' + prefix)}" for label, prefix in fields.items()]
+    score = (-func.bm25(index)).label("score")
+    stmt = select(
+        *_hit_columns(), score,
+        func.snippet(index, 0, _START, _STOP, "…", SNIPPET_WORDS).label("snippet"),
+    ).select_from(Search).join(response, response.id == Search.c.rowid).where(
+        index.op("MATCH")(" AND ".join(match)),
+        Search.c.form_id == form_id,
+    )
+    if user_id is not None:
+        stmt = stmt.where(response.user_id == user_id)
+    return stmt.order_by(literal_column("score").desc(), response.id.desc()).limit(limit).offset(offset)
+
+
+def highlight(snippet):
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def hits(rows) -> list:
+    results = []
+    for row in rows:
+        hit = row._asdict()
+        hit["snippet"] = highlight(hit["snippet"])
+        results.append(hit)
+    return results
+
+
+def install(conn):
+    """Create the index and the triggers that keep it (migration 18)."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE form_responses ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        conn.execute(text(
+            "CREATE OR REPLACE FUNCTION form_responses_search_vector() RETURNS trigger AS $$ "
+            f"BEGIN NEW.search_vector := {_PG_VECTOR.format(row='NEW')}; RETURN NEW; END "
+            "$$ LANGUAGE plpgsql"
+        ))
+        conn.execute(text("DROP TRIGGER IF EXISTS form_responses_search_vector ON form_responses"))
+        # Row triggers on a partitioned table need Postgres 13.
+        conn.execute(text(
+            "CREATE TRIGGER form_responses_search_vector BEFORE INSERT OR UPDATE OF response_data "
+            "ON form_responses FOR EACH ROW EXECUTE FUNCTION form_responses_search_vector()"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_form_responses_search ON form_responses USING gin (search_vector)"))
+        return
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS response_search USING fts5("
+        "body, fields, form_id UNINDEXED, user_id UNINDEXED, tokenize = \"unicode61 tokenchars '_'\")"
+    ))
+    new_row = _SQLITE_INSERT + _SQLITE_ROW.format(row="new") + ";"
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS response_search_insert AFTER INSERT ON form_responses BEGIN {new_row} END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS response_search_update AFTER UPDATE OF response_data ON form_responses BEGIN "
+        f"DELETE FROM response_search WHERE rowid = old.id; {new_row} END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS response_search_delete AFTER DELETE ON form_responses BEGIN "
+        "DELETE FROM response_search WHERE rowid = old.id; END"
+    ))
+    # Development databases are small enough to index right away.
+    backfill(conn)
+
+
+def reinstall(conn):
+    """Rebuild the SQLite index and its triggers after a change of format (migration 20)."""
+    if conn.dialect.name == "postgresql":
+        return
+    for trigger in ("response_search_insert", "response_search_update", "response_search_delete"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.execute(text("DROP TABLE IF EXISTS response_search"))
+    install(conn)
+
+
+def _backfill_range(conn, low, high):
+    params = {"low": low, "high": high}
+    if conn.dialect.name == "postgresql":
+        return conn.execute(text(
+            f"UPDATE form_responses SET search_vector = {_PG_VECTOR.format(row='form_responses')} "
+            "WHERE id > :low AND id <= :high AND search_vector IS NULL"
+        ), params).rowcount
+    return conn.execute(text(
+        _SQLITE_INSERT + _SQLITE_ROW.format(row="r") + " FROM form_responses r "
+        "WHERE r.id > :low AND r.id <= :high "
+        "AND r.id NOT IN (SELECT rowid FROM response_search WHERE rowid > :low AND rowid <= :high)"
+    ), params).rowcount
+
+
+def backfill(conn, batch_size=BACKFILL_BATCH_SIZE, commit=None) -> int:
+    """Index the responses that are not indexed yet, in id ranges of ``batch_size``."""
+    low, high = conn.execute(text("SELECT min(id) - 1, max(id) FROM form_responses")).one()
+    indexed = 0
+    while high is not None and low < high:
+        indexed += _backfill_range(conn, low, low + batch_size)
+        low += batch_size
+        if commit is not None:
+            commit()
+    return indexed
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python search.py backfill")
+    with database.engine.connect() as connection:
+        count = backfill(connection, commit=connection.commit)
+    print(f"Indexed {count} responses.")
@@ -0,0 +1,322 @@
+"""Per-field aggregates over a form's active responses.
+
+``compute`` aggregates in SQL with JSONB operators on Postgres, and
+column-wise in Python on other backends (SQLite in development). Archived
+responses (archive.py) are only readable in Python; their documents are
+folded into the SQL aggregates of the hot rows. It returns a ``FormStats``
+that holds counts, option counts, min/max and histogram bins.
+
+Results are cached per worker. Writes update the cached aggregates in place
+(``record_write``), so a submission does not force a full recomputation.
+Only a change that moves a histogram bound drops the entry. Every write is
+also announced on ``caching.bus``: the other workers cannot apply it to their
+copy, so they drop it and recompute on the next read.
+"""
+import itertools
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import Date, Numeric, cast, func, literal, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+import archive
+import caching
+import models
+
+HISTOGRAM_BINS = int(os.getenv("STATS_HISTOGRAM_BINS", "10"))
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "256"))
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+
+_NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_EPOCH = date(1970, 1, 1)
+
+_cache = caching.TTLCache(STATS_CACHE_SIZE, STATS_CACHE_TTL)
+_lock = threading.Lock()  # cached FormStats are mutated by record_write
+# Bus keys are "<form_id>" (drop everywhere) or "<form_id>:<worker>" (a write
+# this worker has already applied to its own copy).
+_WORKER = uuid.uuid4().hex
+
+
+def _invalidated(key):
+    form_id, _, origin = key.partition(":")
+    if origin != _WORKER:
+        _cache.pop(int(form_id))
+
+
+caching.bus.subscribe("stats", _invalidated)
+
+
+def _filled(value):
+    return value is not None and str(value).strip() != ""
+
+
+def _as_number(value):
+    value = str(value).strip()
+    return float(value) if _NUMBER_RE.match(value) else None
+
+
+def _as_day(value):
+    """Dates are stored as MM/DD/YYYY; histograms work on days since epoch."""
+    match = _DATE_RE.match(str(value).strip())
+    if not match:
+        return None
+    month, day, year = (int(part) for part in match.groups())
+    try:
+        return (date(year, month, day) - _EPOCH).days
+    except ValueError:
+        return None
+
+
+class FieldStats:
+    def __init__(self, label, type_):
+        self.label = label
+        self.type = type_
+        self.filled = 0
+        self.counts = Counter() if type_ == "select" else None
+        self.minimum = None
+        self.maximum = None
+        self.width = 0
+        self.edges = []  # histogram bin lower edges; the last bin is closed
+        self.bins = []
+
+    @property
+    def numeric(self):
+        return self.type in ("number", "date")
+
+    def coerce(self, value):
+        return _as_number(value) if self.type == "number" else _as_day(value)
+
+    def set_histogram(self, minimum, maximum):
+        """Fix equal-width bins over [minimum, maximum]; date bins span at least a day."""
+        self.minimum, self.maximum = minimum, maximum
+        if minimum is None:
+            self.width, self.edges, self.bins = 0, [], []
+            return
+        span = maximum - minimum
+        self.width = span / HISTOGRAM_BINS
+        if self.type == "date":
+            self.width = max(self.width, 1)
+        count = min(HISTOGRAM_BINS, int(span // self.width) + 1) if span else 1
+        self.edges = [minimum + self.width * i for i in range(count)]
+        self.bins = [0] * count
+
+    def bin_index(self, value):
+        if not self.width:
+            return 0
+        return min(int((value - self.minimum) // self.width), len(self.bins) - 1)
+
+    def apply(self, value, sign):
+        """Add (sign=1) or remove (sign=-1) one value; False if bounds moved."""
+        if not _filled(value):
+            return True
+        self.filled += sign
+        if self.counts is not None:
+            self.counts[str(value)] += sign
+            if self.counts[str(value)] <= 0:
+                del self.counts[str(value)]
+        if not self.numeric:
+            return True
+        number = self.coerce(value)
+        if number is None:
+            return True
+        if self.minimum is None or number < self.minimum or number > self.maximum:
+            return False
+        if sign < 0 and number in (self.minimum, self.maximum):
+            return False
+        self.bins[self.bin_index(number)] += sign
+        return True
+
+    def to_dict(self, total):
+        result = {
+            "label": self.label,
+            "type": self.type,
+            "filled": self.filled,
+            "fill_rate": round(self.filled / total, 4) if total else 0.0,
+        }
+        if self.counts is not None:
+            result["counts"] = dict(self.counts.most_common())
+        if self.numeric:
+            fmt = (lambda v: v) if self.type == "number" else (lambda v: (_EPOCH + timedelta(days=int(v))).isoformat())
+            result["min"] = fmt(self.minimum) if self.minimum is not None else None
+            result["max"] = fmt(self.maximum) if self.maximum is not None else None
+            bounds = self.edges[1:] + [self.maximum]
+            result["histogram"] = [
+                {"start": fmt(start), "end": fmt(end), "count": count}
+                for start, end, count in zip(self.edges, bounds, self.bins)
+            ]
+        return result
+
+
+class FormStats:
+    def __init__(self, form_id, fields):
+        self.form_id = form_id
+        self.version = None
+        self.total = 0
+        self.fields = [FieldStats(f["label"], f.get("type", "text")) for f in fields]
+
+    def apply(self, data, sign):
+        self.total += sign
+        return all([field.apply(data.get(field.label), sign) for field in self.fields])
+
+    def to_dict(self):
+        return {
+            "form_id": self.form_id,
+            "total": self.total,
+            "fields": [field.to_dict(self.total) for field in self.fields],
+        }
+
+
+def active_fields(form_schema):
+    try:
+        fields = json.loads(form_schema) if form_schema else []
+    except ValueError:
+        return []
+    return [
+        f for f in fields
+        if isinstance(f, dict) and f.get("label") and f.get("isActive", True)
+    ] if isinstance(fields, list) else []
+
+
+def _python_histogram(field, values):
+    if not values:
+        field.set_histogram(None, None)
+        return
+    field.set_histogram(min(values), max(values))
+    for value in values:
+        field.bins[field.bin_index(value)] += 1
+
+
+def _compute_python(db, form_stats, archived=()):
+    """Single streamed pass that splits rows into per-field columns."""
+    columns = {field.label: [] for field in form_stats.fields}
+    rows = db.query(models.FormResponse.response_data).filter(
+        models.FormResponse.form_id == form_stats.form_id,
+        models.FormResponse.is_active == True
+    ).yield_per(2000)
+    documents = itertools.chain((data for (data,) in rows), (row.response_data for row in archived))
+    for data in documents:
+        form_stats.total += 1
+        data = data if isinstance(data, dict) else {}
+        for label, column in columns.items():
+            column.append(data.get(label))
+
+    for field in form_stats.fields:
+        values = [v for v in columns[field.label] if _filled(v)]
+        field.filled = len(values)
+        if field.counts is not None:
+            field.counts.update(str(v) for v in values)
+        if field.numeric:
+            _python_histogram(field, [n for n in map(field.coerce, values) if n is not None])
+
+
+def _archived_values(form_stats, archived):
+    """Filled values per field of the archived documents, counted into ``total``."""
+    columns = {field.label: [] for field in form_stats.fields}
+    for row in archived:
+        form_stats.total += 1
+        data = row.response_data if isinstance(row.response_data, dict) else {}
+        for label, column in columns.items():
+            if _filled(data.get(label)):
+                column.append(data.get(label))
+    return columns
+
+
+def _compute_postgres(db, form_stats, archived=()):
+    extra = _archived_values(form_stats, archived)
+    doc = type_coerce(models.FormResponse.response_data, JSONB)
+    scope = (
+        models.FormResponse.form_id == form_stats.form_id,
+        models.FormResponse.is_active == True,
+    )
+    values = {field.label: doc[field.label].astext for field in form_stats.fields}
+
+    fill = db.execute(select(
+        func.count(),
+        *(func.count().filter(func.coalesce(func.btrim(values[f.label]), "") != "") for f in form_stats.fields)
+    ).where(*scope)).one()
+    form_stats.total += fill[0]
+    for field, filled in zip(form_stats.fields, fill[1:]):
+        field.filled = filled + len(extra[field.label])
+
+    for field in form_stats.fields:
+        if field.counts is not None:
+            column = select(values[field.label].label("v")).where(*scope).subquery()
+            field.counts.update(dict(db.execute(
+                select(column.c.v, func.count()).where(func.coalesce(func.btrim(column.c.v), "") != "").group_by(column.c.v)
+            ).all()))
+            field.counts.update(str(v) for v in extra[field.label])
+        if field.numeric:
+            archived_numbers = [n for n in map(field.coerce, extra[field.label]) if n is not None]
+            raw = func.btrim(values[field.label])
+            if field.type == "number":
+                number = cast(raw, Numeric)
+                pattern = _NUMBER_RE.pattern
+            else:
+                number = cast(func.to_date(raw, "MM/DD/YYYY"), Date) - cast(_EPOCH.isoformat(), Date)
+                pattern = _DATE_RE.pattern
+            column = select(number.label("v")).where(*scope, raw.op("~")(pattern)).subquery()
+            minimum, maximum = db.execute(select(func.min(column.c.v), func.max(column.c.v))).one()
+            bounds = [float(v) for v in (minimum, maximum) if v is not None] + archived_numbers
+            if not bounds:
+                field.set_histogram(None, None)
+                continue
+            field.set_histogram(min(bounds), max(bounds))
+            if minimum is not None:
+                # Same bucketing as FieldStats.bin_index, so cached bins can be
+                # updated incrementally from Python.
+                if field.width:
+                    bucket = func.least(func.floor((column.c.v - field.minimum) / field.width), len(field.bins) - 1)
+                else:
+                    bucket = literal(0)
+                for index, count in db.execute(select(bucket, func.count()).group_by(bucket)).all():
+                    field.bins[int(index)] = count
+            for number in archived_numbers:
+                field.bins[field.bin_index(number)] += 1
+
+
+def compute(db, form_id, form_schema):
+    form_stats = FormStats(form_id, active_fields(form_schema))
+    archived = archive.iter_rows(db, form_id, active_only=True) if archive.has_rows(db, form_id) else ()
+    if db.get_bind().dialect.name == "postgresql":
+        _compute_postgres(db, form_stats, archived)
+    else:
+        _compute_python(db, form_stats, archived)
+    return form_stats
+
+
+def get_form_stats(db, form_id, version, form_schema):
+    cached = _cache.get(form_id)
+    if cached is None or cached.version != version:
+        cached = compute(db, form_id, form_schema)
+        cached.version = version
+        _cache.set(form_id, cached)
+    with _lock:
+        return cached.to_dict()
+
+
+def record_write(form_id, old_data=None, new_data=None):
+    """Apply a response write to the cached aggregates for its form.
+
+    ``old_data`` is the active document being replaced or deactivated,
+    ``new_data`` the active document written; either may be None.
+    """
+    cached = _cache.get(form_id)
+    ok = cached is not None
+    if ok:
+        with _lock:
+            if old_data is not None:
+                ok = cached.apply(old_data, -1) and ok
+            if new_data is not None:
+                ok = cached.apply(new_data, 1) and ok
+    if ok:
+        caching.bus.publish("stats", f"{form_id}:{_WORKER}")
+    else:
+        invalidate(form_id)
+
+
+def invalidate(form_id):
+    caching.bus.publish("stats", str(form_id))
@@ -0,0 +1,77 @@
+"""Shared fixtures. The tests run against a throwaway SQLite database:
+
+    cd backend
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import tempfile
+
+# database.py and caching.py read these at import time.
+_tmp = tempfile.mkdtemp(prefix="dynamic_forms_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'app.sqlite3')}"
+os.environ["CACHE_BUS_PATH"] = os.path.join(_tmp, "cache_bus.sqlite3")
+os.environ.pop("DATABASE_READ_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+PASSWORD = "1234"
+CITY_SCHEMA = [{"id": 1, "label": "City", "type": "text", "isActive": True}]
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    import migrations
+
+    migrations.run_migrations()
+    return TestClient(main.app)
+
+
+@pytest.fixture(scope="session")
+def new_user(client):
+    """``new_user(admin=False)`` signs up a fresh user and returns its auth headers."""
+    import database
+    import models
+
+    numbers = iter(range(9100000000, 9200000000))
+
+    def create(admin=False):
+        mobile = str(next(numbers))
+        assert client.post("/api/signup", json={"mobile_number": mobile, "password": PASSWORD}).status_code == 200
+        if admin:
+            with database.SessionLocal() as db:
+                db.query(models.User).filter(models.User.mobile_number == mobile).update({"is_admin": True})
+                db.commit()
+        token = client.post("/api/login", json={"mobile_number": mobile, "password": PASSWORD}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return create
+
+
+@pytest.fixture(scope="session")
+def new_form(client, new_user):
+    """``new_form(schema)``: a fresh form, its admin and a user granted access."""
+
+    def create(schema=CITY_SCHEMA):
+        admin, user = new_user(admin=True), new_user()
+        created = client.post("/api/forms", json={"title": "Test", "form_schema": json.dumps(schema)}, headers=admin)
+        assert created.status_code == 200, created.text
+        user_id = client.get("/api/me", headers=user).json()["id"]
+        granted = client.put(
+            f"/api/admin/forms/{created.json()['id']}/access",
+            json={"user_id": user_id, "has_access": True}, headers=admin,
+        )
+        assert granted.status_code == 200, granted.text
+        return {"id": created.json()["id"], "admin": admin, "user": user, "user_id": user_id}
+
+    return create
+
+
+@pytest.fixture
+def form(new_form):
+    """A fresh form with one text field; see ``new_form``."""
+    return new_form()
@@ -0,0 +1,33 @@
+import access
+import caching
+import database
+import models
+
+
+def test_revoke_on_another_worker_reaches_this_one(client, form, monkeypatch):
+    # The poll interval only delays the eviction; here it is taken out.
+    monkeypatch.setattr(caching.bus, "poll_interval", 0)
+    monkeypatch.setattr(caching.bus, "_next_poll", 0)
+    assert client.get(f"/api/forms/{form['id']}", headers=form["user"]).status_code == 200
+    assert form["id"] in access._cache.get(form["user_id"])
+
+    # What update_form_access does on the other worker: commit, then publish.
+    with database.SessionLocal() as db:
+        db.query(models.FormAccess).filter(
+            models.FormAccess.form_id == form["id"], models.FormAccess.user_id == form["user_id"]
+        ).update({"has_access": False})
+        db.commit()
+    other_worker = caching.SQLiteBus(caching.bus.path)
+    other_worker.publish("access", form["user_id"])
+
+    assert client.get(f"/api/forms/{form['id']}", headers=form["user"]).status_code == 403
+
+
+def test_revoke_through_the_api(client, form):
+    assert client.get(f"/api/forms/{form['id']}", headers=form["user"]).status_code == 200
+    revoked = client.put(
+        f"/api/admin/forms/{form['id']}/access",
+        json={"user_id": form["user_id"], "has_access": False}, headers=form["admin"],
+    )
+    assert revoked.status_code == 200, revoked.text
+    assert client.get(f"/api/forms/{form['id']}", headers=form["user"]).status_code == 403
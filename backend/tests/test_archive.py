@@ -0,0 +1,78 @@
+import json
+import archive
+import database
+import models
+
+
+def submit(client, form, city):
+    submitted = client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps({"City": city})},
+        headers=form["user"],
+    )
+    assert submitted.status_code == 200, submitted.text
+    return submitted.json()["id"]
+
+
+def reads(client, form):
+    """What the listing, the export and the as-of read return for the form."""
+    base = f"/api/forms/{form['id']}/responses"
+    listed = client.get(base, headers=form["user"])
+    embedded = client.get(base, params={"documents": "object"}, headers=form["user"])
+    exported = client.get(f"{base}/export", params={"format": "ndjson"}, headers=form["admin"])
+    as_of = client.get(f"{base}/as-of", params={"at": "2100-01-01T00:00:00Z"}, headers=form["user"])
+    for read in (listed, embedded, exported, as_of):
+        assert read.status_code == 200, read.text
+    return listed.json(), embedded.json(), exported.text, as_of.json()
+
+
+def hot_and_archived(form):
+    with database.SessionLocal() as db:
+        hot = db.query(models.FormResponse).filter(models.FormResponse.form_id == form["id"]).count()
+        return hot, archive.has_rows(db, form["id"])
+
+
+def test_archived_rows_read_like_hot_rows(client, form):
+    ids = [submit(client, form, city) for city in ("Pune", "Mumbai", "Delhi")]
+    toggled = client.put(f"/api/responses/{ids[1]}", json={"is_active": False}, headers=form["user"])
+    assert toggled.status_code == 200, toggled.text
+    before = reads(client, form)
+
+    with database.SessionLocal() as db:
+        assert archive.archive(db, age_days=-1, form_id=form["id"]) == {form["id"]: 3}
+    assert hot_and_archived(form) == (0, True)
+    assert reads(client, form) == before
+
+
+def test_editing_an_archived_response_restores_it(client, form):
+    ids = [submit(client, form, city) for city in ("Pune", "Mumbai")]
+    with database.SessionLocal() as db:
+        archive.archive(db, age_days=-1, form_id=form["id"])
+
+    edited = client.put(
+        f"/api/responses/{ids[0]}", json={"response_data": json.dumps({"City": "Nagpur"})}, headers=form["user"]
+    )
+    assert edited.status_code == 200, edited.text
+    assert json.loads(edited.json()["response_data"]) == {"City": "Nagpur"}
+    # The whole segment moves back, so the other response is hot again too.
+    assert hot_and_archived(form) == (2, False)
+    listed = client.get(f"/api/forms/{form['id']}/responses", headers=form["user"]).json()
+    assert [json.loads(row["response_data"])["City"] for row in listed] == ["Nagpur", "Mumbai"]
+
+
+def test_segments_are_merged_in_order_and_opened_lazily(client, form, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_SEGMENT_ROWS", 2)
+    ids = [submit(client, form, f"City {i}") for i in range(5)]
+    with database.SessionLocal() as db:
+        archive.archive(db, age_days=-1, form_id=form["id"])
+        assert db.query(archive.Segment).filter(archive.Segment.form_id == form["id"]).count() == 3
+        assert [row.id for row in archive.iter_rows(db, form["id"])] == ids
+
+        opened = []
+        segment_rows = archive._segment_rows
+        monkeypatch.setattr(archive, "_segment_rows", lambda db, segment_id, *args: (
+            opened.append(segment_id) or segment_rows(db, segment_id, *args)
+        ))
+        rows = archive.iter_rows(db, form["id"])
+        assert [next(rows).id, next(rows).id] == ids[:2]
+        assert len(opened) == 1
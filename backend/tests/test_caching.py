@@ -0,0 +1,39 @@
+import caching
+
+
+def shared_buses(tmp_path):
+    """Two workers' buses on one host."""
+    path = str(tmp_path / "bus.sqlite3")
+    return caching.SQLiteBus(path, poll_interval=0), caching.SQLiteBus(path, poll_interval=0)
+
+
+def test_default_bus_reaches_other_workers(monkeypatch, tmp_path):
+    monkeypatch.delenv("CACHE_BUS", raising=False)
+    monkeypatch.setenv("CACHE_BUS_PATH", str(tmp_path / "bus.sqlite3"))
+    assert isinstance(caching.create_bus(), caching.SQLiteBus)
+
+
+def test_principal_eviction_reaches_other_workers(tmp_path):
+    writer, reader = shared_buses(tmp_path)
+    principals = caching.TTLCache(10, 60)
+    reader.subscribe("principal", principals.pop)
+    principals.set("9000000000", "cached user")
+
+    writer.publish("principal", "9000000000")
+    reader.poll()
+
+    assert principals.get("9000000000") is None
+
+
+def test_poll_only_delivers_new_invalidations(tmp_path):
+    writer, reader = shared_buses(tmp_path)
+    received = []
+    reader.subscribe("principal", received.append)
+
+    writer.publish("principal", "a")
+    reader.poll()
+    reader.poll()
+    writer.publish("principal", "b")
+    reader.poll()
+
+    assert received == ["a", "b"]
@@ -0,0 +1,51 @@
+import json
+import pytest
+import changes
+
+
+@pytest.fixture(autouse=True)
+def settled(monkeypatch):
+    monkeypatch.setattr(changes, "CHANGES_SETTLE_SECONDS", 0)
+
+
+def submit(client, form, headers, city):
+    submitted = client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps({"City": city})},
+        headers=headers,
+    )
+    assert submitted.status_code == 200, submitted.text
+    return submitted.json()["id"]
+
+
+def feed_ids(client, form, headers):
+    feed = client.get(f"/api/forms/{form['id']}/responses/changes", headers=headers)
+    assert feed.status_code == 200, feed.text
+    return [row["id"] for row in feed.json()["changes"]]
+
+
+def listing_ids(client, form, headers):
+    return [row["id"] for row in client.get(f"/api/forms/{form['id']}/responses", headers=headers).json()]
+
+
+def test_feed_is_scoped_like_the_listing(client, form):
+    client.put(
+        f"/api/admin/forms/{form['id']}/access",
+        json={"user_id": client.get("/api/me", headers=form["admin"]).json()["id"], "has_access": True},
+        headers=form["admin"],
+    )
+    own = submit(client, form, form["admin"], "Pune")
+    theirs = submit(client, form, form["user"], "Mumbai")
+
+    assert feed_ids(client, form, form["admin"]) == listing_ids(client, form, form["admin"]) == [own]
+    assert feed_ids(client, form, form["user"]) == listing_ids(client, form, form["user"]) == [theirs]
+
+
+def test_form_owner_cannot_read_another_users_revisions(client, form):
+    theirs = submit(client, form, form["user"], "Pune")
+    assert client.get(f"/api/responses/{theirs}/revisions", headers=form["admin"]).status_code == 404
+    assert client.get(f"/api/responses/{theirs}/revisions", headers=form["user"]).status_code == 200
+
+
+def test_feed_of_a_missing_form_is_not_found(client, form):
+    assert client.get("/api/forms/999999/responses/changes", headers=form["user"]).status_code == 404
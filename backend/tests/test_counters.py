@@ -0,0 +1,25 @@
+import json
+
+
+def form_counts(client, form):
+    forms = client.get("/api/forms", headers=form["admin"]).json()
+    return next(item for item in forms if item["id"] == form["id"])
+
+
+def test_toggles_are_counted_once(client, form):
+    ids = []
+    for city in ("Pune", "Mumbai", "Delhi"):
+        submitted = client.post(
+            f"/api/forms/{form['id']}/responses",
+            json={"form_id": form["id"], "response_data": json.dumps({"City": city})},
+            headers=form["user"],
+        )
+        assert submitted.status_code == 200, submitted.text
+        ids.append(submitted.json()["id"])
+
+    for is_active in (False, False, True, False):
+        toggled = client.put(f"/api/responses/{ids[0]}", json={"is_active": is_active}, headers=form["user"])
+        assert toggled.status_code == 200, toggled.text
+
+    counts = form_counts(client, form)
+    assert (counts["response_count"], counts["active_response_count"], counts["inactive_response_count"]) == (3, 2, 1)
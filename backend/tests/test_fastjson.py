@@ -0,0 +1,37 @@
+import json
+
+
+def test_documents_object_embeds_the_stored_json(client, form):
+    submitted = client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps({"City": "Pune"})},
+        headers=form["user"],
+    )
+    assert submitted.status_code == 200, submitted.text
+
+    listed = client.get(f"/api/forms/{form['id']}/responses", headers=form["user"])
+    embedded = client.get(f"/api/forms/{form['id']}/responses?documents=object", headers=form["user"])
+    assert embedded.status_code == 200, embedded.text
+    assert embedded.headers["content-type"] == "application/json"
+    assert embedded.headers["x-changes-cursor"]
+    [row] = embedded.json()
+    assert row["response_data"] == {"City": "Pune"}
+    assert json.loads(listed.json()[0]["response_data"]) == row["response_data"]
+
+
+def test_form_read_is_revalidated_with_its_etag(client, form):
+    first = client.get(f"/api/forms/{form['id']}", headers=form["admin"])
+    etag = first.headers["etag"]
+    revalidated = client.get(f"/api/forms/{form['id']}", headers={**form["admin"], "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+
+    edited = client.put(
+        f"/api/forms/{form['id']}", json={"title": "Renamed", "form_schema": first.json()["form_schema"]},
+        headers=form["admin"],
+    )
+    assert edited.status_code == 200, edited.text
+    changed = client.get(f"/api/forms/{form['id']}", headers={**form["admin"], "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["title"] == "Renamed"
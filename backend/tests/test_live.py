@@ -0,0 +1,17 @@
+import asyncio
+import live
+
+
+def test_events_reach_only_the_responses_user():
+    async def run():
+        hub = live.Hub()
+        owner, user = hub.subscribe(1, 10), hub.subscribe(1, 20)
+        other_form = hub.subscribe(2, 20)
+        hub.dispatch(1, 20, "frame")
+        await asyncio.sleep(0)
+        queued = [s.queue.qsize() for s in (owner, user, other_form)]
+        for subscriber in (owner, user, other_form):
+            hub.unsubscribe(subscriber)
+        return queued, hub.count
+
+    assert asyncio.run(run()) == ([0, 1, 0], 0)
@@ -0,0 +1,85 @@
+from sqlalchemy import create_engine, inspect, text
+import migrations
+import models
+
+
+def sqlite_engine(tmp_path, name):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def model_tables():
+    return sorted(models.Base.metadata.tables)
+
+
+def test_fresh_database_reaches_the_model_schema(tmp_path):
+    migrated = sqlite_engine(tmp_path, "migrated.sqlite3")
+    migrations.run_migrations(migrated)
+    created = sqlite_engine(tmp_path, "created.sqlite3")
+    models.Base.metadata.create_all(created)
+
+    migrated_schema, created_schema = inspect(migrated), inspect(created)
+    assert set(model_tables()) <= set(migrated_schema.get_table_names())
+    for table in model_tables():
+        assert (
+            {c["name"] for c in migrated_schema.get_columns(table)}
+            == {c["name"] for c in created_schema.get_columns(table)}
+        ), table
+        # Unique constraints declared on a model come out of migrations as unique indexes.
+        expected = {i["name"] for i in created_schema.get_indexes(table)}
+        expected |= {u["name"] for u in created_schema.get_unique_constraints(table) if u["name"]}
+        assert expected <= {i["name"] for i in migrated_schema.get_indexes(table)}, table
+
+
+def test_every_migration_is_recorded_once(tmp_path):
+    engine = sqlite_engine(tmp_path, "app.sqlite3")
+    migrations.run_migrations(engine)
+    migrations.run_migrations(engine)
+    with engine.connect() as conn:
+        versions = [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+    assert versions == sorted(version for version, _, _, _ in migrations.MIGRATIONS)
+
+
+def test_initial_migration_does_not_follow_the_models(tmp_path):
+    engine = sqlite_engine(tmp_path, "app.sqlite3")
+    with engine.begin() as conn:
+        migrations.initial_tables(conn)
+    schema = inspect(engine)
+    assert sorted(schema.get_table_names()) == ["form_access", "form_responses", "forms", "users"]
+    assert "updated_at" not in {c["name"] for c in schema.get_columns("form_responses")}
+    assert "version" not in {c["name"] for c in schema.get_columns("forms")}
+
+
+def test_database_from_the_first_release_is_upgraded(tmp_path):
+    engine = sqlite_engine(tmp_path, "app.sqlite3")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, mobile_number VARCHAR(10) NOT NULL UNIQUE, "
+            "password_hash VARCHAR NOT NULL, is_admin BOOLEAN, is_active BOOLEAN, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE forms (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR, "
+            "schema VARCHAR, created_at DATETIME, created_by INTEGER)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE form_access (id INTEGER PRIMARY KEY, form_id INTEGER NOT NULL, "
+            "user_id INTEGER NOT NULL, has_access BOOLEAN)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE form_responses (id INTEGER PRIMARY KEY, form_id INTEGER NOT NULL, "
+            "user_id INTEGER NOT NULL, response_data VARCHAR, submitted_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO forms (id, title, schema) VALUES (1, 'Legacy', '[]')"))
+        conn.execute(text("INSERT INTO form_access (form_id, user_id, has_access) VALUES (1, 7, 0), (1, 7, 1)"))
+        conn.execute(text(
+            "INSERT INTO form_responses (form_id, user_id, response_data, submitted_at) "
+            "VALUES (1, 7, '{\"City\": \"Pune\"}', '2024-01-01 10:00:00')"
+        ))
+
+    migrations.run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT form_schema, version FROM forms")).one() == ("[]", 1)
+        assert conn.execute(text("SELECT has_access FROM form_access")).all() == [(1,)]
+        updated_at, submitted_at = conn.execute(text("SELECT updated_at, submitted_at FROM form_responses")).one()
+        assert updated_at == submitted_at
+    assert {"first_name", "last_name"} <= {c["name"] for c in inspect(engine).get_columns("users")}
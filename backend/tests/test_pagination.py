@@ -0,0 +1,54 @@
+import json
+import pagination
+
+
+def submit(client, form, count):
+    for i in range(count):
+        submitted = client.post(
+            f"/api/forms/{form['id']}/responses",
+            json={"form_id": form["id"], "response_data": json.dumps({"City": f"City {i}"})},
+            headers=form["user"],
+        )
+        assert submitted.status_code == 200, submitted.text
+
+
+def list_responses(client, form, **params):
+    listed = client.get(f"/api/forms/{form['id']}/responses", params=params, headers=form["user"])
+    assert listed.status_code == 200, listed.text
+    return listed
+
+
+def test_cursor_pages_cover_every_response_once(client, form):
+    submit(client, form, 25)
+    seen, cursor = [], None
+    while True:
+        page = list_responses(client, form, limit=10, **({"after": cursor} if cursor else {}))
+        assert len(page.json()) <= 10
+        seen += [row["id"] for row in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == 25 == len(set(seen))
+    assert seen == [row["id"] for row in list_responses(client, form).json()]
+
+
+def test_last_page_has_no_next_cursor(client, form):
+    submit(client, form, 3)
+    page = list_responses(client, form, limit=3)
+    assert len(page.json()) == 3
+    assert "X-Next-Cursor" not in page.headers
+
+
+def test_unpaged_listing_returns_every_response(client, form, monkeypatch):
+    monkeypatch.setattr(pagination, "RESPONSES_PAGE_SIZE", 5)
+    submit(client, form, 12)
+    listed = list_responses(client, form)
+    assert len(listed.json()) == 12
+    assert "X-Next-Cursor" not in listed.headers
+    streamed = list_responses(client, form, format="ndjson")
+    assert len(streamed.text.strip().splitlines()) == 12
+
+
+def test_invalid_cursor_is_rejected(client, form):
+    listed = client.get(f"/api/forms/{form['id']}/responses", params={"after": "not-a-cursor"}, headers=form["user"])
+    assert listed.status_code == 400
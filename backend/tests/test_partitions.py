@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+import partitions
+
+NEW_YORK = timezone(timedelta(hours=-4))
+
+
+class FakeConnection:
+    """Answers the catalog queries of partitions.py; records every statement."""
+
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "pg_partitioned_table" in sql:
+            return Result([(1,)])
+        if "pg_inherits" in sql:
+            return Result(self.bounds)
+        return Result([])
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+def test_months_are_utc_months():
+    # 8pm on September 30th in New York is already October in UTC.
+    assert partitions._month_start(datetime(2026, 9, 30, 20, tzinfo=NEW_YORK)) == datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert partitions._add_months(datetime(2026, 11, 1, tzinfo=timezone.utc), 2) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+
+def test_bounds_printed_in_the_session_time_zone_are_read_as_utc():
+    conn = FakeConnection([
+        ("form_responses_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-09-30 20:00:00-04')"),
+        ("form_responses_default", "DEFAULT"),
+    ])
+    assert partitions.partitions(conn) == [
+        ("form_responses_legacy", datetime(2026, 10, 1, tzinfo=timezone.utc)),
+        ("form_responses_default", None),
+    ]
+
+
+def test_missing_months_are_created_from_the_last_bound():
+    conn = FakeConnection([
+        ("form_responses_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-09-30 20:00:00-04')"),
+        ("form_responses_default", "DEFAULT"),
+    ])
+    now = datetime(2026, 11, 15, tzinfo=timezone.utc)
+    created = partitions.ensure_partitions(conn, months_ahead=1, now=now)
+    assert created == ["form_responses_y2026m10", "form_responses_y2026m11", "form_responses_y2026m12"]
+    assert (
+        "CREATE TABLE form_responses_y2026m10 PARTITION OF form_responses "
+        "FOR VALUES FROM ('2026-10-01T00:00:00+00:00') TO ('2026-11-01T00:00:00+00:00')"
+    ) in conn.statements
+
+
+def test_plain_tables_are_left_alone():
+    conn = FakeConnection([])
+    conn.dialect = type("dialect", (), {"name": "sqlite"})
+    assert partitions.ensure_partitions(conn) == []
+    assert partitions.drop_empty_partitions(conn) == []
+    assert conn.statements == []
@@ -0,0 +1,21 @@
+import time
+import caching
+import database
+
+
+def test_write_on_another_worker_pins_the_user_to_the_primary(monkeypatch):
+    replica_sessions = object()
+    monkeypatch.setattr(database, "DATABASE_READ_URL", "postgresql://replica/app")
+    monkeypatch.setattr(database, "ReadSessionLocal", replica_sessions)
+    # This worker polled the bus a moment ago; the pin must not wait for the next poll.
+    monkeypatch.setattr(caching.bus, "_next_poll", time.monotonic() + 3600)
+    assert database.read_sessionmaker(4242) is replica_sessions
+
+    caching.SQLiteBus(caching.bus.path).publish("primary", "4242")
+
+    assert database.read_sessionmaker(4242) is database.SessionLocal
+    assert database.read_sessionmaker(4343) is replica_sessions
+
+
+def test_without_a_replica_reads_use_the_primary():
+    assert database.read_sessionmaker(4242) is database.SessionLocal
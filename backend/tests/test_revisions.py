@@ -0,0 +1,33 @@
+import json
+
+
+def submit(client, form, city):
+    submitted = client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps({"City": city})},
+        headers=form["user"],
+    )
+    assert submitted.status_code == 200, submitted.text
+    return submitted.json()["id"]
+
+
+def edit(client, form, response_id, **changes):
+    if "response_data" in changes:
+        changes["response_data"] = json.dumps(changes["response_data"])
+    edited = client.put(f"/api/responses/{response_id}", json=changes, headers=form["user"])
+    assert edited.status_code == 200, edited.text
+    return edited.json()
+
+
+def test_edits_chain_in_the_revision_log(client, form):
+    response_id = submit(client, form, "Pune")
+    edit(client, form, response_id, response_data={"City": "Mumbai"})
+    edit(client, form, response_id, response_data={"City": "Delhi"})
+    edit(client, form, response_id, is_active=False)
+
+    history = client.get(f"/api/responses/{response_id}/revisions", headers=form["user"]).json()
+    assert [entry["changes"].get("City") for entry in history] == [
+        None, {"old": "Mumbai", "new": "Delhi"}, {"old": "Pune", "new": "Mumbai"},
+    ]
+    assert history[0]["is_active"] == {"old": True, "new": False}
+
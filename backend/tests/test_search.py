@@ -0,0 +1,62 @@
+import json
+import pytest
+
+SCHEMA = [
+    {"id": 1, "label": "City", "type": "text", "isActive": True},
+    {"id": 2, "label": "Home City", "type": "text", "isActive": True},
+]
+
+
+@pytest.fixture
+def cities_form(client, new_form):
+    form = new_form(SCHEMA)
+    form["ids"] = {}
+    for city, home in (("Pune", "Mumbai"), ("Mumbai", "Pune")):
+        submitted = client.post(
+            f"/api/forms/{form['id']}/responses",
+            json={"form_id": form["id"], "response_data": json.dumps({"City": city, "Home City": home})},
+            headers=form["user"],
+        )
+        assert submitted.status_code == 200, submitted.text
+        form["ids"][city] = submitted.json()["id"]
+    return form
+
+
+def search(client, form, **params):
+    found = client.get(f"/api/forms/{form['id']}/responses/search", params=params, headers=form["user"])
+    assert found.status_code == 200, found.text
+    return [hit["id"] for hit in found.json()]
+
+
+def test_field_query_matches_only_that_field(client, cities_form):
+    ids = cities_form["ids"]
+    assert search(client, cities_form, **{"field.City": "pu"}) == [ids["Pune"]]
+    assert search(client, cities_form, **{"field.Home City": "pu"}) == [ids["Mumbai"]]
+
+
+def test_word_query_matches_any_field(client, cities_form):
+    assert sorted(search(client, cities_form, q="pune")) == sorted(cities_form["ids"].values())
+
+
+def test_empty_query_is_rejected(client, cities_form):
+    found = client.get(f"/api/forms/{cities_form['id']}/responses/search", headers=cities_form["user"])
+    assert found.status_code == 400
+
+
+def test_hits_serialize_documents_like_the_listing(client, cities_form):
+    listed = {row["id"]: row for row in client.get(
+        f"/api/forms/{cities_form['id']}/responses", headers=cities_form["user"]
+    ).json()}
+    found = client.get(
+        f"/api/forms/{cities_form['id']}/responses/search", params={"q": "pune"}, headers=cities_form["user"]
+    ).json()
+    assert found
+    for hit in found:
+        assert hit["response_data"] == listed[hit["id"]]["response_data"]
+
+
+def test_form_owner_only_finds_their_own_responses(client, cities_form):
+    found = client.get(
+        f"/api/forms/{cities_form['id']}/responses/search", params={"q": "pune"}, headers=cities_form["admin"]
+    )
+    assert found.status_code == 200 and found.json() == []
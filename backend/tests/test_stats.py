@@ -0,0 +1,68 @@
+import json
+from sqlalchemy import Text, cast
+import caching
+import database
+import models
+import stats
+
+SCHEMA = [
+    {"id": 1, "label": "Kind", "type": "select", "options": "a, b", "isActive": True},
+    {"id": 2, "label": "Age", "type": "number", "isActive": True},
+]
+
+
+def submit(client, form, data):
+    submitted = client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps(data)},
+        headers=form["user"],
+    )
+    assert submitted.status_code == 200, submitted.text
+
+
+def form_stats(client, form):
+    read = client.get(f"/api/forms/{form['id']}/stats", headers=form["admin"])
+    assert read.status_code == 200, read.text
+    return read.json()
+
+
+def recomputed(form):
+    with database.SessionLocal() as db:
+        schema = db.query(cast(models.Form.form_schema, Text)).filter(models.Form.id == form["id"]).scalar()
+        return stats.compute(db, form["id"], schema).to_dict()
+
+
+def test_submissions_update_the_cached_stats_in_place(client, new_form, monkeypatch):
+    form = new_form(SCHEMA)
+    submit(client, form, {"Kind": "a", "Age": "10"})
+    submit(client, form, {"Kind": "b", "Age": "30"})
+    assert form_stats(client, form)["total"] == 2
+
+    computed = []
+    compute = stats.compute
+    monkeypatch.setattr(stats, "compute", lambda *args: computed.append(args) or compute(*args))
+    submit(client, form, {"Kind": "a", "Age": "20"})
+    cached = form_stats(client, form)
+    assert computed == []
+    monkeypatch.setattr(stats, "compute", compute)
+    assert cached == recomputed(form)
+    assert cached["fields"][0]["counts"] == {"a": 2, "b": 1}
+
+
+def test_writes_on_another_worker_drop_the_cached_stats(client, new_form, monkeypatch):
+    monkeypatch.setattr(caching.bus, "poll_interval", 0)
+    monkeypatch.setattr(caching.bus, "_next_poll", 0)
+    form = new_form(SCHEMA)
+    submit(client, form, {"Kind": "a", "Age": "10"})
+    form_stats(client, form)
+
+    # This worker's own announcement leaves the copy it already updated.
+    stats.record_write(form["id"], new_data={"Kind": "b", "Age": "10"})
+    caching.bus.poll(force=True)
+    assert stats._cache.get(form["id"]).total == 2
+
+    other_worker = caching.SQLiteBus(caching.bus.path)
+    other_worker._dispatch = lambda namespace, key: None
+    other_worker.publish("stats", f"{form['id']}:other")
+    caching.bus.poll(force=True)
+    assert stats._cache.get(form["id"]) is None
@@ -0,0 +1,41 @@
+import json
+
+SCHEMA = [
+    {"id": 1, "label": "City", "type": "text", "isActive": True, "required": True},
+    {"id": 2, "label": "Age", "type": "number", "isActive": True},
+    {"id": 3, "label": "Kind", "type": "select", "options": "a, b", "isActive": True},
+]
+
+
+def submit(client, form, data):
+    return client.post(
+        f"/api/forms/{form['id']}/responses",
+        json={"form_id": form["id"], "response_data": json.dumps(data)},
+        headers=form["user"],
+    )
+
+
+def test_invalid_fields_are_reported_per_field(client, new_form):
+    form = new_form(SCHEMA)
+    rejected = submit(client, form, {"City": " ", "Age": "abc", "Kind": "c"})
+    assert rejected.status_code == 422
+    assert rejected.json()["detail"] == [
+        {"field": "City", "msg": "is required"},
+        {"field": "Age", "msg": "must be a number"},
+        {"field": "Kind", "msg": "must be one of: a, b"},
+    ]
+
+    accepted = submit(client, form, {"City": "Pune", "Age": "5", "Kind": "a"})
+    assert accepted.status_code == 200, accepted.text
+
+
+def test_schema_edit_replaces_cached_validator(client, new_form):
+    form = new_form(SCHEMA)
+    assert submit(client, form, {"City": ""}).status_code == 422
+
+    relaxed = [dict(SCHEMA[0], required=False)]
+    updated = client.put(
+        f"/api/forms/{form['id']}", json={"title": "Test", "form_schema": json.dumps(relaxed)}, headers=form["admin"]
+    )
+    assert updated.status_code == 200, updated.text
+    assert submit(client, form, {"City": ""}).status_code == 200
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+import writebehind
+
+
+def pending_row():
+    return writebehind.Pending({"id": 7, "form_id": 1, "user_id": 1, "response_data": {}, "is_active": True})
+
+
+@pytest.fixture
+def commit_mode(monkeypatch):
+    monkeypatch.setattr(writebehind, "WRITE_BEHIND_DURABILITY", "commit")
+    monkeypatch.setattr(writebehind, "WRITE_BEHIND_ACK_TIMEOUT", 0.01)
+
+
+def test_committed_row_is_acknowledged(commit_mode):
+    pending = pending_row()
+    pending.future.set_result({**pending.row, "updated_at": None})
+    row, committed = writebehind.acknowledgement(pending)
+    assert committed and row["id"] == 7
+
+
+@pytest.mark.parametrize("acknowledge", [
+    writebehind.acknowledgement,
+    lambda pending: asyncio.run(writebehind.acknowledgement_async(pending)),
+])
+def test_rejected_row_is_a_conflict(commit_mode, acknowledge):
+    pending = pending_row()
+    pending.future.set_exception(IntegrityError("INSERT", {}, Exception("duplicate key")))
+    with pytest.raises(HTTPException) as raised:
+        acknowledge(pending)
+    assert raised.value.status_code == 409
+
+
+@pytest.mark.parametrize("acknowledge", [
+    writebehind.acknowledgement,
+    lambda pending: asyncio.run(writebehind.acknowledgement_async(pending)),
+])
+def test_uncommitted_row_is_not_acknowledged(commit_mode, acknowledge):
+    with pytest.raises(HTTPException) as raised:
+        acknowledge(pending_row())
+    assert raised.value.status_code == 503
+
+
+def test_spool_mode_accepts_without_waiting(monkeypatch):
+    monkeypatch.setattr(writebehind, "WRITE_BEHIND_DURABILITY", "spool")
+    row, committed = writebehind.acknowledgement(pending_row())
+    assert not committed and row["id"] == 7
@@ -0,0 +1,146 @@
+"""Server-side validation of submitted response data against a form's schema.
+
+A form's ``form_schema`` is compiled once into a list of per-field check
+functions and cached per worker, keyed by form id and ``Form.version``.
+Submissions are then checked without loading or re-parsing the schema, or
+building Pydantic models. ``update_form`` bumps the version and calls
+``invalidate``.
+
+The rules mirror FormSubmission.jsx:
+* only active fields are checked; keys for other fields are left alone,
+  because edited records keep the values of fields deactivated later
+* required fields must be non-empty when their condition (if any) holds
+* ``select`` values must be one of the comma-separated ``options``
+* ``number`` values must parse as numbers, ``date`` values as MM/DD/YYYY
+"""
+import json
+import os
+import re
+from datetime import date
+from fastapi import HTTPException
+import caching
+
+VALIDATOR_CACHE_SIZE = int(os.getenv("VALIDATOR_CACHE_SIZE", "1024"))
+VALIDATOR_CACHE_TTL = float(os.getenv("VALIDATOR_CACHE_TTL", "3600"))
+
+_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+_cache = caching.TTLCache(VALIDATOR_CACHE_SIZE, VALIDATOR_CACHE_TTL)
+caching.bus.subscribe("validator", lambda form_id: _cache.pop(int(form_id)))
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _check_select(options):
+    allowed = frozenset(opt.strip() for opt in (options or "").split(",") if opt.strip())
+
+    def check(value):
+        if value not in allowed:
+            return "must be one of: " + ", ".join(sorted(allowed))
+    return check
+
+
+def _check_number(value):
+    if isinstance(value, bool):
+        return "must be a number"
+    if isinstance(value, (int, float)):
+        return None
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return "must be a number"
+
+
+def _check_date(value):
+    match = _DATE_RE.match(value) if isinstance(value, str) else None
+    if not match:
+        return "must be a date in MM/DD/YYYY format"
+    month, day, year = (int(part) for part in match.groups())
+    try:
+        date(year, month, day)
+    except ValueError:
+        return "must be a valid date"
+
+
+def _check_text(value):
+    if not isinstance(value, (str, int, float)):
+        return "must be text"
+
+
+_TYPE_CHECKS = {"number": _check_number, "date": _check_date}
+
+
+class CompiledForm:
+    def __init__(self, fields):
+        self.checks = []
+        for field in fields:
+            if not isinstance(field, dict) or not field.get("isActive", True):
+                continue
+            if field.get("type") == "select":
+                check = _check_select(field.get("options"))
+            else:
+                check = _TYPE_CHECKS.get(field.get("type"), _check_text)
+            self.checks.append((
+                field.get("label"),
+                bool(field.get("required")),
+                field.get("conditionField") or None,
+                field.get("conditionValue"),
+                check,
+            ))
+
+    def errors(self, data: dict):
+        errors = []
+        for label, required, condition_field, condition_value, check in self.checks:
+            value = data.get(label)
+            if _is_empty(value):
+                if required and (condition_field is None or data.get(condition_field) == condition_value):
+                    errors.append({"field": label, "msg": "is required"})
+                continue
+            msg = check(value)
+            if msg:
+                errors.append({"field": label, "msg": msg})
+        return errors
+
+
+def lookup(form_id: int, version: int):
+    """Return the cached validator for this schema version, or None."""
+    cached = _cache.get(form_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    return None
+
+
+def compile_schema(form_id: int, version: int, form_schema: str) -> CompiledForm:
+    try:
+        fields = json.loads(form_schema) if form_schema else []
+    except ValueError:
+        fields = []
+    compiled = CompiledForm(fields if isinstance(fields, list) else [])
+    _cache.set(form_id, (version, compiled))
+    return compiled
+
+
+def get_validator(form_id: int, version: int, load_schema) -> CompiledForm:
+    """Cached validator; ``load_schema()`` returns the schema text on a miss."""
+    return lookup(form_id, version) or compile_schema(form_id, version, load_schema())
+
+
+def invalidate(form_id: int):
+    caching.bus.publish("validator", form_id)
+
+
+def validate_response_data(validator: CompiledForm, response_data: str) -> dict:
+    """Parse and validate submitted data, raising 422 with per-field errors."""
+    try:
+        data = json.loads(response_data)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="response_data must be valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="response_data must be a JSON object")
+
+    errors = validator.errors(data)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return data
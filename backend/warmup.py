@@ -0,0 +1,150 @@
+"""Worker warm-up and the readiness probe.
+
+Left alone, a fresh worker opens its database connections, configures the
+ORM mappers, compiles its SQL and loads the bcrypt backend on the first
+requests that need them, so the first requests after a deploy or a scale-up
+are slow. The app's lifespan calls ``warm_up`` before the worker accepts
+connections:
+
+* the connection pools are filled to ``POOL_WARM_SIZE`` connections
+  (database.py);
+* the functions registered with ``@hot_query`` run once against every engine
+  with ids that match no row, which configures the mappers and leaves their
+  statements in each engine's compiled-statement cache;
+* every password worker hashes once (auth.warm_password_hashing), and a
+  token is signed and verified.
+
+If the database is unreachable at startup the worker starts anyway and keeps
+retrying in the background. ``/readyz`` answers 200 only once warm-up has
+finished and a pooled connection answers ``SELECT 1``; ``/livez`` only says
+the process is serving requests. ``WARM_UP=0`` skips the warm-up (the probe
+then only checks the database), which is what the startup benchmark compares
+against.
+"""
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import auth
+import database
+
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+_hot_queries = []
+_task = None
+warmed = not WARM_UP
+warm_up_seconds = None
+
+
+def hot_query(fn):
+    """Register ``fn(session)``, run once per engine at warm-up; it must only read."""
+    _hot_queries.append(fn)
+    return fn
+
+
+def _engines():
+    engines = [database.engine]
+    if database.read_engine is not database.engine:
+        engines.append(database.read_engine)
+    return engines
+
+
+def _async_engines():
+    engines = [database.async_engine] if database.async_engine is not None else []
+    if database.async_read_engine is not database.async_engine:
+        engines.append(database.async_read_engine)
+    return engines
+
+
+def _run_hot_queries(session):
+    for fn in _hot_queries:
+        fn(session)
+    session.rollback()
+
+
+def _warm_sync():
+    for engine in _engines():
+        database.prefill_pool(engine)
+        with Session(bind=engine) as session:
+            _run_hot_queries(session)
+
+
+async def _warm_async():
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    for engine in _async_engines():
+        await database.prefill_async_pool(engine)
+        async with AsyncSession(engine) as session:
+            await session.run_sync(_run_hot_queries)
+
+
+async def _attempt():
+    # Also starts the request threadpool, which sync handlers run on.
+    await run_in_threadpool(_warm_sync)
+    await _warm_async()
+    await auth.warm_password_hashing()
+    # The JWT library loads its algorithm backends on first use.
+    auth.token_subject(auth.create_access_token(data={"sub": "warm-up"}))
+
+
+async def _retry(started):
+    global warmed, warm_up_seconds
+    while not warmed:
+        await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+        try:
+            await _attempt()
+            warmed = True
+            warm_up_seconds = time.perf_counter() - started
+            logger.info("warm-up finished after retrying")
+        except Exception:
+            logger.warning("warm-up failed, retrying in %ss", WARM_UP_RETRY_SECONDS, exc_info=True)
+
+
+async def warm_up():
+    """Warm this worker; on failure keep retrying in the background."""
+    global warmed, warm_up_seconds, _task
+    if not WARM_UP:
+        return
+    started = time.perf_counter()
+    try:
+        await _attempt()
+    except Exception:
+        logger.warning("warm-up failed, retrying in %ss", WARM_UP_RETRY_SECONDS, exc_info=True)
+        _task = asyncio.get_running_loop().create_task(_retry(started))
+        return
+    warmed = True
+    warm_up_seconds = time.perf_counter() - started
+
+
+def stop():
+    if _task is not None:
+        _task.cancel()
+
+
+def _ping(engine):
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+
+async def _ping_async(engine):
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("SELECT 1")
+
+
+async def readiness() -> tuple:
+    """(ready, body) for ``/readyz``."""
+    if not warmed:
+        return False, {"status": "warming up"}
+    try:
+        for engine in _engines():
+            await run_in_threadpool(_ping, engine)
+        for engine in _async_engines():
+            await _ping_async(engine)
+    except Exception as exc:
+        return False, {"status": "database unavailable", "detail": type(exc).__name__}
+    return True, {"status": "ready", "warm_up_seconds": warm_up_seconds}
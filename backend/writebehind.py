@@ -0,0 +1,430 @@
+"""Write-behind queue for response submissions (group commit).
+
+With ``WRITE_BEHIND=1``, ``submit_response`` validates the submission and
+gives it an id from a block reserved from the form_responses sequence. It
+then hands the row to this worker's queue instead of committing it itself. A
+background thread writes the queue with ``ingest.insert_responses`` in one
+transaction every ``WRITE_BEHIND_FLUSH_MS``, or as soon as
+``WRITE_BEHIND_MAX_ROWS`` rows are waiting. Many submissions then share one
+commit, and one WAL flush.
+
+``WRITE_BEHIND_DURABILITY`` decides when the client gets its answer:
+
+* ``commit`` (default) - after the batch holding its row has committed.
+  Nothing is acknowledged that is not in the database: a row the database
+  refuses gets a 409, and one not committed within
+  ``WRITE_BEHIND_ACK_TIMEOUT`` a 503.
+* ``spool``  - once the row is appended to this worker's spool file in
+  ``WRITE_BEHIND_SPOOL_DIR`` and fsynced (202 Accepted). Concurrent appends
+  share one fsync. At startup a worker replays the spool files of workers
+  that exited before flushing them.
+* ``memory`` - as soon as the row is queued (202 Accepted). A crash loses
+  whatever is still queued.
+
+When the queue is full or the writer is not running, the submission is
+written synchronously, as without the queue. On shutdown the queue is
+drained, for at most ``WRITE_BEHIND_DRAIN_SECONDS``.
+
+Rows are stamped ``updated_at`` when they are written, so the changes feed
+(changes.py) sees them as ordinary late commits. Ids are reserved ahead of
+the insert, which needs a Postgres sequence; on other databases the queue
+stays off.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+import counters
+import database
+import ingest
+import live
+import models
+import stats
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "commit")
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "20"))
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "500"))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_SPOOL_DIR = os.getenv("WRITE_BEHIND_SPOOL_DIR", "/tmp/dynamic_forms_spool")
+WRITE_BEHIND_DRAIN_SECONDS = float(os.getenv("WRITE_BEHIND_DRAIN_SECONDS", "30"))
+WRITE_BEHIND_ACK_TIMEOUT = float(os.getenv("WRITE_BEHIND_ACK_TIMEOUT", "10"))
+
+if WRITE_BEHIND_DURABILITY not in ("commit", "spool", "memory"):
+    raise ValueError(f"Unknown WRITE_BEHIND_DURABILITY: {WRITE_BEHIND_DURABILITY}")
+
+ID_BLOCK_SIZE = 100
+RETRY_DELAY = 1.0
+REPLAY_CHUNK_SIZE = 1000
+
+
+class Pending:
+    __slots__ = ("row", "future")
+
+    def __init__(self, row):
+        self.row = row
+        self.future = concurrent.futures.Future()
+
+
+class IdBlock:
+    """Ids handed out from blocks of ``ID_BLOCK_SIZE`` taken from the sequence."""
+
+    def __init__(self):
+        self._ids = collections.deque()
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if not self._ids:
+                with database.engine.connect() as conn:
+                    self._ids.extend(ingest.reserve_ids(conn, ID_BLOCK_SIZE))
+            return self._ids.popleft()
+
+
+def _encode(row):
+    return json.dumps({**row, "submitted_at": row["submitted_at"].isoformat()}, separators=(",", ":"))
+
+
+def _decode(line):
+    row = json.loads(line)
+    row["submitted_at"] = datetime.fromisoformat(row["submitted_at"])
+    return row
+
+
+class Spool:
+    """This worker's append-only spool: one JSON row per line.
+
+    The file is flocked while this worker owns it, so other workers only
+    replay files whose owner has gone. Each time the writer takes the queue,
+    the file is sealed (fsynced and renamed) and a new one started. The
+    sealed file is deleted once its rows have committed.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"responses-{os.getpid()}.spool")
+        self.lock = threading.Lock()  # lines are written in queue order
+        self.sync_lock = threading.Lock()  # taken before ``lock``
+        self._written = self._synced = 0
+        self._sealed = 0
+        self._file = self._open(self.path)
+
+    @staticmethod
+    def _open(path):
+        f = open(path, "a", encoding="utf-8")
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+
+    def append(self, row) -> int:
+        """Write one row (caller holds ``lock``); return its position for ``sync``."""
+        self._file.write(_encode(row) + "\n")
+        self._file.flush()
+        self._written += 1
+        return self._written
+
+    def sync(self, position: int):
+        """Return once the line at ``position`` is on disk; one fsync covers every waiter."""
+        with self.sync_lock:
+            if self._synced < position:
+                written = self._written
+                os.fsync(self._file.fileno())
+                self._synced = written
+
+    def seal(self):
+        """Close off the current file (caller holds both locks).
+
+        Returns ``(path, file)`` with the file still open and locked, or None
+        when nothing was written since the last seal.
+        """
+        if self._written == self._sealed:
+            return None
+        os.fsync(self._file.fileno())
+        self._synced = self._sealed = self._written
+        sealed = (f"{self.path}.{self._written}", self._file)
+        os.rename(self.path, sealed[0])
+        self._file = self._open(self.path)
+        return sealed
+
+    @staticmethod
+    def remove(sealed):
+        path, f = sealed
+        os.remove(path)
+        f.close()
+
+    def close(self):
+        """Release the file; it is kept for replay if it still holds rows."""
+        self._file.close()
+        if self._written == self._sealed:
+            os.remove(self.path)
+
+
+def _insert_each(rows):
+    """Insert rows one per transaction, skipping ids already present.
+
+    Used when a batch fails on a constraint: rows that commit, or were
+    committed by an earlier attempt, succeed; the offending rows come back
+    as ``{id: exception}``.
+    """
+    failed = {}
+    with database.SessionLocal() as db:
+        # On the table rather than the entity, so the result has a rowcount.
+        # No conflict target: the key is (id, submitted_at) once the table is
+        # partitioned (partitions.py), and rows carry both.
+        stmt = database.dialect_insert(db)(models.FormResponse.__table__).on_conflict_do_nothing()
+        for row in rows:
+            try:
+                if db.execute(stmt, row).rowcount:
+                    counters.responses_inserted(db, [row])
+                db.commit()
+            except (IntegrityError, DataError) as exc:
+                db.rollback()
+                failed[row["id"]] = exc
+    return failed
+
+
+class Writer:
+    def __init__(self, spool=None):
+        self.spool = spool
+        self.ids = IdBlock()
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue ``row``; return its Pending, or None if the queue cannot take it."""
+        pending = Pending(row)
+        if self.spool is None:
+            return pending if self._put(pending) is not None else None
+        with self.spool.lock:
+            position = self._put(pending, self.spool.append)
+        if position is None:
+            return None
+        self.spool.sync(position)
+        return pending
+
+    def _put(self, pending, spool_append=None):
+        """Append to the queue (and the spool); None if full or stopping."""
+        with self._cond:
+            if self._stopping or len(self._queue) >= WRITE_BEHIND_QUEUE_SIZE:
+                return None
+            position = spool_append(pending.row) if spool_append is not None else 0
+            self._queue.append(pending)
+            if len(self._queue) == 1 or len(self._queue) >= WRITE_BEHIND_MAX_ROWS:
+                self._cond.notify()
+            return position
+
+    def _take(self):
+        with self._cond:
+            batch = list(self._queue)
+            self._queue.clear()
+            return batch
+
+    def _wait_for_batch(self):
+        """Block until a flush is due; False once stopped with nothing left."""
+        with self._cond:
+            while not self._queue:
+                if self._stopping:
+                    return False
+                self._cond.wait()
+            deadline = time.monotonic() + WRITE_BEHIND_FLUSH_MS / 1000
+            while len(self._queue) < WRITE_BEHIND_MAX_ROWS and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return True
+
+    def _run(self):
+        while self._wait_for_batch():
+            try:
+                self._flush()
+            except Exception:
+                logger.exception("write-behind flush failed")
+
+    def _flush(self):
+        sealed = None
+        if self.spool is None:
+            batch = self._take()
+        else:
+            with self.spool.sync_lock, self.spool.lock:
+                batch = self._take()
+                sealed = self.spool.seal()
+        self._write(batch)
+        if sealed is not None:
+            Spool.remove(sealed)
+
+    def _write(self, batch):
+        now = models.utcnow()
+        rows = [{**pending.row, "updated_at": now} for pending in batch]
+        failed = {}
+        while True:
+            try:
+                with database.SessionLocal() as db:
+                    ingest.insert_responses(db, rows)
+                    db.commit()
+                break
+            except (IntegrityError, DataError):
+                failed = _insert_each(rows)
+                break
+            except SQLAlchemyError:
+                logger.exception("write-behind flush of %d rows failed; retrying", len(rows))
+                time.sleep(RETRY_DELAY)
+
+        for pending, row in zip(batch, rows):
+            exc = failed.get(row["id"])
+            if exc is not None:
+                logger.error("write-behind dropped response %s: %s", row["id"], exc.orig)
+                pending.future.set_exception(exc)
+                continue
+            stats.record_write(row["form_id"], new_data=row["response_data"])
+            live.publish_response("created", models.FormResponse(**row))
+            pending.future.set_result(row)
+
+    def stop(self, timeout):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("write-behind drain timed out with %d rows queued", len(self._queue))
+        elif self.spool is not None:
+            self.spool.close()
+
+
+def replay(directory):
+    """Insert the rows of spool files left behind by workers that have exited."""
+    for path in sorted(glob.glob(os.path.join(directory, "responses-*.spool*"))):
+        try:
+            f = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # its worker is still running
+            if not os.path.exists(path):
+                continue  # flushed and removed while we waited
+            rows = [_decode(line) for line in f if line.endswith("\n")]
+            now = models.utcnow()
+            with database.SessionLocal() as db:
+                stmt = database.dialect_insert(db)(models.FormResponse).on_conflict_do_nothing()
+                for start in range(0, len(rows), REPLAY_CHUNK_SIZE):
+                    db.execute(stmt, [{**row, "updated_at": now} for row in rows[start:start + REPLAY_CHUNK_SIZE]])
+                # Some rows may have been written before the crash; recount rather than add.
+                counters.rebuild(db, sorted({row["form_id"] for row in rows}))
+                db.commit()
+            for form_id in {row["form_id"] for row in rows}:
+                stats.invalidate(form_id)
+            os.remove(path)
+            logger.warning("replayed %d spooled responses from %s", len(rows), path)
+
+
+writer = None
+
+
+def start():
+    """Start this worker's writer if ``WRITE_BEHIND`` is on (app startup)."""
+    global writer
+    if not WRITE_BEHIND or writer is not None:
+        return
+    if database.engine.dialect.name != "postgresql":
+        logger.warning("WRITE_BEHIND needs Postgres; submissions are written synchronously")
+        return
+    spool = None
+    if WRITE_BEHIND_DURABILITY == "spool":
+        replay(WRITE_BEHIND_SPOOL_DIR)
+        spool = Spool(WRITE_BEHIND_SPOOL_DIR)
+    writer = Writer(spool)
+    writer.start()
+
+
+def stop():
+    """Drain the queue (app shutdown)."""
+    global writer
+    if writer is not None:
+        writer.stop(WRITE_BEHIND_DRAIN_SECONDS)
+        writer = None
+
+
+def submit(form_id: int, user_id: int, response_data):
+    """Queue a validated submission; None means the caller writes it itself."""
+    if writer is None:
+        return None
+    row = {
+        "id": writer.ids.next(),
+        "form_id": form_id,
+        "user_id": user_id,
+        "response_data": response_data,
+        "is_active": True,
+        "submitted_at": models.utcnow(),
+    }
+    pending = writer.submit(row)
+    if pending is not None:
+        # Not committed by the request's own session, so pin here.
+        database.pin_to_primary(user_id)
+    return pending
+
+
+def acknowledgement(pending):
+    """``(row, committed)`` for a queued submission, per ``WRITE_BEHIND_DURABILITY``.
+
+    In ``commit`` mode this waits for the row's batch. A row the database
+    refused is a 409 (422 for a value it cannot store), and a batch that has
+    not committed within ``WRITE_BEHIND_ACK_TIMEOUT`` is a 503: the row is
+    still queued and may be written later.
+    """
+    if WRITE_BEHIND_DURABILITY != "commit":
+        return _accepted(pending)
+    try:
+        return pending.future.result(WRITE_BEHIND_ACK_TIMEOUT), True
+    except concurrent.futures.TimeoutError:
+        raise _not_committed(pending)
+    except (IntegrityError, DataError) as exc:
+        raise _rejected(exc)
+
+
+async def acknowledgement_async(pending):
+    """``acknowledgement`` without holding a thread while the batch commits."""
+    if WRITE_BEHIND_DURABILITY != "commit":
+        return _accepted(pending)
+    try:
+        # shield: a timeout must not cancel the future the writer resolves
+        committed = asyncio.shield(asyncio.wrap_future(pending.future))
+        return await asyncio.wait_for(committed, WRITE_BEHIND_ACK_TIMEOUT), True
+    except asyncio.TimeoutError:
+        raise _not_committed(pending)
+    except (IntegrityError, DataError) as exc:
+        raise _rejected(exc)
+
+
+def _not_committed(pending):
+    return HTTPException(
+        status_code=503,
+        detail=f"Response {pending.row['id']} is queued but not committed yet; it may still be saved",
+    )
+
+
+def _rejected(exc):
+    if isinstance(exc, DataError):
+        return HTTPException(status_code=422, detail="Response data could not be stored")
+    return HTTPException(status_code=409, detail="Response conflicts with existing data")
+
+
+def _accepted(pending):
+    return {**pending.row, "updated_at": None}, False
@@ -6,6 +6,9 @@ import { Shield, ShieldOff, Search, ChevronLeft, User } from 'lucide-react';
 import API_BASE_URL from '../apiConfig';
 
 
+const PAGE_SIZE = 100;
+const SEARCH_DEBOUNCE_MS = 300;
+
 const FormAccessManager = () => {
     const { id } = useParams();
     const navigate = useNavigate();
@@ -13,37 +16,68 @@ const FormAccessManager = () => {
     const [users, setUsers] = useState([]);
     const [loading, setLoading] = useState(true);
     const [searchTerm, setSearchTerm] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [bulkUpdating, setBulkUpdating] = useState(false);
 
     useEffect(() => {
-        fetchData();
+        fetchForm();
     }, [id]);
 
-    const fetchData = async () => {
-        try {
-            const token = localStorage.getItem('token');
-            const [formRes, usersRes] = await Promise.all([
-                axios.get(`${API_BASE_URL}/forms/${id}`, { headers: { Authorization: `Bearer ${token}` } }),
-                axios.get(`${API_BASE_URL}/admin/forms/${id}/access`, { headers: { Authorization: `Bearer ${token}` } })
+    // Search runs on the server; wait for the admin to stop typing.
+    useEffect(() => {
+        const timer = setTimeout(() => fetchUsers(), SEARCH_DEBOUNCE_MS);
+        return () => clearTimeout(timer);
+    }, [id, searchTerm]);
+
+    const authHeaders = () => ({ Authorization: `Bearer ${localStorage.getItem('token')}` });
 
-            ]);
+    const fetchPage = (after) => axios.get(`${API_BASE_URL}/admin/forms/${id}/access`, {
+        headers: authHeaders(),
+        params: { limit: PAGE_SIZE, ...(searchTerm ? { q: searchTerm } : {}), ...(after ? { after } : {}) }
+    });
+
+    const fetchForm = async () => {
+        try {
+            const formRes = await axios.get(`${API_BASE_URL}/forms/${id}`, { headers: authHeaders() });
             setForm(formRes.data);
-            setUsers(usersRes.data);
         } catch (error) {
             toast.error('Failed to load access data');
             navigate('/forms');
+        }
+    };
+
+    const fetchUsers = async () => {
+        try {
+            const usersRes = await fetchPage(null);
+            setUsers(usersRes.data);
+            setNextCursor(usersRes.headers['x-next-cursor'] || null);
+        } catch (error) {
+            toast.error('Failed to load access data');
         } finally {
             setLoading(false);
         }
     };
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const usersRes = await fetchPage(nextCursor);
+            setUsers(prev => [...prev, ...usersRes.data]);
+            setNextCursor(usersRes.headers['x-next-cursor'] || null);
+        } catch (error) {
+            toast.error('Failed to load more users');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const toggleAccess = async (userId, currentAccess) => {
         try {
-            const token = localStorage.getItem('token');
             await axios.put(`${API_BASE_URL}/admin/forms/${id}/access`, {
-
                 user_id: userId,
                 has_access: !currentAccess
-            }, { headers: { Authorization: `Bearer ${token}` } });
+            }, { headers: authHeaders() });
 
             setUsers(users.map(u => u.user_id === userId ? { ...u, has_access: !currentAccess } : u));
             toast.success('Access updated');
@@ -52,11 +86,24 @@ const FormAccessManager = () => {
         }
     };
 
-    const filteredUsers = users.filter(u =>
-        u.mobile_number.includes(searchTerm) ||
-        (u.first_name || '').toLowerCase().includes(searchTerm.toLowerCase()) ||
-        (u.last_name || '').toLowerCase().includes(searchTerm.toLowerCase())
-    );
+    // One request for every user matching the search, loaded or not.
+    const bulkUpdate = async (hasAccess) => {
+        const scope = searchTerm ? `all users matching "${searchTerm}"` : 'all users';
+        if (!window.confirm(`${hasAccess ? 'Grant' : 'Revoke'} access for ${scope}?`)) return;
+        setBulkUpdating(true);
+        try {
+            const res = await axios.post(`${API_BASE_URL}/admin/forms/${id}/access:bulk`, {
+                has_access: hasAccess,
+                ...(searchTerm ? { q: searchTerm } : {})
+            }, { headers: authHeaders() });
+            setUsers(users.map(u => ({ ...u, has_access: hasAccess })));
+            toast.success(`Access updated for ${res.data.updated} users`);
+        } catch (error) {
+            toast.error('Failed to update access');
+        } finally {
+            setBulkUpdating(false);
+        }
+    };
 
     if (loading) return <div style={{ padding: '80px', textAlign: 'center' }}>Loading access controls...</div>;
 
@@ -86,15 +133,36 @@ const FormAccessManager = () => {
                         onChange={(e) => setSearchTerm(e.target.value)}
                     />
                 </div>
+                <div style={{ display: 'flex', gap: '12px', marginTop: '16px' }}>
+                    <button
+                        className="btn-primary"
+                        onClick={() => bulkUpdate(true)}
+                        disabled={bulkUpdating}
+                        style={{ width: 'auto', display: 'flex', alignItems: 'center', gap: '8px', fontSize: '0.9rem' }}
+                    >
+                        <Shield size={16} /> {searchTerm ? 'Grant all matching' : 'Grant all'}
+                    </button>
+                    <button
+                        className="btn-primary"
+                        onClick={() => bulkUpdate(false)}
+                        disabled={bulkUpdating}
+                        style={{
+                            width: 'auto', display: 'flex', alignItems: 'center', gap: '8px', fontSize: '0.9rem',
+                            background: 'rgba(239, 68, 68, 0.1)', color: 'var(--danger)', border: 'none'
+                        }}
+                    >
+                        <ShieldOff size={16} /> {searchTerm ? 'Revoke all matching' : 'Revoke all'}
+                    </button>
+                </div>
             </div>
 
             <div style={{ display: 'flex', flexDirection: 'column', gap: '12px' }}>
-                {filteredUsers.length === 0 ? (
+                {users.length === 0 ? (
                     <div style={{ textAlign: 'center', padding: '40px', color: 'var(--text-muted)' }}>
                         No users found
                     </div>
                 ) : (
-                    filteredUsers.map(u => (
+                    users.map(u => (
                         <div key={u.user_id} className="glass-card" style={{
                             padding: '16px 24px',
                             display: 'flex',
@@ -144,6 +212,13 @@ const FormAccessManager = () => {
                         </div>
                     ))
                 )}
+                {nextCursor && (
+                    <div style={{ padding: '20px', textAlign: 'center' }}>
+                        <button className="btn-primary" onClick={loadMore} disabled={loadingMore}>
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
         </div>
     );
@@ -1,12 +1,16 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { useParams, useNavigate } from 'react-router-dom';
 import { toast } from 'react-hot-toast';
-import { Table, ChevronLeft, Calendar, Edit2, Shield, ShieldOff, X, Save } from 'lucide-react';
+import { Table, ChevronLeft, Calendar, Edit2, Shield, ShieldOff, X, Save, Search } from 'lucide-react';
 import API_BASE_URL from '../apiConfig';
 
 
 
+const PAGE_SIZE = 100;
+const SEARCH_LIMIT = 50;
+const LIVE_RECONNECT_MS = 5000;
+
 const FormResponses = () => {
     const { id } = useParams();
     const navigate = useNavigate();
@@ -15,23 +19,133 @@ const FormResponses = () => {
     const [loading, setLoading] = useState(true);
     const [editingRecord, setEditingRecord] = useState(null);
     const [editData, setEditData] = useState({});
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [query, setQuery] = useState('');
+    const [hits, setHits] = useState(null); // search results; null when not searching
+    const changesCursor = useRef(null);
+    const allLoaded = useRef(false);
 
 
     useEffect(() => {
         fetchData();
     }, [id]);
 
+    // Pick up records written elsewhere (other tabs, other devices) from the
+    // live stream instead of reloading the whole list. The stream needs the
+    // Authorization header, so it is read with fetch rather than EventSource.
+    useEffect(() => {
+        const controller = new AbortController();
+        let timer = null;
+
+        const connect = async () => {
+            try {
+                const token = localStorage.getItem('token');
+                const res = await fetch(`${API_BASE_URL}/forms/${id}/responses/live`, {
+                    headers: { Authorization: `Bearer ${token}` },
+                    signal: controller.signal
+                });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    const events = buffer.split('\n\n');
+                    buffer = events.pop();
+                    events.forEach(handleLiveEvent);
+                }
+            } catch (error) {
+                if (controller.signal.aborted) return;
+            }
+            // Stream ended or was evicted; catch up on reconnect.
+            timer = setTimeout(connect, LIVE_RECONNECT_MS);
+        };
+
+        connect();
+        return () => {
+            controller.abort();
+            clearTimeout(timer);
+        };
+    }, [id]);
+
+    const handleLiveEvent = (text) => {
+        let event = 'message';
+        let data = '';
+        text.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (event === 'ready' || event === 'batch' || event === 'evicted') {
+            // Anything missed while disconnected, or too many rows for one event.
+            pollChanges();
+        } else if (event === 'created' || event === 'updated') {
+            const { response } = JSON.parse(data);
+            if (response.truncated) {
+                pollChanges();
+            } else {
+                mergeChanges([{ ...response, data: JSON.parse(response.response_data) }]);
+            }
+        }
+    };
+
+    const pollChanges = async () => {
+        if (!changesCursor.current) return;
+        try {
+            const token = localStorage.getItem('token');
+            let hasMore = true;
+            while (hasMore) {
+                const res = await axios.get(`${API_BASE_URL}/forms/${id}/responses/changes`, {
+                    headers: { Authorization: `Bearer ${token}` },
+                    params: { since: changesCursor.current }
+                });
+                changesCursor.current = res.data.cursor;
+                hasMore = res.data.has_more;
+                mergeChanges(res.data.changes.map(r => ({ ...r, data: JSON.parse(r.response_data) })));
+            }
+        } catch (error) {
+            // Try again on the next tick.
+        }
+    };
+
+    const mergeChanges = (changed) => {
+        if (changed.length === 0) return;
+        setResponses(prev => {
+            const byId = new Map(changed.map(r => [r.id, r]));
+            const merged = prev.map(r => byId.has(r.id) ? byId.get(r.id) : r);
+            const known = new Set(prev.map(r => r.id));
+            // New rows sort last; pages not loaded yet will bring them in otherwise.
+            const added = allLoaded.current ? changed.filter(r => !known.has(r.id)) : [];
+            return [...merged, ...added];
+        });
+    };
+
+    const fetchPage = (after) => {
+        const token = localStorage.getItem('token');
+        return axios.get(`${API_BASE_URL}/forms/${id}/responses`, {
+            headers: { Authorization: `Bearer ${token}` },
+            // documents=object: response_data arrives parsed, no JSON.parse per row
+            params: { limit: PAGE_SIZE, documents: 'object', ...(after ? { after } : {}) }
+        });
+    };
+
+    const parsePage = (res) => res.data.map(r => ({ ...r, data: r.response_data }));
+
     const fetchData = async () => {
         try {
             const token = localStorage.getItem('token');
             const [formRes, respRes] = await Promise.all([
                 axios.get(`${API_BASE_URL}/forms/${id}`, { headers: { Authorization: `Bearer ${token}` } }),
-                axios.get(`${API_BASE_URL}/forms/${id}/responses`, { headers: { Authorization: `Bearer ${token}` } })
+                fetchPage(null)
             ]);
 
             const schema = JSON.parse(formRes.data.form_schema);
             setForm({ ...formRes.data, fields: schema });
-            setResponses(respRes.data.map(r => ({ ...r, data: JSON.parse(r.response_data) })));
+            setResponses(parsePage(respRes));
+            setNextCursor(respRes.headers['x-next-cursor'] || null);
+            allLoaded.current = !respRes.headers['x-next-cursor'];
+            changesCursor.current = respRes.headers['x-changes-cursor'] || null;
         } catch (error) {
             toast.error('Failed to load data');
             navigate('/');
@@ -40,6 +154,54 @@ const FormResponses = () => {
         }
     };
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const respRes = await fetchPage(nextCursor);
+            const page = parsePage(respRes);
+            setResponses(prev => {
+                const known = new Set(prev.map(r => r.id));
+                return [...prev, ...page.filter(r => !known.has(r.id))];
+            });
+            setNextCursor(respRes.headers['x-next-cursor'] || null);
+            allLoaded.current = !respRes.headers['x-next-cursor'];
+        } catch (error) {
+            toast.error('Failed to load more records');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const runSearch = async (e) => {
+        e.preventDefault();
+        if (!query.trim()) {
+            setHits(null);
+            return;
+        }
+        try {
+            const token = localStorage.getItem('token');
+            const res = await axios.get(`${API_BASE_URL}/forms/${id}/responses/search`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { q: query, limit: SEARCH_LIMIT }
+            });
+            setHits(res.data.map(r => ({ ...r, data: JSON.parse(r.response_data) })));
+        } catch (error) {
+            toast.error('Search failed');
+        }
+    };
+
+    const clearSearch = () => {
+        setQuery('');
+        setHits(null);
+    };
+
+    // Edits apply to the list and to the search results showing the record.
+    const updateRecord = (recordId, changes) => {
+        const apply = list => list.map(r => r.id === recordId ? { ...r, ...changes } : r);
+        setResponses(apply);
+        setHits(prev => prev && apply(prev));
+    };
+
     const toggleStatus = async (record) => {
         try {
             const token = localStorage.getItem('token');
@@ -49,7 +211,7 @@ const FormResponses = () => {
                 { headers: { Authorization: `Bearer ${token}` } }
             );
 
-            setResponses(responses.map(r => r.id === record.id ? { ...r, is_active: newStatus } : r));
+            updateRecord(record.id, { is_active: newStatus });
             toast.success(`Record ${newStatus ? 'activated' : 'deactivated'}`);
         } catch (error) {
             toast.error('Failed to update status');
@@ -83,11 +245,14 @@ const FormResponses = () => {
                 { headers: { Authorization: `Bearer ${token}` } }
             );
 
-            setResponses(responses.map(r => r.id === editingRecord.id ? { ...r, data: submissionData } : r));
+            updateRecord(editingRecord.id, { data: submissionData });
             setEditingRecord(null);
             toast.success('Record updated successfully');
         } catch (error) {
-            toast.error('Failed to update record');
+            const detail = error.response?.data?.detail;
+            toast.error(Array.isArray(detail)
+                ? detail.map(e => `${e.field ?? e.loc?.at(-1)}: ${e.msg}`).join('\n')
+                : detail || 'Failed to update record');
         }
     };
 
@@ -96,6 +261,7 @@ const FormResponses = () => {
     if (loading) return <div style={{ padding: '80px', textAlign: 'center' }}>Loading records...</div>;
 
     const columnLabels = form?.fields.filter(f => f.isActive).map(f => f.label) || [];
+    const rows = hits ?? responses;
 
     return (
         <div style={{ maxWidth: '1200px', margin: '0 auto', padding: '40px 20px' }}>
@@ -109,11 +275,32 @@ const FormResponses = () => {
                 </div>
             </div>
 
-            {responses.length === 0 ? (
+            <form onSubmit={runSearch} style={{ display: 'flex', gap: '12px', marginBottom: '24px' }}>
+                <div style={{ position: 'relative', flex: 1 }}>
+                    <Search size={18} style={{ position: 'absolute', left: '14px', top: '50%', transform: 'translateY(-50%)', color: 'var(--text-muted)' }} />
+                    <input
+                        className="input-field"
+                        placeholder="Search records..."
+                        value={query}
+                        onChange={(e) => setQuery(e.target.value)}
+                        style={{ paddingLeft: '42px' }}
+                    />
+                </div>
+                <button type="submit" className="btn-primary">Search</button>
+                {hits && (
+                    <button type="button" className="btn-primary" onClick={clearSearch} style={{ background: 'var(--bg-dark)', border: '1px solid var(--border)' }}>
+                        Clear
+                    </button>
+                )}
+            </form>
+
+            {rows.length === 0 ? (
                 <div className="glass-card" style={{ padding: '80px', textAlign: 'center' }}>
                     <Table size={48} style={{ opacity: 0.1, marginBottom: '16px' }} />
                     <h3 style={{ color: 'var(--text-muted)' }}>No records found</h3>
-                    <p style={{ color: 'var(--text-muted)' }}>You haven't submitted any records for this form yet.</p>
+                    <p style={{ color: 'var(--text-muted)' }}>
+                        {hits ? 'No records match your search.' : "You haven't submitted any records for this form yet."}
+                    </p>
                 </div>
             ) : (
                 <div className="glass-card" style={{ overflowX: 'auto', padding: '0' }}>
@@ -122,6 +309,9 @@ const FormResponses = () => {
                             <tr style={{ borderBottom: '1px solid var(--border)' }}>
                                 <th style={{ padding: '20px', color: 'var(--text-muted)', fontSize: '0.8rem', textTransform: 'uppercase' }}>Status</th>
                                 <th style={{ padding: '20px', color: 'var(--text-muted)', fontSize: '0.8rem', textTransform: 'uppercase' }}>Submission Date</th>
+                                {hits && (
+                                    <th style={{ padding: '20px', color: 'var(--text-muted)', fontSize: '0.8rem', textTransform: 'uppercase' }}>Match</th>
+                                )}
                                 {columnLabels.map(label => (
                                     <th key={label} style={{ padding: '20px', color: 'var(--text-muted)', fontSize: '0.8rem', textTransform: 'uppercase' }}>{label}</th>
                                 ))}
@@ -130,7 +320,7 @@ const FormResponses = () => {
                             </tr>
                         </thead>
                         <tbody>
-                            {responses.map((resp) => (
+                            {rows.map((resp) => (
                                 <tr key={resp.id} style={{
                                     borderBottom: '1px solid var(--border)',
                                     transition: 'background 0.2s',
@@ -148,6 +338,10 @@ const FormResponses = () => {
                                             {new Date(resp.submitted_at).toLocaleString()}
                                         </div>
                                     </td>
+                                    {hits && (
+                                        // The server escapes the snippet and only adds <mark> tags.
+                                        <td style={{ padding: '20px', fontSize: '0.9rem' }} dangerouslySetInnerHTML={{ __html: resp.snippet || '' }} />
+                                    )}
                                     {columnLabels.map(label => (
                                         <td key={label} style={{ padding: '20px', fontSize: '0.9rem' }}>
                                             {resp.data[label] || '-'}
@@ -176,6 +370,13 @@ const FormResponses = () => {
                             ))}
                         </tbody>
                     </table>
+                    {nextCursor && !hits && (
+                        <div style={{ padding: '20px', textAlign: 'center' }}>
+                            <button className="btn-primary" onClick={loadMore} disabled={loadingMore}>
+                                {loadingMore ? 'Loading...' : 'Load more'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
 
@@ -64,7 +64,10 @@ const FormSubmission = () => {
             toast.success('Record saved successfully!');
             setFormData({}); // Clear form
         } catch (error) {
-            toast.error(error.response?.data?.detail || 'Failed to save record');
+            const detail = error.response?.data?.detail;
+            toast.error(Array.isArray(detail)
+                ? detail.map(e => `${e.field ?? e.loc?.at(-1)}: ${e.msg}`).join('\n')
+                : detail || 'Failed to save record');
         } finally {
             setSubmitting(false);
         }
@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 import { toast } from 'react-hot-toast';
-import { FileText, Edit, Calendar, Plus, ExternalLink, Users } from 'lucide-react';
+import { FileText, Edit, Calendar, Plus, ExternalLink, Users, Inbox, Clock } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import API_BASE_URL from '../apiConfig';
 
@@ -98,6 +98,18 @@ const MyForms = () => {
                                 {form.description || 'No description provided'}
                             </p>
 
+                            <div style={{ display: 'flex', gap: '16px', flexWrap: 'wrap', fontSize: '0.8rem', color: 'var(--text-muted)', marginBottom: '20px' }}>
+                                <span style={{ display: 'flex', alignItems: 'center', gap: '6px' }} title={`${form.active_response_count} active, ${form.inactive_response_count} inactive`}>
+                                    <Inbox size={12} /> {form.response_count} responses
+                                </span>
+                                <span style={{ display: 'flex', alignItems: 'center', gap: '6px' }}>
+                                    <Users size={12} /> {form.access_count} with access
+                                </span>
+                                <span style={{ display: 'flex', alignItems: 'center', gap: '6px' }}>
+                                    <Clock size={12} /> {form.last_submitted_at ? new Date(form.last_submitted_at).toLocaleString() : 'No responses yet'}
+                                </span>
+                            </div>
+
                             <div style={{ display: 'flex', gap: '8px', marginTop: 'auto', flexWrap: 'wrap' }}>
                                 <button
                                     className="btn-primary"